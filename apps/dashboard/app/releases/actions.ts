@@ -81,3 +81,30 @@ export async function deployRelease(service: string, version: string, slot: 'blu
     throw error;
   }
 }
+
+export async function deployReleases(services: string[], version: string, slot: 'blue' | 'green') {
+  // Egyetlen szolgáltatáshoz nem kell batch: a sima /deploy végpont is elég
+  if (services.length === 1) {
+    return deployRelease(services[0], version, slot)
+  }
+  try {
+    const response = await fetch(`${process.env.DEPLOYMENT_ENGINE}/deploy/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        deployments: services.map(service => ({ service, version, slot }))
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Hiba a deployment-ben:', error);
+    throw error;
+  }
+}
@@ -5,7 +5,7 @@ import { Button } from "@/components/ui/button"
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle } from "@/components/ui/dialog"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Checkbox } from "@/components/ui/checkbox"
-import { deployRelease} from "./actions"
+import { deployReleases } from "./actions"
 
 interface DeployDialogProps {
   open: boolean
@@ -73,14 +73,11 @@ export function DeployDialog({ open, onOpenChange, selectedRelease, onSuccess, p
     
     setIsLoading(true)
     try {
-      await Promise.all(
-        servicesToDeploy.map(service =>
-          deployRelease(
-            service,
-            selectedRelease,
-            selectedSlot === "slot-a" ? "blue" : "green"
-          )
-        )
+      // Egyetlen batch: az image-ek párhuzamosan töltődnek le, a csere csak ha mind sikerült
+      await deployReleases(
+        servicesToDeploy,
+        selectedRelease,
+        selectedSlot === "slot-a" ? "blue" : "green"
       )
       
       alert(`A deployment elkezdődött: ${servicesToDeploy.join(', ')}`)
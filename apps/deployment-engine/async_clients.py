@@ -0,0 +1,110 @@
+# apps/deployment-engine/async_clients.py
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Rövid Docker lekérdezések (állapot, verzió, replikák) párhuzamossága
+DOCKER_QUERY_WORKERS = int(os.getenv("DOCKER_QUERY_WORKERS", "8"))
+# Hosszú Docker műveletek (pull, run, stop) párhuzamossága; külön készleten, hogy ne tartsák fel a lekérdezéseket
+DOCKER_OPERATION_WORKERS = int(os.getenv("DOCKER_OPERATION_WORKERS", "4"))
+# Minden egyéb blokkoló hívás (HTTP próbák, fájlírás) az event loop alapértelmezett, korlátos készletén fut
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "16"))
+# Hosztonként ennyi keep-alive kapcsolatot tartunk nyitva
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+
+class BoundedExecutor:
+    """Korlátos szálkészlet blokkoló hívásokhoz, a futó hívások számlálásával"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def _call(self, fn: Callable, args, kwargs):
+        with self._lock:
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # A naplózási kontextus (deployment_id, service, slot) a worker szálon is érvényes marad
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.pool, context.run, self._call, fn, args, kwargs)
+
+    def to_dict(self) -> Dict:
+        return {"workers": self.workers, "active": self.active}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncDockerClient:
+    """A DockerManager metódusai awaitable formában; a hosszú műveletek külön szálkészleten futnak."""
+
+    # Percekig is tarthatnak (image letöltés, leállítási timeout), ezért nem a lekérdezések készletén futnak
+    OPERATIONS = {
+        "pull_image", "run_container", "stop_container", "start_container", "restart_service",
+        "delete_container", "retain_container", "restore_standby", "remove_image",
+        "container_stats", "update_memory_limit"
+    }
+
+    def __init__(self, docker_manager, query_workers: int = DOCKER_QUERY_WORKERS,
+                 operation_workers: int = DOCKER_OPERATION_WORKERS):
+        self.docker_manager = docker_manager
+        self.queries = BoundedExecutor("docker-query", query_workers)
+        self.operations = BoundedExecutor("docker-operation", operation_workers)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.docker_manager, name)
+        executor = self.operations if name in self.OPERATIONS else self.queries
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await executor.run(method, *args, **kwargs)
+
+        return call
+
+    def to_dict(self) -> Dict:
+        return {"queries": self.queries.to_dict(), "operations": self.operations.to_dict()}
+
+    def shutdown(self):
+        self.queries.shutdown()
+        self.operations.shutdown()
+
+
+def pooled_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """Keep-alive kapcsolatokat újrahasznosító HTTP session"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Közös session a health check, Traefik metrika és GitHub hívásokhoz
+http_session = pooled_session()
+
+
+def install_default_executor(workers: int = BLOCKING_WORKERS) -> ThreadPoolExecutor:
+    """Az asyncio.to_thread hívások korlátos, saját készletre irányítása"""
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blocking")
+    asyncio.get_running_loop().set_default_executor(executor)
+    return executor
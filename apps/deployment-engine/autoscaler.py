@@ -0,0 +1,231 @@
+# apps/deployment-engine/autoscaler.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUTOSCALE_ENABLED = os.getenv("AUTOSCALE_ENABLED", "false").lower() == "true"
+AUTOSCALE_INTERVAL = float(os.getenv("AUTOSCALE_INTERVAL", "30.0"))
+AUTOSCALE_MIN_REPLICAS = int(os.getenv("AUTOSCALE_MIN_REPLICAS", "1"))
+AUTOSCALE_MAX_REPLICAS = int(os.getenv("AUTOSCALE_MAX_REPLICAS", "5"))
+# CPU kihasználtság (a korlát arányában): e fölött bővítünk, e alatt szűkítünk; a köztes sáv a hiszterézis
+AUTOSCALE_CPU_HIGH = float(os.getenv("AUTOSCALE_CPU_HIGH", "0.75"))
+AUTOSCALE_CPU_LOW = float(os.getenv("AUTOSCALE_CPU_LOW", "0.25"))
+# Egy replikára jutó cél kérésszám (RPS)
+AUTOSCALE_TARGET_RPS = float(os.getenv("AUTOSCALE_TARGET_RPS", "50.0"))
+# A memória korlát ezen arányának túllépésekor emeljük a korlátot (ha van korlát)
+AUTOSCALE_MEMORY_HIGH = float(os.getenv("AUTOSCALE_MEMORY_HIGH", "0.85"))
+AUTOSCALE_MEMORY_STEP = float(os.getenv("AUTOSCALE_MEMORY_STEP", "1.5"))
+AUTOSCALE_MEMORY_MAX_MB = int(os.getenv("AUTOSCALE_MEMORY_MAX_MB", "2048"))
+# Két azonos irányú művelet között eltelt minimális idő (másodperc)
+AUTOSCALE_UP_COOLDOWN = float(os.getenv("AUTOSCALE_UP_COOLDOWN", "60.0"))
+AUTOSCALE_DOWN_COOLDOWN = float(os.getenv("AUTOSCALE_DOWN_COOLDOWN", "300.0"))
+# Szűkítés csak ennyi egymást követő alacsony terhelésű mérés után
+AUTOSCALE_DOWN_STABLE_PERIODS = int(os.getenv("AUTOSCALE_DOWN_STABLE_PERIODS", "3"))
+
+SLOTS = ["blue", "green"]
+
+
+class ScalingDecision:
+    """Egy autoscaler kiértékelés eredménye és az indoklása"""
+
+    def __init__(self, service: str, slot: str, action: str, current: int, target: int,
+                 reason: str, metrics: Dict):
+        self.service = service
+        self.slot = slot
+        self.action = action
+        self.current = current
+        self.target = target
+        self.reason = reason
+        self.metrics = metrics
+        self.applied: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "service": self.service,
+            "slot": self.slot,
+            "action": self.action,
+            "current": self.current,
+            "target": self.target,
+            "reason": self.reason,
+            "metrics": self.metrics,
+            "applied": self.applied,
+            "error": self.error,
+            "at": self.at
+        }
+
+
+class SlotScalingState:
+    """Cooldown és hiszterézis nyilvántartás slotonként"""
+
+    def __init__(self):
+        self.last_up = 0.0
+        self.last_down = 0.0
+        self.low_periods = 0
+
+
+class Autoscaler:
+    """Docker stats és Traefik kérésszám alapján a slotok replikaszámát és memória korlátját igazítja."""
+
+    def __init__(self, targets: Callable[[], List[Tuple[str, str]]],
+                 container_stats: Callable[[str, str], Awaitable[List[Dict]]],
+                 request_rate: Callable[[str, str], float],
+                 scale: Callable[[str, str, int], Awaitable[Dict]],
+                 update_memory: Callable[[str, str, int], Awaitable[bool]],
+                 interval: float = AUTOSCALE_INTERVAL,
+                 min_replicas: int = AUTOSCALE_MIN_REPLICAS,
+                 max_replicas: int = AUTOSCALE_MAX_REPLICAS,
+                 history: int = 200):
+        self.targets = targets
+        self.container_stats = container_stats
+        self.request_rate = request_rate
+        self.scale = scale
+        self.update_memory = update_memory
+        self.interval = interval
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.decisions: Deque[ScalingDecision] = deque(maxlen=history)
+        self.latest: Dict[Tuple[str, str], ScalingDecision] = {}
+        self._states: Dict[Tuple[str, str], SlotScalingState] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------- DÖNTÉS -------------------
+
+    def decide(self, service: str, slot: str, stats: List[Dict], rps: float,
+               now: Optional[float] = None) -> ScalingDecision:
+        """Tiszta döntési logika: a mérésekből és az előzményekből megmondja, mit kellene tenni"""
+        now = now if now is not None else time.time()
+        state = self._states.setdefault((service, slot), SlotScalingState())
+        replicas = len(stats)
+        cpu = sum(s["cpu"] for s in stats) / replicas if replicas else 0.0
+        rps_per_replica = rps / replicas if replicas else 0.0
+        metrics = {"replicas": replicas, "cpu": round(cpu, 4), "rps": round(rps, 3),
+                   "rps_per_replica": round(rps_per_replica, 3)}
+
+        def decision(action: str, target: int, reason: str) -> ScalingDecision:
+            return ScalingDecision(service, slot, action, replicas, target, reason, metrics)
+
+        # Memória: ha van korlát és közel járunk hozzá, vertikálisan emelünk (OOM megelőzése)
+        limited = [s for s in stats if s.get("memory_limit_mb")]
+        if limited:
+            ratio = max(s["memory_mb"] / s["memory_limit_mb"] for s in limited)
+            metrics["memory_ratio"] = round(ratio, 4)
+            current_limit = max(s["memory_limit_mb"] for s in limited)
+            if ratio > AUTOSCALE_MEMORY_HIGH and current_limit < AUTOSCALE_MEMORY_MAX_MB \
+                    and now - state.last_up >= AUTOSCALE_UP_COOLDOWN:
+                new_limit = int(min(current_limit * AUTOSCALE_MEMORY_STEP, AUTOSCALE_MEMORY_MAX_MB))
+                return decision("memory_limit", new_limit,
+                                f"Memória használat a korlát {ratio:.0%}-a, korlát emelése {new_limit} MB-ra")
+
+        overloaded = cpu > AUTOSCALE_CPU_HIGH or rps_per_replica > AUTOSCALE_TARGET_RPS
+        if overloaded:
+            state.low_periods = 0
+            if replicas >= self.max_replicas:
+                return decision("hold", replicas, "Túlterhelt, de elérte a maximális replikaszámot")
+            if now - state.last_up < AUTOSCALE_UP_COOLDOWN:
+                return decision("hold", replicas, "Túlterhelt, de a bővítési cooldown még tart")
+            return decision("scale_up", replicas + 1,
+                            f"CPU {cpu:.0%}, {rps_per_replica:.1f} RPS/replika")
+
+        # Szűkítés csak akkor, ha eggyel kevesebb replikán is a cél alatt maradna a terhelés
+        underloaded = replicas > max(self.min_replicas, 1) and cpu * replicas / (replicas - 1) < AUTOSCALE_CPU_HIGH \
+            and cpu < AUTOSCALE_CPU_LOW and rps / (replicas - 1) < AUTOSCALE_TARGET_RPS * 0.7
+        if not underloaded:
+            state.low_periods = 0
+            return decision("hold", replicas, "A terhelés a célsávon belül van")
+        state.low_periods += 1
+        if state.low_periods < AUTOSCALE_DOWN_STABLE_PERIODS:
+            return decision("hold", replicas,
+                            f"Alacsony terhelés ({state.low_periods}/{AUTOSCALE_DOWN_STABLE_PERIODS} mérés)")
+        if now - max(state.last_down, state.last_up) < AUTOSCALE_DOWN_COOLDOWN:
+            return decision("hold", replicas, "Alacsony terhelés, de a szűkítési cooldown még tart")
+        return decision("scale_down", replicas - 1, f"CPU {cpu:.0%}, {rps:.1f} RPS összesen")
+
+    # ------------------- VÉGREHAJTÁS -------------------
+
+    async def _apply(self, decision: ScalingDecision):
+        state = self._states[(decision.service, decision.slot)]
+        try:
+            if decision.action in ("scale_up", "scale_down"):
+                await self.scale(decision.service, decision.slot, decision.target)
+            elif decision.action == "memory_limit":
+                if not await self.update_memory(decision.service, decision.slot, decision.target):
+                    raise RuntimeError("A memória korlát módosítása nem sikerült")
+            decision.applied = True
+        except Exception as e:
+            decision.applied = False
+            decision.error = str(e)
+            logger.error(f"Autoscaler hiba ({decision.service} {decision.slot}): {e}")
+        # Sikertelen próbálkozás után is kivárjuk a cooldownt, hogy ne ismételjük minden körben
+        if decision.action == "scale_down":
+            state.last_down = time.time()
+            state.low_periods = 0
+        else:
+            state.last_up = time.time()
+
+    async def evaluate(self, service: str, slot: str) -> Optional[ScalingDecision]:
+        # A Docker hívások a korlátos async_docker executoron futnak
+        stats = await self.container_stats(service, slot)
+        if not stats:
+            # Nem futó slotot nem skálázunk
+            return None
+        decision = self.decide(service, slot, stats, self.request_rate(service, slot))
+        self.latest[(service, slot)] = decision
+        if decision.action != "hold":
+            logger.info(f"Autoscaler: {service} {slot} {decision.action} {decision.current} -> {decision.target} ({decision.reason})")
+            await self._apply(decision)
+            self.decisions.append(decision)
+        return decision
+
+    async def run_once(self):
+        # A Docker stats lekérés lassú (kb. 1-2 s konténerenként), ezért a slotokat párhuzamosan mérjük
+        results = await asyncio.gather(*(self.evaluate(service, slot) for service, slot in self.targets()),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Hiba az autoscaler kiértékelés során: {result}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Hiba az autoscaler futása során: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------- LEKÉRDEZÉS -------------------
+
+    def to_dict(self) -> Dict:
+        return {
+            "enabled": self._task is not None,
+            "interval": self.interval,
+            "min_replicas": self.min_replicas,
+            "max_replicas": self.max_replicas,
+            "cpu_high": AUTOSCALE_CPU_HIGH,
+            "cpu_low": AUTOSCALE_CPU_LOW,
+            "target_rps": AUTOSCALE_TARGET_RPS,
+            "slots": [decision.to_dict() for decision in self.latest.values()]
+        }
+
+    def history(self, limit: int = 50) -> List[Dict]:
+        return [decision.to_dict() for decision in list(self.decisions)[-limit:]][::-1]
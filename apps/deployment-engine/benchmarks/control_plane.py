@@ -0,0 +1,354 @@
+# apps/deployment-engine/benchmarks/control_plane.py
+#
+# Vezérlősík benchmark: a motor valódi Docker és GitHub helyett a fakes.py helyettesítőivel fut,
+# és a /services, /traffic, /slot-config és /deploy végpontok áteresztőképességét (kérés/s)
+# és késleltetési percentiliseit (p50/p95/p99) méri 3, 30 és 300 szolgáltatásnál. A /deploy
+# kérések után a jobok lefutását is kivárja (deploy/s és deployment időtartam).
+#
+# Minden szolgáltatásszám külön folyamatban, friss motorral és ideiglenes mappában fut.
+# A --baseline egy korábbi --json kimenettel veti össze az eredményt, és hibával kilép,
+# ha a p95 késleltetés vagy az áteresztőképesség a tűréshatárnál jobban romlott.
+#
+# Futtatás (apps/deployment-engine mappából):
+#   python benchmarks/control_plane.py --json baseline.json
+#   python benchmarks/control_plane.py --baseline baseline.json
+#   python benchmarks/control_plane.py --services 300 --docker-latency-ms 20 --docker-failure-rate 0.01
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ENGINE_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+SERVICE_COUNTS = [3, 30, 300]
+SLOTS = ("blue", "green")
+ENDPOINTS = ["/services", "/traffic", "/slot-config", "/deploy"]
+# A fake GitHub tagjei; a deployok ezek között váltogatnak
+TAGS = [f"v0.{minor}" for minor in range(1, 6)]
+DEPLOY_VERSIONS = ["v0.2", "v0.3"]
+# A p95 ennél kisebb abszolút romlása zaj, nem regresszió (ms)
+MIN_REGRESSION_MS = 2.0
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Legközelebbi rang módszer; üres listára None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def median_round(rounds: List[Dict]) -> Dict:
+    """Több mérési kör összevonása metrikánként mediánnal; egy zajos kör így nem torzítja az eredményt"""
+    result = dict(rounds[0])
+    for key in ("throughput", "p50_ms", "p95_ms", "p99_ms", "max_ms", "error_rate"):
+        values = sorted(row[key] for row in rounds if row[key] is not None)
+        result[key] = values[len(values) // 2] if values else None
+    result["errors"] = sum(row["errors"] for row in rounds)
+    result["requests"] = sum(row["requests"] for row in rounds)
+    return result
+
+
+def summarize(endpoint: str, services: int, latencies: List[float], errors: int, elapsed: float) -> Dict:
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 3) if value is not None else None
+
+    total = len(latencies)
+    return {
+        "services": services,
+        "endpoint": endpoint,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput": round(total / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": ms(percentile(latencies, 0.5)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(max(latencies) if latencies else None)
+    }
+
+
+# ------------------- MÉRÉS (worker folyamat) -------------------
+
+async def measure(client, endpoint: str, services: int, send: Callable, total: int, concurrency: int,
+                  warmup: int) -> Dict:
+    """`total` kérés `concurrency` párhuzamos klienssel; a bemelegítő kérések nem számítanak bele"""
+    for i in range(warmup):
+        await send(client, i)
+
+    latencies: List[float] = []
+    errors = 0
+    indexes = itertools.count()
+
+    async def run_client():
+        nonlocal errors
+        for i in indexes:
+            if i >= total:
+                return
+            started = time.perf_counter()
+            try:
+                response = await send(client, warmup + i)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(concurrency)))
+    return summarize(endpoint, services, latencies, errors, time.perf_counter() - started)
+
+
+async def wait_deployments(engine, job_ids: List[str], services: int, timeout: float) -> Dict:
+    """A beküldött deploymentek lefutásának kivárása; a timeout után futók hibának számítanak"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [await engine.deployment_queue.get(job_id) for job_id in job_ids]
+        if all(job is not None and job.finished for job in jobs):
+            break
+        await asyncio.sleep(0.05)
+    jobs = [await engine.deployment_queue.get(job_id) for job_id in job_ids]
+    finished = [job for job in jobs if job is not None and job.finished and job.finished_at]
+    durations = [job.finished_at - job.created_at for job in finished]
+    errors = len(jobs) - sum(1 for job in finished if job.status == "active")
+    elapsed = (max(job.finished_at for job in finished) - min(job.created_at for job in finished)) if finished else 0.0
+    result = summarize("/deploy (lefutás)", services, durations, errors, elapsed)
+    result["requests"] = len(jobs)
+    return result
+
+
+async def run_scenarios(engine, services: List[str], args) -> List[Dict]:
+    import httpx
+
+    count = len(services)
+
+    async def get_services(client, i):
+        return await client.get("/services")
+
+    async def get_traffic(client, i):
+        return await client.get("/traffic")
+
+    async def set_slot_config(client, i):
+        blue = (i * 7) % 101
+        return await client.post("/slot-config", json={
+            "service": services[i % count], "blue_percentage": blue, "green_percentage": 100 - blue
+        })
+
+    job_ids: List[str] = []
+
+    async def deploy(client, i):
+        # Minden slot sorra kerül; ugyanarra a slotra érkező deployok a slot zárján sorban futnak
+        response = await client.post("/deploy", json={
+            "service": services[i % count],
+            "slot": SLOTS[(i // count) % len(SLOTS)],
+            "version": DEPLOY_VERSIONS[(i // (count * len(SLOTS))) % len(DEPLOY_VERSIONS)]
+        })
+        if response.status_code == 200:
+            job_ids.append(response.json()["deployment_id"])
+        return response
+
+    scenarios = {
+        "/services": get_services,
+        "/traffic": get_traffic,
+        "/slot-config": set_slot_config
+    }
+
+    results = []
+    transport = httpx.ASGITransport(app=engine.app)
+    async with engine.app.router.lifespan_context(engine.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://deployment-engine") as client:
+            deadline = time.monotonic() + args.startup_timeout
+            # Az induláskori image előtöltés se fusson a mérésekkel párhuzamosan
+            while ((await client.get("/ready")).status_code != 200 or engine.image_cache.known_tags is None
+                   or engine.image_cache.to_dict()["pending"]):
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"A motor nem indult el {args.startup_timeout}s alatt")
+                await asyncio.sleep(0.05)
+
+            for endpoint in args.endpoints:
+                if endpoint == "/deploy":
+                    # A deployok bemelegítése és ismétlése újabb jobokat indítana, ezért egyetlen kör fut
+                    results.append(await measure(client, endpoint, count, deploy, args.requests, args.concurrency, 0))
+                    results.append(await wait_deployments(engine, job_ids, count, args.deploy_timeout))
+                    continue
+                rounds = [await measure(client, endpoint, count, scenarios[endpoint], args.requests,
+                                        args.concurrency, args.warmup) for _ in range(args.rounds)]
+                results.append(median_round(rounds))
+    return results
+
+
+def run_worker(args) -> int:
+    """Egy szolgáltatásszám mérése friss motorral; az eredmény JSON-ként a stdout utolsó sorában"""
+    import docker
+
+    from fakes import (FakeContainerAdapter, FakeDockerClient, FakeGitHubServer, FakeTraefikMetricsServer,
+                       write_traefik_config)
+
+    services = [f"microservice{i}" for i in range(1, args.worker + 1)]
+    work_dir = tempfile.mkdtemp(prefix=f"control-plane-{args.worker}-")
+    config_path = os.path.join(work_dir, "services.yml")
+    write_traefik_config(config_path, services)
+
+    repo_url = os.environ.setdefault("GIT_REPO_URL", "https://github.com/gabor00/Szakdoga2025")
+    owner, repo = repo_url.rstrip("/").split("/")[-2:]
+    github = FakeGitHubServer(owner, repo, TAGS, latency=args.github_latency_ms / 1000).start()
+    traefik = FakeTraefikMetricsServer(services).start()
+    fake_docker = FakeDockerClient(latency=args.docker_latency_ms / 1000, jitter=args.docker_jitter,
+                                   failure_rate=args.docker_failure_rate, seed=args.seed)
+    fake_docker.populate(services)
+
+    # A motor moduljai importáláskor olvassák be a környezetet
+    os.environ.update({
+        "TRAEFIK_DYNAMIC_CONFIG": config_path,
+        "DEPLOYMENT_DB_PATH": os.path.join(work_dir, "deployment_jobs.db"),
+        "HISTORY_DB_PATH": os.path.join(work_dir, "engine_history.db"),
+        "GIT_TAG_CACHE_FILE": os.path.join(work_dir, "git_tags_cache.json"),
+        "STATE_DB_PATH": os.path.join(work_dir, "engine_state.db"),
+        "GITHUB_API_URL": github.url,
+        "TRAEFIK_METRICS_URL": traefik.url,
+        "LOG_FILE": ""
+    })
+    # Ezeket a hívó felülírhatja; az alapértékek a valódi várakozásokat (Traefik reload, poll) rövidítik
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    os.environ.setdefault("DRAIN_GRACE", "0")
+    os.environ.setdefault("READINESS_INITIAL_DELAY", "0.01")
+    os.environ.setdefault("DEPLOYMENT_QUEUE_SIZE", str(max(100, args.requests * 2)))
+    docker.from_env = lambda *a, **kw: fake_docker
+
+    try:
+        import main as engine
+        from async_clients import http_session
+        from state_backend import InMemoryStateBackend, ServiceStateStore
+
+        # A konténerek /health végpontjai a fake démon alapján válaszolnak
+        http_session.mount("http://szakdoga2025-", FakeContainerAdapter(fake_docker, args.health_latency_ms / 1000))
+        engine.service_states = ServiceStateStore(InMemoryStateBackend(), services, SLOTS)
+        engine.image_cache.services = services
+
+        results = asyncio.run(run_scenarios(engine, services, args))
+    finally:
+        fake_docker.close()
+        github.stop()
+        traefik.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps({"results": results, "docker_calls": sum(fake_docker.calls.values()),
+                      "docker_failures": sum(fake_docker.failures.values())}))
+    return 0
+
+
+# ------------------- VEZÉRLÉS -------------------
+
+def worker_command(args, count: int) -> List[str]:
+    command = [sys.executable, os.path.abspath(__file__), "--worker", str(count)]
+    for option in ("requests", "rounds", "concurrency", "warmup", "docker_latency_ms", "docker_jitter", "docker_failure_rate",
+                   "health_latency_ms", "github_latency_ms", "seed", "deploy_timeout", "startup_timeout", "log_level"):
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    command += ["--endpoints", *args.endpoints]
+    return command
+
+
+def print_table(results: List[Dict]):
+    print(f"{'szolg.':>6}  {'végpont':<18} {'kérés':>6} {'hiba':>5} {'kérés/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for row in results:
+        values = [row[key] if row[key] is not None else float("nan")
+                  for key in ("throughput", "p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{row['services']:>6}  {row['endpoint']:<18} {row['requests']:>6} {row['errors']:>5} "
+              f"{values[0]:>9.1f} {values[1]:>9.2f} {values[2]:>9.2f} {values[3]:>9.2f} {values[4]:>9.2f}")
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """Regressziók: p95 vagy áteresztőképesség a tűréshatáron túl, illetve megnőtt hibaarány"""
+    previous = {(row["services"], row["endpoint"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        base = previous.get((row["services"], row["endpoint"]))
+        if base is None:
+            continue
+        name = f"{row['endpoint']} @ {row['services']} szolgáltatás"
+        if (row["p95_ms"] is not None and base["p95_ms"] is not None
+                and row["p95_ms"] > base["p95_ms"] * (1 + tolerance)
+                and row["p95_ms"] - base["p95_ms"] > MIN_REGRESSION_MS):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        if row["throughput"] and base["throughput"] and row["throughput"] < base["throughput"] / (1 + tolerance):
+            regressions.append(f"{name}: áteresztőképesség {base['throughput']:.1f} -> {row['throughput']:.1f} kérés/s")
+        if row["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: hibaarány {base['error_rate']:.2%} -> {row['error_rate']:.2%}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="A deployment engine vezérlősíkjának offline benchmarkja")
+    parser.add_argument("--services", type=int, nargs="+", default=SERVICE_COUNTS, help="Mért szolgáltatásszámok")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=200, help="Kérések száma végpontonként")
+    parser.add_argument("--rounds", type=int, default=3, help="Mérési körök száma (a /deploy kivételével)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Párhuzamos kliensek száma")
+    parser.add_argument("--warmup", type=int, default=5, help="Nem mért bemelegítő kérések végpontonként")
+    parser.add_argument("--docker-latency-ms", type=float, default=2.0, help="Docker API hívásonkénti késleltetés")
+    parser.add_argument("--docker-jitter", type=float, default=0.5, help="A késleltetés relatív szórása (0-1)")
+    parser.add_argument("--docker-failure-rate", type=float, default=0.0, help="Docker API hívások hibaaránya (0-1)")
+    parser.add_argument("--health-latency-ms", type=float, default=1.0, help="/health próbák késleltetése")
+    parser.add_argument("--github-latency-ms", type=float, default=20.0, help="A fake GitHub válaszideje")
+    parser.add_argument("--seed", type=int, default=1, help="A késleltetések és hibák véletlen magja")
+    parser.add_argument("--deploy-timeout", type=float, default=300.0, help="Ennyit várunk a deployok lefutására (s)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Ennyit várunk a /ready-re (s)")
+    parser.add_argument("--log-level", default="CRITICAL", help="A motor naplószintje a mérés alatt")
+    parser.add_argument("--json", help="Az eredmények mentése ebbe a fájlba (későbbi baseline)")
+    parser.add_argument("--baseline", help="Korábbi --json kimenet, amihez képest a regressziókat keressük")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Megengedett relatív romlás (0.5 = 50%%); a baseline ugyanazon a gépen készüljön")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    args = parse_args()
+    if args.worker:
+        return run_worker(args)
+
+    results: List[Dict] = []
+    for count in args.services:
+        started = time.perf_counter()
+        completed = subprocess.run(worker_command(args, count), cwd=ENGINE_DIR, stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0 or not completed.stdout.strip():
+            print(f"{count} szolgáltatás: a mérés sikertelen (kilépési kód {completed.returncode})", file=sys.stderr)
+            return 2
+        output = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.extend(output["results"])
+        print(f"{count} szolgáltatás mérve {time.perf_counter() - started:.1f}s alatt "
+              f"({output['docker_calls']} Docker hívás, {output['docker_failures']} szimulált hiba)", file=sys.stderr)
+
+    print_table(results)
+
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ("json", "baseline", "worker")}
+        with open(args.json, "w") as file:
+            json.dump({"config": config, "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSZIÓ: {regression}")
+        if regressions:
+            return 1
+        print(f"Nincs regresszió (tűréshatár {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
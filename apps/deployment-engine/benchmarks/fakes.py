@@ -0,0 +1,580 @@
+# apps/deployment-engine/benchmarks/fakes.py
+#
+# Helyi helyettesítők a benchmarkokhoz, hogy a motor Docker socket és internet nélkül is fusson:
+#   - FakeDockerClient: memóriában tartott konténerek, image-ek és events stream a docker SDK
+#     felületével, hívásonként állítható késleltetéssel és hibaaránnyal
+#   - FakeGitHubServer / FakeTraefikMetricsServer: helyi HTTP szerverek a GitHub tag API
+#     és a Traefik /metrics helyett
+#   - FakeContainerAdapter: requests adapter a konténerek /health végpontjához; a fake
+#     démonban futó konténerek 200-zal válaszolnak, a leállítottak nem elérhetők
+
+import collections
+import hashlib
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import docker
+import requests
+import yaml
+
+SLOTS = ("blue", "green")
+GROUP_LABEL = "szakdoga2025.group"
+REPLICA_LABEL = "szakdoga2025.replica"
+
+
+def write_traefik_config(path: str, services: Iterable[str], slots: Tuple[str, ...] = SLOTS):
+    """services.yml a megadott szolgáltatásokkal, 50/50 súlyokkal"""
+    http_services = {}
+    for service in services:
+        name = f"szakdoga2025-{service}"
+        http_services[name] = {"weighted": {"services": [
+            {"name": f"{name}-{slot}", "weight": 100 // len(slots)} for slot in slots
+        ]}}
+        for slot in slots:
+            http_services[f"{name}-{slot}"] = {
+                "loadBalancer": {"servers": [{"url": f"http://{name}-{slot}:8000"}]}
+            }
+    with open(path, "w") as file:
+        yaml.safe_dump({"http": {"services": http_services}}, file, sort_keys=False)
+
+
+# ------------------- DOCKER -------------------
+
+class FakeImage:
+    def __init__(self, client: "FakeDockerClient", image_id: str, size: int):
+        self.client = client
+        self.id = image_id
+        self.tags: List[str] = []
+        self.attrs = {"Id": image_id, "Size": size}
+
+    def tag(self, repository: str, tag: Optional[str] = None, **kwargs) -> bool:
+        self.client._call("images.tag")
+        self.client.images._add_tag(self, f"{repository}:{tag or 'latest'}")
+        return True
+
+
+class FakeContainer:
+    def __init__(self, client: "FakeDockerClient", container_id: str, name: str, image: FakeImage, image_name: str,
+                 labels: Dict[str, str], network: Optional[str], environment: Optional[Dict] = None,
+                 nano_cpus: int = 0, mem_limit: int = 0):
+        self.client = client
+        self.id = container_id
+        self.name = name
+        self.image = image
+        self.labels = dict(labels)
+        self.status = "created"
+        self.attrs = {
+            "Id": container_id,
+            "Created": datetime.now(timezone.utc).isoformat(),
+            "Config": {"Image": image_name, "Labels": self.labels,
+                       "Env": [f"{key}={value}" for key, value in (environment or {}).items()]},
+            "State": {"Status": self.status, "Running": False},
+            "NetworkSettings": {"Networks": {}},
+            "HostConfig": {"NanoCpus": nano_cpus, "Memory": mem_limit}
+        }
+        self._network = network
+        self._cpu_total = 0
+
+    def _set_status(self, status: str):
+        self.status = status
+        running = status == "running"
+        self.attrs["State"] = {"Status": status, "Running": running}
+        networks = {}
+        if running and self._network:
+            networks[self._network] = {"IPAddress": self.client._next_ip()}
+        self.attrs["NetworkSettings"] = {"Networks": networks}
+
+    def reload(self):
+        self.client._call("containers.reload")
+
+    def start(self):
+        self.client._call("container.start")
+        with self.client._lock:
+            self._set_status("running")
+        self.client._emit("start", self)
+
+    def stop(self, timeout: Optional[int] = None):
+        self.client._call("container.stop")
+        with self.client._lock:
+            was_running = self.status == "running"
+            self._set_status("exited")
+        if was_running:
+            self.client._emit("die", self)
+            self.client._emit("stop", self)
+
+    def restart(self, timeout: Optional[int] = None):
+        self.client._call("container.restart")
+        with self.client._lock:
+            self._set_status("running")
+        self.client._emit("restart", self)
+
+    def remove(self, force: bool = False, **kwargs):
+        self.client._call("container.remove")
+        with self.client._lock:
+            if self.status == "running" and not force:
+                raise docker.errors.APIError(f"409 Conflict: a {self.name} konténer fut, előbb állítsd le")
+            self.client.containers._items.pop(self.id, None)
+            self.client.containers._names.pop(self.name, None)
+            self._set_status("removed")
+        self.client._emit("destroy", self)
+
+    def rename(self, name: str):
+        self.client._call("container.rename")
+        with self.client._lock:
+            if self.client.containers._by_name(name) is not None:
+                raise docker.errors.APIError(f"409 Conflict: a {name} név már foglalt")
+            self.client.containers._names.pop(self.name, None)
+            self.client.containers._names[name] = self.id
+            self.name = name
+        self.client._emit("rename", self)
+
+    def update(self, mem_limit: Optional[str] = None, nano_cpus: Optional[int] = None, **kwargs):
+        self.client._call("container.update")
+        with self.client._lock:
+            if mem_limit:
+                self.attrs["HostConfig"]["Memory"] = int(mem_limit.rstrip("m")) * 1024 * 1024
+            if nano_cpus is not None:
+                self.attrs["HostConfig"]["NanoCpus"] = nano_cpus
+        self.client._emit("update", self)
+        return {"Warnings": []}
+
+    def stats(self, stream: bool = False, **kwargs) -> Dict:
+        self.client._call("container.stats")
+        with self.client._lock:
+            previous = self._cpu_total
+            self._cpu_total += self.client._random.randint(10_000_000, 200_000_000)
+            current = self._cpu_total
+        system = int(time.time() * 1e9)
+        return {
+            "cpu_stats": {"cpu_usage": {"total_usage": current}, "system_cpu_usage": system, "online_cpus": 2},
+            "precpu_stats": {"cpu_usage": {"total_usage": previous}, "system_cpu_usage": system - 1_000_000_000},
+            "memory_stats": {"usage": 128 * 1024 * 1024, "stats": {"inactive_file": 16 * 1024 * 1024}}
+        }
+
+
+class FakeContainerCollection:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._items: Dict[str, FakeContainer] = {}
+        # név -> id; a /health adapter minden próbánál név szerint keres
+        self._names: Dict[str, str] = {}
+
+    def _by_name(self, name: str) -> Optional[FakeContainer]:
+        container_id = self._names.get(name)
+        return self._items.get(container_id) if container_id else None
+
+    def _add(self, container: FakeContainer):
+        self._items[container.id] = container
+        self._names[container.name] = container.id
+
+    def _find(self, container_id: str) -> Optional[FakeContainer]:
+        with self.client._lock:
+            return self._items.get(container_id) or self._by_name(container_id)
+
+    def get(self, container_id: str) -> FakeContainer:
+        self.client._call("containers.get")
+        container = self._find(container_id)
+        if container is None:
+            raise docker.errors.NotFound(f"No such container: {container_id}")
+        return container
+
+    @staticmethod
+    def _matches(container: FakeContainer, filters: Optional[Dict]) -> bool:
+        ancestor = (filters or {}).get("ancestor")
+        if ancestor and ancestor != container.image.id and ancestor not in container.image.tags:
+            return False
+        labels = (filters or {}).get("label") or []
+        for label in [labels] if isinstance(labels, str) else labels:
+            key, _, value = label.partition("=")
+            if key not in container.labels or (value and container.labels[key] != value):
+                return False
+        return True
+
+    def list(self, all: bool = False, filters: Optional[Dict] = None, **kwargs) -> List[FakeContainer]:
+        self.client._call("containers.list")
+        with self.client._lock:
+            return [c for c in self._items.values()
+                    if (all or c.status == "running") and self._matches(c, filters)]
+
+    def run(self, image: str, name: Optional[str] = None, labels: Optional[Dict] = None, detach: bool = False,
+            network: Optional[str] = None, environment: Optional[Dict] = None, nano_cpus: int = 0,
+            mem_limit: Optional[str] = None, **kwargs) -> FakeContainer:
+        self.client._call("containers.run")
+        with self.client._lock:
+            found = self.client.images._find(image)
+            if found is None:
+                raise docker.errors.ImageNotFound(f"No such image: {image}")
+            if name and self._by_name(name) is not None:
+                raise docker.errors.APIError(f"409 Conflict: a {name} név már foglalt")
+            container_id = self.client._next_id()
+            container = FakeContainer(
+                self.client, container_id, name or container_id[:12], found, image, labels or {}, network, environment,
+                nano_cpus, int(mem_limit.rstrip("m")) * 1024 * 1024 if mem_limit else 0
+            )
+            self._add(container)
+        self.client._emit("create", container)
+        with self.client._lock:
+            container._set_status("running")
+        self.client._emit("start", container)
+        return container
+
+
+class FakeImageCollection:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._by_tag: Dict[str, FakeImage] = {}
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+    def _find(self, name: str) -> Optional[FakeImage]:
+        return self._by_tag.get(self._normalize(name))
+
+    def _add_tag(self, image: FakeImage, tag: str):
+        with self.client._lock:
+            previous = self._by_tag.get(tag)
+            if previous is not None and previous is not image:
+                previous.tags.remove(tag)
+            if tag not in image.tags:
+                image.tags.append(tag)
+            self._by_tag[tag] = image
+
+    def _create(self, tag: str) -> FakeImage:
+        with self.client._lock:
+            image = self._find(tag)
+            if image is None:
+                image = FakeImage(self.client, f"sha256:{self.client._next_id()}",
+                                  self.client._random.randint(80, 400) * 1024 * 1024)
+                self._add_tag(image, self._normalize(tag))
+            return image
+
+    def pull(self, repository: str, tag: Optional[str] = None, **kwargs) -> FakeImage:
+        self.client._call("images.pull")
+        return self._create(f"{repository}:{tag}" if tag else repository)
+
+    def get(self, name: str) -> FakeImage:
+        self.client._call("images.get")
+        with self.client._lock:
+            image = self._find(name)
+        if image is None:
+            raise docker.errors.ImageNotFound(f"No such image: {name}")
+        return image
+
+    def list(self, name: Optional[str] = None, **kwargs) -> List[FakeImage]:
+        self.client._call("images.list")
+        with self.client._lock:
+            images = {id(image): image for image in self._by_tag.values()
+                      if name is None or any(t.rsplit(":", 1)[0] == name for t in image.tags)}
+        return list(images.values())
+
+    def remove(self, image: str, force: bool = False, **kwargs):
+        self.client._call("images.remove")
+        with self.client._lock:
+            tag = self._normalize(image)
+            found = self._by_tag.pop(tag, None)
+            if found is None:
+                raise docker.errors.ImageNotFound(f"No such image: {image}")
+            found.tags.remove(tag)
+
+
+class FakeNetwork:
+    def __init__(self, name: str):
+        self.name = name
+        self.id = hashlib.sha1(name.encode()).hexdigest()
+
+
+class FakeNetworkCollection:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._items: Dict[str, FakeNetwork] = {}
+
+    def list(self, names: Optional[List[str]] = None, **kwargs) -> List[FakeNetwork]:
+        self.client._call("networks.list")
+        with self.client._lock:
+            return [n for n in self._items.values() if names is None or n.name in names]
+
+    def create(self, name: str, driver: Optional[str] = None, **kwargs) -> FakeNetwork:
+        self.client._call("networks.create")
+        with self.client._lock:
+            return self._items.setdefault(name, FakeNetwork(name))
+
+
+class FakeEventStream:
+    """A docker SDK events() generátorának megfelelője; a close() másik szálból is hívható"""
+
+    _CLOSED = object()
+
+    def __init__(self, client: "FakeDockerClient", filters: Optional[Dict]):
+        self.client = client
+        self.filters = filters or {}
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def accepts(self, event: Dict) -> bool:
+        if self.filters.get("type") not in (None, event["Type"]):
+            return False
+        labels = self.filters.get("label") or []
+        attributes = event["Actor"]["Attributes"]
+        for label in [labels] if isinstance(labels, str) else labels:
+            key, _, value = label.partition("=")
+            if key not in attributes or (value and attributes[key] != value):
+                return False
+        return True
+
+    def put(self, event: Dict):
+        self._queue.put(event)
+
+    def __iter__(self):
+        while True:
+            event = self._queue.get()
+            if event is self._CLOSED:
+                return
+            yield event
+
+    def close(self):
+        self.client._unsubscribe(self)
+        self._queue.put(self._CLOSED)
+
+
+class FakeDockerClient:
+    """Memóriában futó Docker démon a docker SDK felületével.
+
+    Minden API hívás `latency` másodpercig tart (±`jitter` arányú véletlen szórással), és `failure_rate`
+    valószínűséggel APIError-ral hibázik; az events stream feliratkozás sosem hibázik. A seed rögzítésével
+    a késleltetések és hibák sorozata futásról futásra ugyanaz.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._ips = itertools.count(2)
+        self._subscribers: List[FakeEventStream] = []
+        # Az újracsatlakozó stream a since óta történt eseményeket is megkapja, mint a valódi démonnál
+        self._history: collections.deque = collections.deque(maxlen=10000)
+        self.calls: collections.Counter = collections.Counter()
+        self.failures: collections.Counter = collections.Counter()
+        self.containers = FakeContainerCollection(self)
+        self.images = FakeImageCollection(self)
+        self.networks = FakeNetworkCollection(self)
+
+    def _next_id(self) -> str:
+        return hashlib.sha256(str(next(self._ids)).encode()).hexdigest()
+
+    def _next_ip(self) -> str:
+        index = next(self._ips)
+        return f"172.20.{index // 250}.{index % 250 + 2}"
+
+    def _call(self, name: str, can_fail: bool = True):
+        with self._lock:
+            self.calls[name] += 1
+            delay = self.latency * (1 + self.jitter * self._random.uniform(-1, 1)) if self.latency else 0.0
+            failed = can_fail and self.failure_rate > 0 and self._random.random() < self.failure_rate
+            if failed:
+                self.failures[name] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise docker.errors.APIError(f"500 Server Error: szimulált Docker hiba ({name})")
+
+    # ------------------- EVENTS -------------------
+
+    def _emit(self, action: str, container: FakeContainer):
+        event = {
+            "Type": "container",
+            "Action": action,
+            "id": container.id,
+            "Actor": {"ID": container.id, "Attributes": {**container.labels, "name": container.name}},
+            "time": int(time.time())
+        }
+        with self._lock:
+            self._history.append(event)
+            subscribers = [s for s in self._subscribers if s.accepts(event)]
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def _unsubscribe(self, stream: FakeEventStream):
+        with self._lock:
+            if stream in self._subscribers:
+                self._subscribers.remove(stream)
+
+    def events(self, decode: bool = False, since: Optional[int] = None, filters: Optional[Dict] = None,
+               **kwargs) -> FakeEventStream:
+        self._call("events", can_fail=False)
+        stream = FakeEventStream(self, filters)
+        with self._lock:
+            if since is not None:
+                for event in self._history:
+                    if event["time"] >= since and stream.accepts(event):
+                        stream.put(event)
+            self._subscribers.append(stream)
+        return stream
+
+    # ------------------- FELTÖLTÉS -------------------
+
+    def populate(self, services: Iterable[str], slots: Tuple[str, ...] = SLOTS, version: str = "v0.1",
+                 network: str = "szakdoga2025_traefik-network"):
+        """Futó konténer minden slotra (késleltetés és hiba nélkül), mintha a compose indította volna"""
+        with self._lock:
+            self.networks._items.setdefault(network, FakeNetwork(network))
+            for service in services:
+                for slot in slots:
+                    name = f"szakdoga2025-{service}-{slot}"
+                    image = self.images._create(f"{name}:{version}")
+                    container_id = self._next_id()
+                    labels = {"service": service, "slot": slot, GROUP_LABEL: "true", REPLICA_LABEL: "0"}
+                    container = FakeContainer(self, container_id, name, image, f"{name}:{version}", labels, network)
+                    container._set_status("running")
+                    self.containers._add(container)
+
+    def running(self, name: str) -> bool:
+        """Fut-e a megadott nevű konténer (a /health adapter számára; nem API hívás)"""
+        with self._lock:
+            container = self.containers._by_name(name)
+            return container is not None and container.status == "running"
+
+    def close(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for stream in subscribers:
+            stream.close()
+
+
+# ------------------- KONTÉNER HTTP -------------------
+
+class FakeContainerAdapter(requests.adapters.BaseAdapter):
+    """A http://<konténer>:8000/... kérésekre a fake démon alapján válaszol"""
+
+    def __init__(self, docker_client: FakeDockerClient, latency: float = 0.0):
+        super().__init__()
+        self.docker_client = docker_client
+        self.latency = latency
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        host = urlsplit(request.url).hostname or ""
+        if not self.docker_client.running(host):
+            raise requests.ConnectionError(f"Nem elérhető: {host}")
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps({"status": "healthy", "in_flight": 0}).encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+# ------------------- HELYI HTTP SZERVEREK -------------------
+
+class _LocalServer(ABC):
+    """ThreadingHTTPServer a 127.0.0.1 egy szabad portján; a leszármazott a respond()-ot valósítja meg"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests: collections.Counter = collections.Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                parts = urlsplit(self.path)
+                status, headers, body = server.respond(parts.path, parse_qs(parts.query), self.headers)
+                server.requests[status] += 1
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @abstractmethod
+    def respond(self, path: str, query: Dict[str, List[str]], headers) -> Tuple[int, Dict[str, str], bytes]:
+        """Egy GET kérés válasza: (státusz, fejlécek, törzs)"""
+
+    def start(self) -> "_LocalServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeGitHubServer(_LocalServer):
+    """A GitHub REST API tag végpontjai: lapozás Link fejléccel, ETag és 304 válasz"""
+
+    def __init__(self, owner: str, repo: str, tags: Iterable[str], latency: float = 0.0):
+        super().__init__(latency)
+        self.repo_path = f"/repos/{owner}/{repo}"
+        # A GitHub a legújabb tagot adja elsőként
+        self.tags = list(reversed(list(tags)))
+
+    def respond(self, path, query, headers):
+        if path == self.repo_path:
+            return 200, {"Content-Type": "application/json"}, json.dumps({"full_name": self.repo_path[7:]}).encode()
+        if path != f"{self.repo_path}/tags":
+            return 404, {"Content-Type": "application/json"}, b'{"message": "Not Found"}'
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        items = [{"name": tag} for tag in self.tags[(page - 1) * per_page:page * per_page]]
+        body = json.dumps(items).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        response_headers = {"Content-Type": "application/json", "ETag": etag}
+        if page * per_page < len(self.tags):
+            response_headers["Link"] = f'<{self.url}{path}?per_page={per_page}&page={page + 1}>; rel="next"'
+        if headers.get("If-None-Match") == etag:
+            return 304, response_headers, b""
+        return 200, response_headers, body
+
+
+class FakeTraefikMetricsServer(_LocalServer):
+    """Traefik /metrics: minden slotra nulla nyitott kapcsolat, így a drain azonnal lefut"""
+
+    def __init__(self, services: Iterable[str], slots: Tuple[str, ...] = SLOTS, latency: float = 0.0):
+        super().__init__(latency)
+        lines = [
+            f'traefik_service_open_connections{{method="GET",protocol="http",service="szakdoga2025-{service}-{slot}@file"}} 0'
+            for service in services for slot in slots
+        ]
+        self.body = ("\n".join(lines) + "\n").encode()
+
+    @property
+    def url(self) -> str:
+        return f"{super().url}/metrics"
+
+    def respond(self, path, query, headers):
+        if path != "/metrics":
+            return 404, {"Content-Type": "text/plain"}, b"404 page not found\n"
+        return 200, {"Content-Type": "text/plain; version=0.0.4"}, self.body
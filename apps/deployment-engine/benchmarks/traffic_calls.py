@@ -0,0 +1,143 @@
+# apps/deployment-engine/benchmarks/traffic_calls.py
+#
+# Regressziós benchmark a /traffic végponthoz: megszámolja, hány Docker és HTTP
+# hívás jut egy kérésre, és hibával kilép, ha ez nem lineáris a slotok számában.
+#
+# Futtatás (apps/deployment-engine mappából):
+#   python benchmarks/traffic_calls.py
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import docker
+import requests
+import yaml
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+SERVICE_COUNTS = [3, 10, 30]
+SLOTS = ["blue", "green"]
+# Egy hideg /traffic kérés megengedett költsége slotonként:
+# get_container_info + get_image_version, illetve egy health check
+DOCKER_CALLS_PER_SLOT = 2
+HTTP_CALLS_PER_SLOT = 1
+# Kérésenként egyszer: a replikaszámok egyetlen containers.list hívásból
+DOCKER_CALLS_PER_REQUEST = 1
+
+calls = {"docker": 0, "http": 0}
+
+
+class _Image:
+    def __init__(self, tag: str):
+        self.tags = [tag]
+
+
+class _Container:
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "running"
+        self.image = _Image(f"{name}:v0.1")
+        self.attrs = {"NetworkSettings": {"Networks": {}}}
+
+
+class _Containers:
+    def get(self, name: str):
+        calls["docker"] += 1
+        return _Container(name)
+
+    def list(self, *args, **kwargs):
+        calls["docker"] += 1
+        return []
+
+
+class _Networks:
+    def list(self, *args, **kwargs):
+        return [object()]
+
+
+class _Client:
+    containers = _Containers()
+    networks = _Networks()
+
+
+class _Response:
+    status_code = 200
+    text = ""
+
+    def json(self):
+        return []
+
+
+def _fake_get(url, *args, **kwargs):
+    calls["http"] += 1
+    return _Response()
+
+
+def _write_config(path: str, services: list):
+    http_services = {}
+    for service in services:
+        name = f"szakdoga2025-{service}"
+        http_services[name] = {"weighted": {"services": [
+            {"name": f"{name}-blue", "weight": 50},
+            {"name": f"{name}-green", "weight": 50},
+        ]}}
+        for slot in SLOTS:
+            http_services[f"{name}-{slot}"] = {
+                "loadBalancer": {"servers": [{"url": f"http://{name}-{slot}:8000"}]}
+            }
+    with open(path, "w") as file:
+        yaml.safe_dump({"http": {"services": http_services}}, file, sort_keys=False)
+
+
+def main() -> int:
+    config_dir = tempfile.mkdtemp(prefix="traffic-bench-")
+    os.environ["TRAEFIK_DYNAMIC_CONFIG"] = os.path.join(config_dir, "services.yml")
+    os.environ.setdefault("GIT_REPO_URL", "https://github.com/gabor00/Szakdoga2025")
+
+    docker.from_env = lambda *args, **kwargs: _Client()
+    requests.get = _fake_get
+    # A motor a közös, keep-alive session-ön keresztül hív
+    requests.Session.get = lambda self, url, *args, **kwargs: _fake_get(url, *args, **kwargs)
+
+    import main as engine
+    from state_backend import InMemoryStateBackend, ServiceStateStore
+    # A motor a Docker klienst csak induláskor (lifespan) köti be
+    engine.connect_docker()
+
+    failed = False
+    for count in SERVICE_COUNTS:
+        services = [f"microservice{i}" for i in range(1, count + 1)]
+        _write_config(os.environ["TRAEFIK_DYNAMIC_CONFIG"], services)
+        engine.service_states = ServiceStateStore(InMemoryStateBackend(), services, tuple(SLOTS))
+        for service in services:
+            for slot in SLOTS:
+                engine.service_states.update(service, slot, version="v0.1")
+
+        # Hideg kérés: a pillanatkép elavult, tehát egy teljes diagnosztikai kört fizetünk
+        engine.status_store.invalidate()
+        calls["docker"] = calls["http"] = 0
+        started = time.perf_counter()
+        result = asyncio.run(engine.get_traffic_config())
+        elapsed = time.perf_counter() - started
+
+        slots = count * len(SLOTS)
+        ok = (
+            len(result) == count
+            and calls["docker"] <= slots * DOCKER_CALLS_PER_SLOT + DOCKER_CALLS_PER_REQUEST
+            and calls["http"] <= slots * HTTP_CALLS_PER_SLOT
+        )
+        failed = failed or not ok
+        print(f"{count:>4} szolgáltatás: docker={calls['docker']:>4} "
+              f"(max {slots * DOCKER_CALLS_PER_SLOT + DOCKER_CALLS_PER_REQUEST}), http={calls['http']:>4} "
+              f"(max {slots * HTTP_CALLS_PER_SLOT}), {elapsed * 1000:.1f} ms "
+              f"{'OK' if ok else 'HIBA'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
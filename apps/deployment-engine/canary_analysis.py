@@ -0,0 +1,218 @@
+# apps/deployment-engine/canary_analysis.py
+
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from async_clients import http_session
+
+logger = logging.getLogger(__name__)
+
+TRAEFIK_METRICS_URL = os.getenv("TRAEFIK_METRICS_URL", "http://szakdoga2025-traefik:8080/metrics")
+CANARY_SCRAPE_INTERVAL = float(os.getenv("CANARY_SCRAPE_INTERVAL", "10.0"))
+# A csúszó ablak hossza másodpercben
+CANARY_WINDOW = float(os.getenv("CANARY_WINDOW", "300.0"))
+# Ennyi kérés alatt nincs elég adat a döntéshez
+CANARY_MIN_REQUESTS = int(os.getenv("CANARY_MIN_REQUESTS", "50"))
+# A jelölt p95 késleltetése legfeljebb ennyivel lehet rosszabb (arány és abszolút ms)
+CANARY_LATENCY_TOLERANCE = float(os.getenv("CANARY_LATENCY_TOLERANCE", "0.2"))
+CANARY_LATENCY_MIN_DIFF_MS = float(os.getenv("CANARY_LATENCY_MIN_DIFF_MS", "20"))
+# A jelölt 5xx aránya legfeljebb ennyivel lehet magasabb (abszolút arány)
+CANARY_ERROR_TOLERANCE = float(os.getenv("CANARY_ERROR_TOLERANCE", "0.01"))
+
+SLOTS = ["blue", "green"]
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+_SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_prometheus(text: str) -> List[Tuple[str, Dict[str, str], float]]:
+    """Prometheus text formátum minták (név, címkék, érték) listájává"""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_RE.match(line)
+        if not match:
+            continue
+        name, raw_labels, value = match.groups()
+        labels = dict(_LABEL_RE.findall(raw_labels or ""))
+        try:
+            samples.append((name, labels, float(value)))
+        except ValueError:
+            continue
+    return samples
+
+
+def _slot_of(traefik_service: str) -> Optional[Tuple[str, str]]:
+    """szakdoga2025-<service>-<slot>@file -> (service, slot)"""
+    name = traefik_service.split("@", 1)[0]
+    if not name.startswith("szakdoga2025-"):
+        return None
+    for slot in SLOTS:
+        if name.endswith(f"-{slot}"):
+            return name[len("szakdoga2025-"):-len(slot) - 1], slot
+    return None
+
+
+class SlotCounters:
+    """Egy slot kumulatív Traefik számlálói egy adott időpontban"""
+
+    def __init__(self):
+        self.buckets: Dict[float, float] = {}
+        self.requests = 0.0
+        self.errors = 0.0
+
+    def delta(self, older: Optional["SlotCounters"]) -> "SlotCounters":
+        result = SlotCounters()
+        # Számláló reset (Traefik újraindulás) esetén a friss értéket vesszük
+        if older is None or self.requests < older.requests:
+            older = SlotCounters()
+        result.requests = self.requests - older.requests
+        result.errors = max(self.errors - older.errors, 0.0)
+        result.buckets = {le: max(count - older.buckets.get(le, 0.0), 0.0) for le, count in self.buckets.items()}
+        return result
+
+
+def histogram_quantile(q: float, buckets: Dict[float, float]) -> Optional[float]:
+    """Kvantilis becslése kumulatív bucketekből, lineáris interpolációval (mint a PromQL)"""
+    if not buckets:
+        return None
+    ordered = sorted(buckets.items())
+    total = ordered[-1][1]
+    if total <= 0:
+        return None
+    rank = q * total
+    prev_le, prev_count = 0.0, 0.0
+    for le, count in ordered:
+        if count >= rank:
+            if math.isinf(le):
+                return prev_le
+            if count == prev_count:
+                return le
+            return prev_le + (le - prev_le) * (rank - prev_count) / (count - prev_count)
+        prev_le, prev_count = le, count
+    return ordered[-1][0]
+
+
+class CanaryAnalyzer:
+    """Traefik metrikák alapján slotonkénti késleltetés és hibaarány egy csúszó ablakban."""
+
+    def __init__(self, metrics_url: str = TRAEFIK_METRICS_URL, window: float = CANARY_WINDOW,
+                 interval: float = CANARY_SCRAPE_INTERVAL):
+        self.metrics_url = metrics_url
+        self.window = window
+        self.interval = interval
+        self.samples: Deque[Tuple[float, Dict[Tuple[str, str], SlotCounters]]] = deque()
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------- GYŰJTÉS -------------------
+
+    def scrape(self) -> Dict[Tuple[str, str], SlotCounters]:
+        """Egy Traefik /metrics lekérés feldolgozása (blokkoló)"""
+        response = http_session.get(self.metrics_url, timeout=2)
+        response.raise_for_status()
+        counters: Dict[Tuple[str, str], SlotCounters] = {}
+        for name, labels, value in parse_prometheus(response.text):
+            key = _slot_of(labels.get("service", ""))
+            if key is None:
+                continue
+            slot_counters = counters.setdefault(key, SlotCounters())
+            if name == "traefik_service_request_duration_seconds_bucket":
+                le = float(labels["le"])
+                # Több code/method sorozat bucketjei összeadódnak
+                slot_counters.buckets[le] = slot_counters.buckets.get(le, 0.0) + value
+            elif name == "traefik_service_requests_total":
+                slot_counters.requests += value
+                if labels.get("code", "").startswith("5"):
+                    slot_counters.errors += value
+        return counters
+
+    def record(self, counters: Dict[Tuple[str, str], SlotCounters], at: Optional[float] = None):
+        now = at if at is not None else time.time()
+        self.samples.append((now, counters))
+        # Egy mintát az ablakon kívül is megtartunk, az lesz a különbség alapja
+        while len(self.samples) > 2 and self.samples[1][0] <= now - self.window:
+            self.samples.popleft()
+
+    async def _run(self):
+        while True:
+            try:
+                counters = await asyncio.to_thread(self.scrape)
+                self.record(counters)
+                self.last_error = None
+            except Exception as e:
+                if self.last_error != str(e):
+                    logger.warning(f"Nem sikerült lekérni a Traefik metrikákat: {e}")
+                self.last_error = str(e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------- KIÉRTÉKELÉS -------------------
+
+    def slot_stats(self, service: str, slot: str) -> Dict:
+        """p50/p95/p99 (ms), kérésszám, RPS és 5xx arány az ablakban"""
+        stats = {"requests": 0, "rps": 0.0, "error_rate": None, "p50": None, "p95": None, "p99": None}
+        if not self.samples:
+            return stats
+        newest_at, newest = self.samples[-1]
+        oldest_at, oldest = self.samples[0]
+        current = newest.get((service, slot))
+        if current is None:
+            return stats
+        delta = current.delta(oldest.get((service, slot)) if len(self.samples) > 1 else None)
+        elapsed = newest_at - oldest_at
+        stats["requests"] = int(delta.requests)
+        stats["rps"] = round(delta.requests / elapsed, 3) if elapsed > 0 else 0.0
+        if delta.requests > 0:
+            stats["error_rate"] = round(delta.errors / delta.requests, 4)
+        for key, q in QUANTILES.items():
+            value = histogram_quantile(q, delta.buckets)
+            stats[key] = round(value * 1000, 2) if value is not None else None
+        return stats
+
+    def service_stats(self, service: str) -> Dict:
+        return {slot: self.slot_stats(service, slot) for slot in SLOTS}
+
+    def compare(self, service: str, candidate: str) -> Dict:
+        """A jelölt slot összevetése a másikkal; ok=False, ha mérhetően lassabb vagy hibásabb"""
+        baseline = "green" if candidate == "blue" else "blue"
+        cand = self.slot_stats(service, candidate)
+        base = self.slot_stats(service, baseline)
+        verdict = {"service": service, "candidate": candidate, "baseline": baseline,
+                   "candidate_stats": cand, "baseline_stats": base, "ok": True, "reason": None}
+
+        if cand["requests"] < CANARY_MIN_REQUESTS or base["requests"] < CANARY_MIN_REQUESTS:
+            verdict["reason"] = "Nincs elég adat az összevetéshez"
+            return verdict
+
+        if cand["p95"] is not None and base["p95"] is not None:
+            limit = base["p95"] * (1 + CANARY_LATENCY_TOLERANCE)
+            if cand["p95"] > limit and cand["p95"] - base["p95"] > CANARY_LATENCY_MIN_DIFF_MS:
+                verdict["ok"] = False
+                verdict["reason"] = f"A {candidate} slot p95 késleltetése {cand['p95']}ms, a {baseline} sloté {base['p95']}ms"
+                return verdict
+
+        if (cand["error_rate"] or 0.0) > (base["error_rate"] or 0.0) + CANARY_ERROR_TOLERANCE:
+            verdict["ok"] = False
+            verdict["reason"] = f"A {candidate} slot 5xx aránya {cand['error_rate']}, a {baseline} sloté {base['error_rate']}"
+        return verdict
@@ -0,0 +1,264 @@
+# apps/deployment-engine/container_tracker.py
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+GROUP_LABEL = "szakdoga2025.group"
+# A visszaállításra megtartott előző verzió konténerének névutótagja
+STANDBY_SUFFIX = "-standby"
+# A visszaállítás alatt a slot előző konténere ideiglenesen ezt a nevet kapja
+STANDBY_SWAP_SUFFIX = f"{STANDBY_SUFFIX}-swap"
+# A slot hányadik replikája a konténer (címke hiányában 0)
+REPLICA_LABEL = "szakdoga2025.replica"
+# Ezekre az eseményekre frissítjük a konténer rekordját
+REFRESH_ACTIONS = {"create", "start", "restart", "unpause", "rename", "update"}
+STOP_ACTIONS = {"die", "stop", "kill", "oom", "pause"}
+RECONNECT_DELAY = 2.0
+
+
+def is_standby(name: str) -> bool:
+    """Standby (vagy visszaállítás közbeni ideiglenes) konténer: nem a slot aktív replikája"""
+    return name.endswith(STANDBY_SUFFIX) or name.endswith(STANDBY_SWAP_SUFFIX)
+
+
+class ContainerRecord:
+    """Egy slot konténerének utolsó ismert állapota"""
+
+    def __init__(self, container_id: str, name: str, service: str, slot: str, status: str,
+                 image: Optional[str], ip_address: Optional[str], health: Optional[str],
+                 created: Optional[str], labels: Optional[Dict] = None, replica: int = 0):
+        self.id = container_id
+        self.name = name
+        self.service = service
+        self.slot = slot
+        self.replica = replica
+        self.status = status
+        self.image = image
+        self.ip_address = ip_address
+        self.health = health
+        self.created = created
+        self.labels = labels or {}
+        self.updated_at = time.time()
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def version(self) -> Optional[str]:
+        if self.image and ":" in self.image:
+            return self.image.split(":")[-1]
+        return None
+
+
+class ContainerTracker:
+    """Docker events stream alapján karbantartott (service, slot, replika) -> konténer index."""
+
+    def __init__(self, client, network_name: str):
+        self.client = client
+        self.network_name = network_name
+        self._index: Dict[Tuple[str, str, int], ContainerRecord] = {}
+        self._by_id: Dict[str, Tuple[str, str, int]] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ContainerRecord], None]] = []
+        self._stream = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.synced = threading.Event()
+
+    # ------------------- OLVASÁS -------------------
+
+    def get(self, service: str, slot: str, replica: int = 0) -> Optional[ContainerRecord]:
+        with self._lock:
+            return self._index.get((service, slot, replica))
+
+    def replicas(self, service: str, slot: str) -> List[ContainerRecord]:
+        """A slot összes replikája index szerint rendezve"""
+        with self._lock:
+            records = [r for key, r in self._index.items() if key[0] == service and key[1] == slot]
+        return sorted(records, key=lambda r: r.replica)
+
+    def get_by_name(self, container_name: str) -> Optional[ContainerRecord]:
+        with self._lock:
+            return next((r for r in self._index.values() if r.name == container_name), None)
+
+    def records(self) -> List[ContainerRecord]:
+        with self._lock:
+            return list(self._index.values())
+
+    @property
+    def active(self) -> bool:
+        """Akkor hiteles az index, ha a kezdeti szinkron lefutott és a stream él"""
+        return self.synced.is_set() and not self._stopped.is_set()
+
+    def add_listener(self, callback: Callable[[ContainerRecord], None]):
+        """Minden állapotváltozásnál meghívódik (a tracker szálán!)"""
+        self._listeners.append(callback)
+
+    # ------------------- KARBANTARTÁS -------------------
+
+    def _record_from_container(self, container) -> Optional[ContainerRecord]:
+        labels = container.labels or {}
+        service, slot = labels.get("service"), labels.get("slot")
+        # A standby konténer ugyanazokat a címkéket viseli, de nem a slot aktív konténere
+        if not service or not slot or is_standby(container.name):
+            return None
+        try:
+            replica = int(labels.get(REPLICA_LABEL, "0"))
+        except ValueError:
+            replica = 0
+        attrs = container.attrs
+        networks = attrs.get("NetworkSettings", {}).get("Networks", {}) or {}
+        ip_address = networks.get(self.network_name, {}).get("IPAddress") or None
+        health = (attrs.get("State", {}).get("Health") or {}).get("Status")
+        return ContainerRecord(
+            container_id=container.id,
+            name=container.name,
+            service=service,
+            slot=slot,
+            status=container.status,
+            image=attrs.get("Config", {}).get("Image"),
+            ip_address=ip_address if container.status == "running" else None,
+            health=health,
+            created=attrs.get("Created"),
+            labels=labels,
+            replica=replica
+        )
+
+    def _store(self, record: ContainerRecord):
+        key = (record.service, record.slot, record.replica)
+        with self._lock:
+            old = self._index.get(key)
+            if old is not None and old.id != record.id:
+                self._by_id.pop(old.id, None)
+            self._index[key] = record
+            self._by_id[record.id] = key
+        self._notify(record)
+
+    def _remove(self, container_id: str):
+        with self._lock:
+            key = self._by_id.pop(container_id, None)
+            record = self._index.get(key) if key else None
+            if record is not None and record.id == container_id:
+                del self._index[key]
+            else:
+                record = None
+        if record is not None:
+            record.status = "removed"
+            self._notify(record)
+
+    def _notify(self, record: ContainerRecord):
+        for callback in self._listeners:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"Hiba a konténer esemény feldolgozásakor: {e}")
+
+    def resync(self):
+        """Teljes újraszinkronizálás egyetlen containers.list hívással"""
+        containers = self.client.containers.list(all=True, filters={"label": f"{GROUP_LABEL}=true"})
+        seen = set()
+        for container in containers:
+            record = self._record_from_container(container)
+            if record is not None:
+                seen.add(record.id)
+                self._store(record)
+        with self._lock:
+            missing = [cid for cid in self._by_id if cid not in seen]
+        for container_id in missing:
+            self._remove(container_id)
+        self.synced.set()
+        logger.info(f"Konténer index szinkronizálva: {len(seen)} konténer")
+
+    def _refresh(self, container_id: str):
+        try:
+            container = self.client.containers.get(container_id)
+        except docker.errors.NotFound:
+            self._remove(container_id)
+            return
+        record = self._record_from_container(container)
+        if record is not None:
+            self._store(record)
+        else:
+            # Pl. átnevezés standby-ra: már nem a slot konténere
+            self._remove(container_id)
+
+    def _handle_event(self, event: Dict):
+        if event.get("Type") != "container":
+            return
+        action = event.get("Action", "")
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not container_id:
+            return
+
+        if action == "destroy":
+            self._remove(container_id)
+        elif action in STOP_ACTIONS:
+            # A die eseményből azonnal tudjuk az állapotot, nem kell újra lekérdezni
+            with self._lock:
+                key = self._by_id.get(container_id)
+                record = self._index.get(key) if key else None
+            if record is None:
+                self._refresh(container_id)
+                return
+            record.status = "paused" if action == "pause" else "exited"
+            record.ip_address = None
+            record.updated_at = time.time()
+            self._notify(record)
+            if action == "die":
+                logger.warning(f"A {record.name} konténer leállt (exitCode={event.get('Actor', {}).get('Attributes', {}).get('exitCode')})")
+        elif action.startswith("health_status"):
+            with self._lock:
+                key = self._by_id.get(container_id)
+                record = self._index.get(key) if key else None
+            if record is None:
+                self._refresh(container_id)
+                return
+            record.health = action.split(":", 1)[-1].strip()
+            record.updated_at = time.time()
+            self._notify(record)
+        elif action in REFRESH_ACTIONS:
+            self._refresh(container_id)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                since = int(time.time())
+                self.resync()
+                self._stream = self.client.events(
+                    decode=True,
+                    since=since,
+                    filters={"type": "container", "label": f"{GROUP_LABEL}=true"}
+                )
+                for event in self._stream:
+                    self._handle_event(event)
+                    if self._stopped.is_set():
+                        break
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                logger.error(f"Docker events stream megszakadt: {e}")
+            finally:
+                self.synced.clear()
+            self._stopped.wait(RECONNECT_DELAY)
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="container-tracker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+        self._thread = None
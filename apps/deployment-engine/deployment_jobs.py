@@ -0,0 +1,467 @@
+# apps/deployment-engine/deployment_jobs.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from state_backend import StateBackend
+from structured_logging import log_context
+
+logger = logging.getLogger(__name__)
+
+DEPLOYMENT_DB_PATH = os.getenv("DEPLOYMENT_DB_PATH", "deployment_jobs.db")
+# Egyszerre ennyi deployment futhat (különböző slotokon)
+DEPLOYMENT_WORKERS = int(os.getenv("DEPLOYMENT_WORKERS", "4"))
+# A várakozó jobok maximális száma; efölött a /deploy elutasít
+DEPLOYMENT_QUEUE_SIZE = int(os.getenv("DEPLOYMENT_QUEUE_SIZE", "100"))
+# Batch deploy esetén egyszerre ennyi image letöltés futhat
+BATCH_PULL_CONCURRENCY = int(os.getenv("BATCH_PULL_CONCURRENCY", "3"))
+# A vezető worker ilyen gyakran veszi át a többi worker által beküldött jobokat (másodperc)
+DEPLOYMENT_POLL_INTERVAL = float(os.getenv("DEPLOYMENT_POLL_INTERVAL", "1.0"))
+
+FINISHED_STATES = ("active", "failed")
+
+
+class DeploymentJob:
+    """Egy deployment és fázisainak időzítése"""
+
+    def __init__(self, job_id: str, service: str, version: str, slot: str, status: str = "queued",
+                 phase: Optional[str] = None, phases: Optional[Dict[str, float]] = None,
+                 error: Optional[str] = None, created_at: Optional[float] = None,
+                 started_at: Optional[float] = None, finished_at: Optional[float] = None,
+                 attempts: int = 0, batch_id: Optional[str] = None):
+        self.id = job_id
+        self.service = service
+        self.version = version
+        self.slot = slot
+        self.status = status
+        self.phase = phase
+        self.phases = phases or {}
+        self.error = error
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.attempts = attempts
+        self.batch_id = batch_id
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict:
+        return {
+            "deployment_id": self.id,
+            "service": self.service,
+            "version": self.version,
+            "slot": self.slot,
+            "status": self.status,
+            "phase": self.phase,
+            "phases": self.phases,
+            "time_to_ready": self.phases.get("ready"),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "attempts": self.attempts,
+            "batch_id": self.batch_id
+        }
+
+
+class DeploymentJobStore:
+    """A deployment jobok tartós naplója SQLite-ban"""
+
+    def __init__(self, path: str = DEPLOYMENT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS deployment_jobs (
+                id TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                version TEXT NOT NULL,
+                slot TEXT NOT NULL,
+                status TEXT NOT NULL,
+                phase TEXT,
+                phases TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                batch_id TEXT
+            )
+        """)
+        # Régebbi adatbázis: a batch_id oszlop később került be
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(deployment_jobs)")]
+        if "batch_id" not in columns:
+            self._conn.execute("ALTER TABLE deployment_jobs ADD COLUMN batch_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_deployment_jobs_status ON deployment_jobs(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_deployment_jobs_batch ON deployment_jobs(batch_id)")
+        self._conn.commit()
+
+    def insert_many(self, jobs: List[DeploymentJob]):
+        """Új jobok egy tranzakcióban: egy batch jobjai egyszerre válnak láthatóvá a többi worker számára.
+        Sima INSERT: ütköző azonosító hibát ad, nem írja felül a meglévő jobot."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO deployment_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(job.id, job.service, job.version, job.slot, job.status, job.phase, json.dumps(job.phases),
+                  job.error, job.created_at, job.started_at, job.finished_at, job.attempts, job.batch_id)
+                 for job in jobs]
+            )
+            self._conn.commit()
+
+    def save(self, job: DeploymentJob):
+        self.save_many([job])
+
+    def save_many(self, jobs: List[DeploymentJob]):
+        """Meglévő jobok állapotának mentése"""
+        with self._lock:
+            self._conn.executemany(
+                """UPDATE deployment_jobs SET status = ?, phase = ?, phases = ?, error = ?, started_at = ?,
+                   finished_at = ?, attempts = ? WHERE id = ?""",
+                [(job.status, job.phase, json.dumps(job.phases), job.error, job.started_at, job.finished_at,
+                  job.attempts, job.id) for job in jobs]
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _from_row(row) -> DeploymentJob:
+        return DeploymentJob(row[0], row[1], row[2], row[3], status=row[4], phase=row[5],
+                             phases=json.loads(row[6]), error=row[7], created_at=row[8],
+                             started_at=row[9], finished_at=row[10], attempts=row[11], batch_id=row[12])
+
+    def get(self, job_id: str) -> Optional[DeploymentJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM deployment_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def list(self, limit: int = 50) -> List[DeploymentJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM deployment_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def batch(self, batch_id: str) -> List[DeploymentJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM deployment_jobs WHERE batch_id = ? ORDER BY created_at, id", (batch_id,)
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def unfinished(self) -> List[DeploymentJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM deployment_jobs WHERE status NOT IN (?, ?) ORDER BY created_at",
+                FINISHED_STATES
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DeploymentJobQueue:
+    """Korlátos worker pool, (service, slot) szintű zárral és tartós job naplóval.
+
+    A jobokat csak a vezető worker futtatja (start); a többi worker a közös naplóba írja a beküldött
+    jobokat, ahonnan a vezető pollozással veszi át őket.
+    """
+
+    def __init__(self, pull: Callable[[DeploymentJob, "DeploymentJobQueue"], Awaitable[bool]],
+                 swap: Callable[[DeploymentJob, "DeploymentJobQueue"], Awaitable[None]],
+                 store: DeploymentJobStore, workers: int = DEPLOYMENT_WORKERS,
+                 queue_size: int = DEPLOYMENT_QUEUE_SIZE,
+                 pull_concurrency: int = BATCH_PULL_CONCURRENCY,
+                 poll_interval: float = DEPLOYMENT_POLL_INTERVAL,
+                 on_change: Optional[Callable[[DeploymentJob], None]] = None,
+                 backend: Optional[StateBackend] = None):
+        self.pull = pull
+        self.swap = swap
+        self.store = store
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pull_concurrency = pull_concurrency
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self.backend = backend
+        self.jobs: Dict[str, DeploymentJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    @asynccontextmanager
+    async def slot_lock(self, service: str, slot: str):
+        """Egy slotra egyszerre csak egy művelet futhat; közös backendnél a többi workerrel együtt"""
+        async with self._locks.setdefault((service, slot), asyncio.Lock()):
+            if self.backend is None or not self.backend.shared:
+                yield
+                return
+            async with self.backend.async_lock(f"slot-{service}-{slot}"):
+                yield
+
+    # ------------------- JOB KEZELÉS -------------------
+
+    def _new_job(self, service: str, version: str, slot: str, batch_id: Optional[str] = None) -> DeploymentJob:
+        return DeploymentJob(uuid.uuid4().hex, service, version, slot, batch_id=batch_id)
+
+    @property
+    def running(self) -> bool:
+        """Ez a worker futtatja-e a jobokat"""
+        return self._queue is not None
+
+    async def _check_capacity(self, count: int):
+        if self.running:
+            if self._queue.full():
+                raise asyncio.QueueFull
+            return
+        # Nem vezető workerben a közös napló várakozó jobjai számítanak a sor hosszába
+        if len(await asyncio.to_thread(self.store.unfinished)) + count > self.queue_size:
+            raise asyncio.QueueFull
+
+    async def _submit(self, jobs: List[DeploymentJob], entry):
+        """A jobok naplózása, majd (vezető workerben) sorba állítása; QueueFull, ha a sor megtelt"""
+        await self._check_capacity(len(jobs))
+        # A naplóba írás a sorba állítás előtt történik, hogy a worker frissítése ne előzze meg
+        await asyncio.to_thread(self.store.insert_many, jobs)
+        if self.on_change:
+            for job in jobs:
+                self.on_change(job)
+        if not self.running:
+            return
+        for job in jobs:
+            self.jobs[job.id] = job
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            # Az írás alatt a sor megtelt: a naplóban maradt jobok nem futhatnak le
+            for job in jobs:
+                self.jobs.pop(job.id, None)
+                await self.update(job, status="failed", error="A deployment sor megtelt")
+            raise
+
+    async def submit(self, service: str, version: str, slot: str) -> DeploymentJob:
+        """Új job sorba állítása; QueueFull kivételt dob, ha a sor megtelt"""
+        job = self._new_job(service, version, slot)
+        await self._submit([job], job.id)
+        logger.info(f"Deployment sorba állítva: {job.id}")
+        return job
+
+    async def submit_batch(self, items: List[Tuple[str, str, str]]) -> Tuple[str, List[DeploymentJob]]:
+        """Több (service, version, slot) deploy egy egységként: párhuzamos pull, majd csere"""
+        if len({(service, slot) for service, _, slot in items}) != len(items):
+            raise ValueError("Egy batch-en belül egy slot csak egyszer szerepelhet")
+        batch_id = f"batch-{uuid.uuid4().hex}"
+        jobs = [self._new_job(service, version, slot, batch_id) for service, version, slot in items]
+        await self._submit(jobs, tuple(job.id for job in jobs))
+        logger.info(f"Batch deployment sorba állítva: {batch_id} ({len(jobs)} szolgáltatás)")
+        return batch_id, jobs
+
+    async def get(self, job_id: str) -> Optional[DeploymentJob]:
+        job = self.jobs.get(job_id)
+        return job if job is not None else await asyncio.to_thread(self.store.get, job_id)
+
+    async def list(self, limit: int = 50) -> List[DeploymentJob]:
+        return await asyncio.to_thread(self.store.list, limit)
+
+    async def active(self) -> List[DeploymentJob]:
+        """A folyamatban lévő jobok; a más worker által futtatottak a közös naplóból"""
+        return [self.jobs.get(job.id, job) for job in await asyncio.to_thread(self.store.unfinished)]
+
+    async def batch(self, batch_id: str) -> Optional[Dict]:
+        """Egy batch összesített eredménye"""
+        jobs = [self.jobs.get(job.id, job) for job in await asyncio.to_thread(self.store.batch, batch_id)]
+        if not jobs:
+            return None
+        if not all(job.finished for job in jobs):
+            status = "deploying"
+        elif all(job.status == "active" for job in jobs):
+            status = "active"
+        else:
+            status = "failed"
+        started = [job.started_at for job in jobs if job.started_at]
+        finished = [job.finished_at for job in jobs if job.finished_at]
+        return {
+            "batch_id": batch_id,
+            "status": status,
+            "duration": round(max(finished) - min(started), 3) if status != "deploying" and started and finished else None,
+            "deployments": [job.to_dict() for job in jobs]
+        }
+
+    async def _save(self, job: DeploymentJob):
+        # A SQLite commit a korlátos szálkészleten fut, nem az event loopon
+        await asyncio.to_thread(self.store.save, job)
+        if self.on_change:
+            self.on_change(job)
+
+    async def update(self, job: DeploymentJob, **fields):
+        for key, value in fields.items():
+            setattr(job, key, value)
+        await self._save(job)
+
+    @asynccontextmanager
+    async def phase(self, job: DeploymentJob, name: str):
+        """Egy fázis időtartamának mérése és mentése"""
+        await self.update(job, phase=name)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            job.phases[name] = round(time.monotonic() - started, 3)
+            await self._save(job)
+
+    # ------------------- WORKEREK -------------------
+
+    async def _begin(self, job: DeploymentJob):
+        await self.update(job, status="deploying", started_at=time.time(), attempts=job.attempts + 1)
+
+    async def _finish(self, job: DeploymentJob):
+        if not job.finished:
+            job.status = "failed"
+        await self.update(job, phase=None, finished_at=time.time())
+        # A befejezett jobokat már csak a tartós naplóból szolgáljuk ki
+        self.jobs.pop(job.id, None)
+
+    async def _guarded(self, job: DeploymentJob, step) -> bool:
+        # A lépés közben keletkező naplórekordok a deployment azonosítóját is hordozzák
+        with log_context(deployment_id=job.id, service=job.service, slot=job.slot):
+            try:
+                result = await step(job, self)
+                return result is not False
+            except Exception as e:
+                logger.error(f"Deployment hiba ({job.id}): {e}")
+                await self.update(job, status="failed", error=str(e))
+                return False
+
+    async def _run_single(self, job: DeploymentJob):
+        async with self.slot_lock(job.service, job.slot):
+            await self._begin(job)
+            if await self._guarded(job, self.pull):
+                await self._guarded(job, self.swap)
+            await self._finish(job)
+
+    async def _run_batch(self, jobs: List[DeploymentJob]):
+        for job in jobs:
+            await self._begin(job)
+
+        # Először minden image letöltése párhuzamosan; a futó konténerekhez még nem nyúlunk
+        semaphore = asyncio.Semaphore(self.pull_concurrency)
+
+        async def pull(job: DeploymentJob) -> bool:
+            async with semaphore:
+                return await self._guarded(job, self.pull)
+
+        pulled = await asyncio.gather(*(pull(job) for job in jobs))
+        if not all(pulled):
+            failed = ", ".join(job.service for job, ok in zip(jobs, pulled) if not ok)
+            for job, ok in zip(jobs, pulled):
+                if ok:
+                    await self.update(job, status="failed", error=f"Batch megszakítva, sikertelen pull: {failed}")
+                await self._finish(job)
+            logger.error(f"Batch deployment megszakítva, sikertelen pull: {failed}")
+            return
+
+        # Csak ha minden pull sikerült, cseréljük a konténereket (slotonként zárolva)
+        async def swap(job: DeploymentJob):
+            async with self.slot_lock(job.service, job.slot):
+                await self._guarded(job, self.swap)
+                await self._finish(job)
+
+        await asyncio.gather(*(swap(job) for job in jobs))
+
+    async def _worker(self):
+        while True:
+            entry = await self._queue.get()
+            try:
+                if isinstance(entry, tuple):
+                    jobs = [self.jobs[job_id] for job_id in entry if job_id in self.jobs]
+                    if jobs:
+                        await self._run_batch(jobs)
+                elif entry in self.jobs:
+                    await self._run_single(self.jobs[entry])
+            except Exception as e:
+                logger.error(f"Váratlan hiba a deployment workerben: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _enqueue(self, jobs: List[DeploymentJob]):
+        """A naplóból átvett jobok sorba állítása; egy batch jobjai együtt maradnak"""
+        batches: Dict[str, List[str]] = {}
+        entries = []
+        for job in jobs:
+            self.jobs[job.id] = job
+            if job.batch_id:
+                if job.batch_id not in batches:
+                    batches[job.batch_id] = []
+                    entries.append(batches[job.batch_id])
+                batches[job.batch_id].append(job.id)
+            else:
+                entries.append(job.id)
+        for entry in entries:
+            try:
+                self._queue.put_nowait(tuple(entry) if isinstance(entry, list) else entry)
+            except asyncio.QueueFull:
+                for job_id in (entry if isinstance(entry, list) else [entry]):
+                    job = self.jobs.pop(job_id)
+                    await self.update(job, status="failed", error="A deployment sor megtelt")
+
+    async def _recover(self):
+        """Újraindulás (vagy vezetőváltás) előtt félbemaradt jobok: elölről futtatjuk őket"""
+        recovered = await asyncio.to_thread(self.store.unfinished)
+        for job in recovered:
+            logger.warning(f"Félbemaradt deployment újraindítása: {job.id} (állapot: {job.status}, fázis: {job.phase})")
+            job.status = "queued"
+            job.phase = None
+            job.phases = {}
+        await asyncio.to_thread(self.store.save_many, recovered)
+        if self.on_change:
+            for job in recovered:
+                self.on_change(job)
+        await self._enqueue(recovered)
+
+    async def _poll(self):
+        """A többi worker által beküldött (még csak a naplóban lévő) jobok átvétele"""
+        # Először a félbemaradt jobok, hogy a pollozás ne vegye át őket a régi állapotukkal
+        try:
+            await self._recover()
+        except Exception as e:
+            logger.error(f"Hiba a félbemaradt deploymentek visszaállításakor: {e}")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                jobs = await asyncio.to_thread(self.store.unfinished)
+                submitted = [job for job in jobs if job.status == "queued" and job.id not in self.jobs]
+                if submitted:
+                    logger.info(f"{len(submitted)} beküldött deployment átvéve a közös naplóból")
+                    await self._enqueue(submitted)
+            except Exception as e:
+                logger.error(f"Hiba a beküldött deploymentek átvételekor: {e}")
+
+    def start(self):
+        """Workerek indítása és a megszakadt jobok újra sorba állítása (csak a vezető workerben)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
@@ -0,0 +1,111 @@
+# apps/deployment-engine/diagnostics.py
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+# Egy teljes diagnosztikai kör (sweep) közös határideje másodpercben
+DIAGNOSTICS_DEADLINE = float(os.getenv("DIAGNOSTICS_DEADLINE", "3.0"))
+DIAGNOSTICS_MAX_WORKERS = int(os.getenv("DIAGNOSTICS_MAX_WORKERS", "16"))
+
+SWEEP_SECONDS = histogram("deployment_engine_diagnostics_sweep_seconds", "Teljes diagnosztikai kör időtartama")
+INSPECT_SECONDS = histogram("deployment_engine_diagnostics_inspect_seconds",
+                            "Egy slot diagnosztikájának időtartama", ["service", "slot"])
+INSPECT_FAILURES = counter("deployment_engine_diagnostics_failures_total",
+                           "Hibás vagy határidőn túli slot diagnosztikák", ["service", "slot", "reason"])
+
+
+def _empty_result(error: Optional[str] = None) -> Dict:
+    result = {
+        "exists": False,
+        "running": False,
+        "ip_address": None,
+        "health_check": False
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+class DiagnosticsEngine:
+    """Konténer diagnosztika párhuzamosan, egy közös határidővel."""
+
+    def __init__(self, docker_manager, health_check: Callable[[str, str], bool],
+                 max_workers: int = DIAGNOSTICS_MAX_WORKERS,
+                 deadline: float = DIAGNOSTICS_DEADLINE):
+        self.docker_manager = docker_manager
+        self.health_check = health_check
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diagnostics")
+
+    def _inspect(self, service: str, slot: str) -> Dict:
+        """Egy slot vizsgálata: Docker állapot, majd health check (blokkoló, worker szálon fut)"""
+        with INSPECT_SECONDS.time(service=service, slot=slot):
+            return self._inspect_slot(service, slot)
+
+    def _inspect_slot(self, service: str, slot: str) -> Dict:
+        container_name = f"szakdoga2025-{service}-{slot}"
+        container_info = self.docker_manager.get_container_info(container_name)
+        if not container_info["exists"]:
+            return _empty_result()
+        # Nem futó konténert nem próbálunk, a timeout csak lassítaná a kört
+        if not container_info.get("running"):
+            container_info["health_check"] = False
+            return container_info
+        # Próbáljunk kapcsolódni a konténerhez a 8000-es porton
+        container_info["health_check"] = self.health_check(service, slot)
+        return container_info
+
+    async def sweep(self, targets: Iterable[Tuple[str, str]]) -> Dict:
+        """Az összes (service, slot) párt egyszerre vizsgálja, a késők timeout hibát kapnak"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+
+        if self.docker_manager is None:
+            # Docker nélkül nincs mit vizsgálni, a slotok ismeretlen állapotúak
+            return {"diagnostics": {f"szakdoga2025-{service}-{slot}": _empty_result(error="docker unavailable")
+                                    for service, slot in targets}}
+
+        futures = {}
+        slots = {}
+        for service, slot in targets:
+            container_name = f"szakdoga2025-{service}-{slot}"
+            slots[container_name] = (service, slot)
+            futures[container_name] = loop.run_in_executor(self.executor, self._inspect, service, slot)
+
+        results = {}
+        if not futures:
+            return {"diagnostics": results}
+
+        done, pending = await asyncio.wait(futures.values(), timeout=self.deadline)
+
+        for container_name, future in futures.items():
+            if future in pending:
+                future.cancel()
+                service, slot = slots[container_name]
+                logger.warning(f"A {container_name} diagnosztikája nem fejeződött be {self.deadline}s alatt",
+                               extra={"service": service, "slot": slot})
+                results[container_name] = _empty_result(error="timeout")
+                INSPECT_FAILURES.inc(service=service, slot=slot, reason="timeout")
+                continue
+            try:
+                results[container_name] = future.result()
+            except Exception as e:
+                service, slot = slots[container_name]
+                logger.error(f"Hiba a {container_name} diagnosztikájakor: {e}", extra={"service": service, "slot": slot})
+                results[container_name] = _empty_result(error=str(e))
+                INSPECT_FAILURES.inc(service=service, slot=slot, reason=type(e).__name__)
+
+        SWEEP_SECONDS.observe(time.monotonic() - started)
+        logger.debug(f"Diagnosztika kész: {len(results)} konténer, {time.monotonic() - started:.3f}s")
+        return {"diagnostics": results}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
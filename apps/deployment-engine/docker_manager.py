@@ -5,16 +5,135 @@ import logging
 import docker
 from typing import Dict, List, Optional
 from docker.errors import DockerException
+from container_tracker import REPLICA_LABEL, STANDBY_SUFFIX, STANDBY_SWAP_SUFFIX, ContainerTracker, is_standby
+from metrics import counter, histogram, instrument_methods
 
 logger = logging.getLogger(__name__)
 
 GIT_REPO_URL = os.getenv("GIT_REPO_URL")
 NETWORK_NAME = "szakdoga2025_traefik-network"
+# Alapértelmezett erőforrás korlátok a slot konténereinek (üresen hagyva nincs korlát)
+CONTAINER_CPU_LIMIT = os.getenv("CONTAINER_CPU_LIMIT", "")
+CONTAINER_MEMORY_LIMIT_MB = os.getenv("CONTAINER_MEMORY_LIMIT_MB", "")
 
+DOCKER_CALL_SECONDS = histogram("deployment_engine_docker_call_seconds",
+                                "DockerManager hívások időtartama", ["method", "service", "slot"])
+DOCKER_CALL_FAILURES = counter("deployment_engine_docker_call_failures_total",
+                               "Sikertelen DockerManager hívások (kivétel vagy False)", ["method", "service", "slot"])
+
+
+@instrument_methods(DOCKER_CALL_SECONDS, DOCKER_CALL_FAILURES,
+                    exclude=("start_tracking", "stop_tracking", "package_image_name", "standby_name"))
 class DockerManager:
     def __init__(self):
         """Initialize Docker client."""
         self.client = docker.from_env()
+        self.tracker = ContainerTracker(self.client, NETWORK_NAME)
+
+    def start_tracking(self):
+        """Feliratkozás a Docker events streamre; ezután az olvasások az indexből jönnek"""
+        self.tracker.start()
+
+    def stop_tracking(self):
+        self.tracker.stop()
+
+    def _tracked(self, service: str, slot: str, replica: int = 0):
+        if self.tracker.active:
+            return self.tracker.get(service, slot, replica)
+        return None
+
+    @staticmethod
+    def container_name(service: str, slot: str, replica: int = 0) -> str:
+        """Az első replika a megszokott slot nevet kapja, a többi index utótagot"""
+        base = f"szakdoga2025-{service}-{slot}"
+        return base if replica == 0 else f"{base}-{replica}"
+
+    def _replica_containers(self, service: str, slot: str) -> List:
+        # Vezérlő műveletekhez mindig a Docker az irányadó, a tracker eseményei késhetnek
+        containers = self.client.containers.list(
+            all=True,
+            filters={"label": [f"service={service}", f"slot={slot}"]}
+        )
+        return [c for c in containers if not is_standby(c.name)]
+
+    @staticmethod
+    def _replica_of(container) -> int:
+        try:
+            return int(container.labels.get(REPLICA_LABEL, "0"))
+        except ValueError:
+            return 0
+
+    def replica_indexes(self, service: str, slot: str) -> List[int]:
+        """A slot meglévő replikáinak indexei"""
+        return sorted(self._replica_of(c) for c in self._replica_containers(service, slot))
+
+    def running_replicas(self, service: str, slot: str) -> List[str]:
+        """A slot futó replikáinak konténer nevei (a Traefik loadBalancer szerverlistájához)"""
+        containers = sorted(self._replica_containers(service, slot), key=self._replica_of)
+        return [c.name for c in containers if c.status == "running"]
+
+    def running_replica_indexes(self, service: str, slot: str) -> List[int]:
+        """A slot futó replikáinak indexei (a drain ezek folyamatban lévő kéréseit összegzi)"""
+        return sorted(self._replica_of(c) for c in self._replica_containers(service, slot) if c.status == "running")
+
+    def container_stats(self, service: str, slot: str) -> List[Dict]:
+        """A slot futó replikáinak CPU és memória használata (egyszeri Docker stats lekérés)"""
+        result = []
+        for container in self._replica_containers(service, slot):
+            if container.status != "running":
+                continue
+            try:
+                stats = container.stats(stream=False)
+            except Exception as e:
+                logger.warning(f"Nem sikerült lekérdezni a {container.name} statisztikáit: {e}")
+                continue
+            cpu, precpu = stats.get("cpu_stats", {}), stats.get("precpu_stats", {})
+            cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+            system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+            online_cpus = cpu.get("online_cpus") or len(cpu.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+            # Felhasznált CPU magok; korlát esetén a korláthoz, egyébként egy maghoz viszonyítjuk
+            cores = cpu_delta / system_delta * online_cpus if system_delta > 0 else 0.0
+            nano_cpus = container.attrs.get("HostConfig", {}).get("NanoCpus") or 0
+            cpu_limit = nano_cpus / 1e9 if nano_cpus else 1.0
+
+            memory = stats.get("memory_stats", {})
+            usage = memory.get("usage", 0) - (memory.get("stats", {}).get("inactive_file") or memory.get("stats", {}).get("cache") or 0)
+            memory_limit = container.attrs.get("HostConfig", {}).get("Memory") or 0
+            result.append({
+                "name": container.name,
+                "replica": self._replica_of(container),
+                "cpu": round(cores / cpu_limit, 4),
+                "memory_mb": round(usage / (1024 * 1024), 1),
+                "memory_limit_mb": round(memory_limit / (1024 * 1024), 1) if memory_limit else None,
+            })
+        return result
+
+    def update_memory_limit(self, service: str, slot: str, memory_mb: int) -> bool:
+        """A slot összes replikájának memória korlátjának módosítása újraindítás nélkül"""
+        try:
+            for container in self._replica_containers(service, slot):
+                container.update(mem_limit=f"{memory_mb}m", memswap_limit=-1)
+                logger.info(f"Memória korlát módosítva: {container.name} {memory_mb} MB")
+            return True
+        except Exception as e:
+            logger.error(f"Hiba a memória korlát módosításakor {service}-{slot}: {str(e)}")
+            return False
+
+    def replica_counts(self) -> Dict[str, Dict[str, int]]:
+        """Replikaszám szolgáltatásonként és slotonként, egyetlen lekérdezésből"""
+        counts: Dict[str, Dict[str, int]] = {}
+        if self.tracker.active:
+            for record in self.tracker.records():
+                slots = counts.setdefault(record.service, {})
+                slots[record.slot] = slots.get(record.slot, 0) + 1
+            return counts
+        for container in self.client.containers.list(all=True, filters={"label": "szakdoga2025.group=true"}):
+            service, slot = container.labels.get("service"), container.labels.get("slot")
+            if not service or not slot or is_standby(container.name):
+                continue
+            slots = counts.setdefault(service, {})
+            slots[slot] = slots.get(slot, 0) + 1
+        return counts
 
     def init_network(self):
         try:
@@ -29,45 +148,114 @@ class DockerManager:
 
     def deploy_service_with_github_image(self, service: str, slot: str, version: str) -> bool:
         """Szolgáltatás telepítése GitHub image-ből."""
-        new_image_name = f"szakdoga2025-{service}-{slot}"
-        
+        if not self.pull_image(service, version) or not self.tag_image(service, slot, version):
+            return False
+        self.delete_container(service, slot)
+        return self.run_container(service, slot, version)
+
+    def package_image_name(self, service: str, version: str) -> str:
+        """A szolgáltatás GitHub Package Registry image neve"""
+        repo_parts = GIT_REPO_URL.split('/')
+        owner = repo_parts[-2]
+        github_package_name = service.replace("microservice", "m")
+        return f"ghcr.io/{owner}/{github_package_name}:{version}"
+
+    def pull_image(self, service: str, version: str) -> bool:
+        """Image letöltése a GitHub registry-ből."""
         try:
-            repo_parts = GIT_REPO_URL.split('/')
-            owner = repo_parts[-2]
-            github_package_name = service.replace("microservice", "m")
-            package_image_name = f"ghcr.io/{owner}/{github_package_name}:{version}"
+            package_image_name = self.package_image_name(service, version)
             
             logger.info(f"Pulling image: {package_image_name}")
             self.client.images.pull(package_image_name)
             logger.info(f"Image sikeresen letöltve: {package_image_name}")
+            return True
         except Exception as e:
             logger.error(f"Hiba az image letöltésekor: {str(e)}")
             return False
-        
+
+    def image_size(self, service: str, version: str) -> Optional[int]:
+        """A helyben meglévő package image mérete bájtban; None, ha nincs letöltve"""
+        try:
+            return self.client.images.get(self.package_image_name(service, version)).attrs.get("Size", 0)
+        except docker.errors.ImageNotFound:
+            return None
+
+    def local_image_versions(self, service: str) -> Dict[str, int]:
+        """A szolgáltatás helyben meglévő package image verziói és méretük"""
+        repository = self.package_image_name(service, "").rstrip(":")
+        versions = {}
+        for image in self.client.images.list(name=repository):
+            for tag in image.tags:
+                if tag.startswith(f"{repository}:"):
+                    versions[tag.split(":")[-1]] = image.attrs.get("Size", 0)
+        return versions
+
+    def remove_image(self, service: str, version: str) -> bool:
+        """A package image és a slot tagek eltávolítása; konténer (futó vagy standby) által használt image nem törlődik"""
+        slot_tags = [f"szakdoga2025-{service}-{slot}:{version}" for slot in ("blue", "green")]
+        try:
+            # Egy tag eltávolítása akkor is sikerül, ha egy leállított (standby) konténer használja az image-et,
+            # ezért bármit csak akkor untagelünk, ha egyetlen konténer sem hivatkozik rá
+            image_ids = set()
+            for ref in slot_tags + [self.package_image_name(service, version)]:
+                try:
+                    image_ids.add(self.client.images.get(ref).id)
+                except docker.errors.ImageNotFound:
+                    pass
+            for image_id in image_ids:
+                if self.client.containers.list(all=True, filters={"ancestor": image_id}):
+                    logger.info(f"Az image-et konténer használja, nem töröljük: {service}:{version}")
+                    return False
+            # A tag_image által adott slot tag nélkül a rétegek a lemezen maradnának
+            for tag in slot_tags:
+                try:
+                    self.client.images.remove(tag)
+                except docker.errors.ImageNotFound:
+                    pass
+            self.client.images.remove(self.package_image_name(service, version))
+            logger.info(f"Image törölve: {self.package_image_name(service, version)}")
+            return True
+        except Exception as e:
+            logger.warning(f"Nem sikerült törölni az image-et: {str(e)}")
+            return False
+
+    def tag_image(self, service: str, slot: str, version: str) -> bool:
+        """A letöltött image átnevezése a slot nevére."""
+        new_image_name = f"szakdoga2025-{service}-{slot}"
         try:
-            image = self.client.images.get(package_image_name)
+            image = self.client.images.get(self.package_image_name(service, version))
             image.tag(new_image_name, tag=version)
             logger.info(f"Image átnevezve: {new_image_name}:{version}")
+            return True
         except Exception as e:
             logger.error(f"Hiba az image átnevezésekor: {str(e)}")
             return False
-        
+
+    def run_container(self, service: str, slot: str, version: str, replica: int = 0) -> bool:
+        """A slot egy replikájának indítása az átnevezett image-ből."""
+        new_image_name = f"szakdoga2025-{service}-{slot}"
         try:
-            self.delete_container(service, slot)
-            
-            container_name = f"szakdoga2025-{service}-{slot}"
+            container_name = self.container_name(service, slot, replica)
             
+            # A Traefik címkék a slot nevére szólnak, így a replikák egy szolgáltatásba kerülnek
             labels = {
                 "service": service,
                 "slot": slot,
                 "traefik.enable": "true",
-                f"traefik.http.routers.{container_name}.rule": f"PathPrefix(`/api/{service}`)",
-                f"traefik.http.routers.{container_name}.service": container_name,
-                f"traefik.http.services.{container_name}.loadbalancer.server.port": "8000",
+                f"traefik.http.routers.{new_image_name}.rule": f"PathPrefix(`/api/{service}`)",
+                f"traefik.http.routers.{new_image_name}.service": new_image_name,
+                f"traefik.http.services.{new_image_name}.loadbalancer.server.port": "8000",
                 "com.docker.compose.project": "szakdoga2025", 
-                "szakdoga2025.group": "true"                  
+                "szakdoga2025.group": "true",
+                REPLICA_LABEL: str(replica)
             }
             
+            resources = {}
+            if CONTAINER_CPU_LIMIT:
+                resources["nano_cpus"] = int(float(CONTAINER_CPU_LIMIT) * 1e9)
+            if CONTAINER_MEMORY_LIMIT_MB:
+                resources["mem_limit"] = f"{int(float(CONTAINER_MEMORY_LIMIT_MB))}m"
+
             container = self.client.containers.run(
                 image=f"{new_image_name}:{version}",
                 name=container_name,
@@ -79,8 +267,10 @@ class DockerManager:
                     "SERVICE_NAME": service,
                     "DEPLOYMENT_SLOT": slot,
                     "SERVICE_VERSION": version,
+                    "REPLICA_INDEX": str(replica),
                     "PROJECT": "szakdoga2025"  # Projekt név környezeti változóként
-                }
+                },
+                **resources
             )
             logger.info(f"Konténer elindítva: {container_name} ID: {container.id}")
             return True
@@ -89,6 +279,13 @@ class DockerManager:
             return False
         
     def get_container_info(self, container_name: str) -> Dict:
+        record = self.tracker.get_by_name(container_name) if self.tracker.active else None
+        if record is not None:
+            return {
+                "exists": True,
+                "running": record.running,
+                "ip_address": record.ip_address if record.running else None,
+            }
         try:
             container = self.client.containers.get(container_name)
             container_exists = True
@@ -115,6 +312,9 @@ class DockerManager:
     def get_image_version(self, service: str, slot: str) -> Optional[str]:
         """Visszaadja a konténer image verzióját"""
         container_name = f"szakdoga2025-{service}-{slot}"
+        record = self._tracked(service, slot)
+        if record is not None and record.version:
+            return record.version
         try:
             container = self.client.containers.get(container_name)
             if container and container.image.tags:
@@ -125,8 +325,39 @@ class DockerManager:
             logger.error(f"Hiba a verzió lekérdezésekor: {e}")
         return None
 
+    def get_container_state(self, service: str, slot: str, replica: int = 0) -> str:
+        """A slot egy replikájának Docker állapota (running, exited, ... vagy not_found)"""
+        record = self._tracked(service, slot, replica)
+        # A leállt állapotot a Docker erősíti meg: csere után a tracker még a régi konténer die eseményét láthatja
+        if record is not None and record.status == "running":
+            return record.status
+        container_name = self.container_name(service, slot, replica)
+        try:
+            return self.client.containers.get(container_name).status
+        except docker.errors.NotFound:
+            return "not_found"
+        except Exception as e:
+            logger.warning(f"Nem sikerült lekérdezni a {container_name} konténer állapotát: {e}")
+            return "unknown"
+
     def get_service_status(self, service_name: str) -> Dict:
         """Konténer állapotának lekérése."""
+        if self.tracker.active:
+            tracked = {slot: self.tracker.get(service_name, slot) for slot in ["blue", "green"]}
+            if all(tracked.values()):
+                return {
+                    slot: {
+                        'id': record.id,
+                        'status': record.status,
+                        'image': record.image,
+                        'created': record.created,
+                        'health': 'healthy' if record.running else 'warning',
+                        'replicas': len(self.tracker.replicas(service_name, slot)),
+                        'traffic': 0
+                    }
+                    for slot, record in tracked.items()
+                }
+
         containers = self.client.containers.list(
             all=True,
             filters={
@@ -134,8 +365,11 @@ class DockerManager:
             }
         )
         
-        blue_container = next((c for c in containers if c.labels.get('slot') == 'blue'), None)
-        green_container = next((c for c in containers if c.labels.get('slot') == 'green'), None)
+        containers = [c for c in containers if not is_standby(c.name)]
+        blue_replicas = [c for c in containers if c.labels.get('slot') == 'blue']
+        green_replicas = [c for c in containers if c.labels.get('slot') == 'green']
+        blue_container = next((c for c in blue_replicas if c.labels.get(REPLICA_LABEL, '0') == '0'), None)
+        green_container = next((c for c in green_replicas if c.labels.get(REPLICA_LABEL, '0') == '0'), None)
         
         return {
             'blue': {
@@ -144,6 +378,7 @@ class DockerManager:
                 'image': blue_container.image.tags[0] if blue_container and blue_container.image.tags else None,
                 'created': blue_container.attrs['Created'] if blue_container else None,
                 'health': 'healthy' if blue_container and blue_container.status == 'running' else 'warning',
+                'replicas': len(blue_replicas),
                 'traffic': 0  # Alapértelmezett érték, később frissítjük
             },
             'green': {
@@ -152,27 +387,29 @@ class DockerManager:
                 'image': green_container.image.tags[0] if green_container and green_container.image.tags else None,
                 'created': green_container.attrs['Created'] if green_container else None,
                 'health': 'healthy' if green_container and green_container.status == 'running' else 'warning',
+                'replicas': len(green_replicas),
                 'traffic': 0  # Alapértelmezett érték, később frissítjük
             }
         }
 
 
     def restart_service(self, service_name: str, slot: str) -> bool:
-        """Szolgáltatás újraindítása."""
+        """Szolgáltatás újraindítása (a slot összes replikája)."""
         try:
-            container_name = f"szakdoga2025-{service_name}-{slot}"
-            container = self.client.containers.get(container_name)
-            logger.info(f"Konténer újraindítása {container_name}")
-            container.restart(timeout=10)
+            for replica in self.replica_indexes(service_name, slot) or [0]:
+                container_name = self.container_name(service_name, slot, replica)
+                container = self.client.containers.get(container_name)
+                logger.info(f"Konténer újraindítása {container_name}")
+                container.restart(timeout=10)
             return True
         except DockerException as e:
             logger.error(f"Hiba az újraindításban {service_name} {slot} slot: {str(e)}")
             return False
         
-    def delete_container(self, service_name: str, slot: str) -> bool:
-        """Konténer törlése."""
+    def delete_container(self, service_name: str, slot: str, replica: int = 0) -> bool:
+        """Konténer (a slot egy replikájának) törlése."""
         try:
-            container_name = f"szakdoga2025-{service_name}-{slot}"
+            container_name = self.container_name(service_name, slot, replica)
             try:
                 container = self.client.containers.get(container_name)
                 logger.info(f"Konténer törlése {container_name}")
@@ -187,34 +424,123 @@ class DockerManager:
             logger.error(f"Hiba a leállításban {service_name}-{slot}: {str(e)}")
             return False
 
-    def stop_container(self, service_name: str, slot: str) -> bool:
-        """Konténer leállítása, ha fut."""
+    def standby_name(self, service_name: str, slot: str) -> str:
+        return f"szakdoga2025-{service_name}-{slot}{STANDBY_SUFFIX}"
+
+    def retain_container(self, service_name: str, slot: str) -> bool:
+        """Törlés helyett leállítja és standby néven megtartja a slot jelenlegi konténerét."""
+        container_name = f"szakdoga2025-{service_name}-{slot}"
+        standby_name = self.standby_name(service_name, slot)
         try:
-            container_name = f"szakdoga2025-{service_name}-{slot}"
-            container = self.client.containers.get(container_name)
-            if container.status == "running":
-                logger.info(f"Konténer leállítása {container_name}")
-                container.stop(timeout=10)
-                return True
-            else:
-                logger.info(f"Konténer {container_name} nem fut, nincs mit leállítani")
+            try:
+                container = self.client.containers.get(container_name)
+            except docker.errors.NotFound:
+                logger.info(f"Konténer {container_name} nem található, nincs mit megtartani")
                 return True
+            # Mindig csak egy korábbi verziót tartunk meg
+            try:
+                self.client.containers.get(standby_name).remove(force=True)
+                logger.info(f"Régi standby konténer törölve: {standby_name}")
+            except docker.errors.NotFound:
+                pass
+            logger.info(f"Konténer leállítása és megtartása standby-ként: {container_name} -> {standby_name}")
+            # A Traefik címkék maradnak: leállított konténert a docker provider nem irányít,
+            # a file provider pedig név szerint (a slot nevére) küldi a forgalmat
+            container.stop(timeout=10)
+            container.rename(standby_name)
+            return True
+        except Exception as e:
+            logger.error(f"Hiba a konténer megtartásakor {service_name}-{slot}: {str(e)}")
+            return False
+
+    def get_standby(self, service_name: str, slot: str) -> Optional[Dict]:
+        """A slot megtartott előző konténere, ha van"""
+        try:
+            container = self.client.containers.get(self.standby_name(service_name, slot))
+        except docker.errors.NotFound:
+            return None
+        image = container.attrs.get("Config", {}).get("Image") or ""
+        return {
+            "name": container.name,
+            "status": container.status,
+            "version": image.split(":")[-1] if ":" in image else None
+        }
+
+    def restore_standby(self, service_name: str, slot: str) -> bool:
+        """A standby konténer visszahelyezése a slotra; a jelenlegi lesz az új standby. Nincs pull és új konténer."""
+        container_name = f"szakdoga2025-{service_name}-{slot}"
+        standby_name = self.standby_name(service_name, slot)
+        swap_name = f"szakdoga2025-{service_name}-{slot}{STANDBY_SWAP_SUFFIX}"
+        try:
+            standby = self.client.containers.get(standby_name)
+        except docker.errors.NotFound:
+            logger.error(f"Nincs standby konténer: {standby_name}")
+            return False
+
+        try:
+            current = self.client.containers.get(container_name)
+        except docker.errors.NotFound:
+            current = None
+
+        restored = False
+        try:
+            if current is not None:
+                current.stop(timeout=10)
+                current.rename(swap_name)
+            standby.rename(container_name)
+            restored = True
+            standby.start()
+        except Exception as e:
+            logger.error(f"Hiba a standby visszaállításakor {service_name}-{slot}: {str(e)}")
+            # Legalább a korábbi állapotot próbáljuk visszaállítani
+            try:
+                if restored:
+                    standby.stop(timeout=10)
+                    standby.rename(standby_name)
+                if current is not None:
+                    current.rename(container_name)
+                    current.start()
+            except Exception as revert_error:
+                logger.error(f"A standby visszaállítás visszavonása sem sikerült: {revert_error}")
+            return False
+
+        # A slot már a visszaállított verzióval fut; innen csak az új standby elnevezése van hátra
+        if current is not None:
+            try:
+                current.rename(standby_name)
+            except Exception as e:
+                logger.warning(f"Az előző konténer nem kapta meg a standby nevet ({swap_name}): {str(e)}")
+        logger.info(f"Standby konténer visszaállítva: {container_name}")
+        return True
+
+    def stop_container(self, service_name: str, slot: str) -> bool:
+        """A slot összes replikájának leállítása, ha fut."""
+        try:
+            for replica in self.replica_indexes(service_name, slot) or [0]:
+                container_name = self.container_name(service_name, slot, replica)
+                container = self.client.containers.get(container_name)
+                if container.status == "running":
+                    logger.info(f"Konténer leállítása {container_name}")
+                    container.stop(timeout=10)
+                else:
+                    logger.info(f"Konténer {container_name} nem fut, nincs mit leállítani")
+            return True
         except Exception as e:
             logger.error(f"Hiba a leálításban {service_name}-{slot}: {str(e)}")
             return False
         
     def start_container(self, service_name: str, slot: str) -> bool:
-        """Konténer indítása, ha leállt."""
+        """A slot összes replikájának indítása, ha leállt."""
         try:
-            container_name = f"szakdoga2025-{service_name}-{slot}"
-            container = self.client.containers.get(container_name)
-            if container.status != "running":
-                logger.info(f"Konténer indítása {container_name}")
-                container.start()
-                return True
-            else:
-                logger.info(f"Konténer {container_name} nemm található, nincs mit indítani")
-                return True
+            for replica in self.replica_indexes(service_name, slot) or [0]:
+                container_name = self.container_name(service_name, slot, replica)
+                container = self.client.containers.get(container_name)
+                if container.status != "running":
+                    logger.info(f"Konténer indítása {container_name}")
+                    container.start()
+                else:
+                    logger.info(f"Konténer {container_name} nemm található, nincs mit indítani")
+            return True
         except Exception as e:
             logger.error(f"Hiba az indításban {service_name}-{slot}: {str(e)}")
             return False
\ No newline at end of file
@@ -0,0 +1,168 @@
+# apps/deployment-engine/drain.py
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from async_clients import http_session
+from canary_analysis import TRAEFIK_METRICS_URL, _slot_of, parse_prometheus
+
+logger = logging.getLogger(__name__)
+
+# Legfeljebb ennyit várunk a folyamatban lévő kérésekre a leállítás előtt (másodperc)
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30.0"))
+DRAIN_POLL_INTERVAL = float(os.getenv("DRAIN_POLL_INTERVAL", "0.5"))
+# Ennyi idő kell a Traefiknek a módosított services.yml betöltéséhez
+DRAIN_GRACE = float(os.getenv("DRAIN_GRACE", "2.0"))
+
+
+def traefik_open_connections(service: str, slot: str, metrics_url: str = TRAEFIK_METRICS_URL) -> Optional[int]:
+    """A slot nyitott kapcsolatainak száma a Traefik metrikákból; None, ha nem elérhető"""
+    try:
+        response = http_session.get(metrics_url, timeout=2)
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"Nem sikerült lekérni a Traefik metrikákat: {e}")
+        return None
+    total = None
+    for name, labels, value in parse_prometheus(response.text):
+        if name == "traefik_service_open_connections" and _slot_of(labels.get("service", "")) == (service, slot):
+            total = (total or 0) + int(value)
+    return total
+
+
+class DrainResult:
+    """Egy drain eredménye: mennyi ideig tartott és kiürült-e a slot"""
+
+    def __init__(self, service: str, slot: str, original_weights: Dict[str, int]):
+        self.service = service
+        self.slot = slot
+        self.original_weights = original_weights
+        self.shifted = False
+        # A másik slot nem egészséges, ezért a forgalmat nem vettük el (a slot még élő forgalmat kap)
+        self.skipped = False
+        self.drained = False
+        self.in_flight: Optional[int] = None
+        self.duration = 0.0
+        self.reason: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "service": self.service,
+            "slot": self.slot,
+            "shifted": self.shifted,
+            "skipped": self.skipped,
+            "drained": self.drained,
+            "in_flight": self.in_flight,
+            "duration": round(self.duration, 3),
+            "reason": self.reason
+        }
+
+
+class ConnectionDrainer:
+    """Leállítás előtt elveszi a slot forgalmát és megvárja a folyamatban lévő kérések végét."""
+
+    def __init__(self, get_weights: Callable[[str], Dict[str, int]],
+                 set_weights: Callable[[str, int, int], None],
+                 flush: Callable[[], None],
+                 in_flight: Callable[[str, str, int], Optional[int]],
+                 health_check: Callable[[str, str], bool],
+                 on_change: Optional[Callable[[], None]] = None,
+                 replicas: Optional[Callable[[str, str], List[int]]] = None,
+                 timeout: float = DRAIN_TIMEOUT, interval: float = DRAIN_POLL_INTERVAL,
+                 grace: float = DRAIN_GRACE):
+        self.get_weights = get_weights
+        self.set_weights = set_weights
+        self.flush = flush
+        self.in_flight = in_flight
+        self.health_check = health_check
+        self.on_change = on_change
+        self.replicas = replicas
+        self.timeout = timeout
+        self.interval = interval
+        self.grace = grace
+
+    async def drain(self, service: str, slot: str) -> DrainResult:
+        """A slot súlyát 0-ra állítja (a másik slot javára), majd kivárja, amíg kiürül vagy lejár az idő"""
+        started = time.monotonic()
+        weights = dict(self.get_weights(service))
+        result = DrainResult(service, slot, weights)
+        other = "green" if slot == "blue" else "blue"
+
+        if weights.get(slot, 0) > 0:
+            # Csak akkor terelünk át, ha a másik slot ki tudja szolgálni a forgalmat
+            if not await asyncio.to_thread(self.health_check, service, other):
+                result.skipped = True
+                result.reason = f"A {other} slot nem egészséges, a forgalom nem terelhető át"
+                logger.warning(f"Drain kihagyva ({service} {slot}): {result.reason}")
+                result.duration = time.monotonic() - started
+                return result
+            self.set_weights(service, *((0, 100) if slot == "blue" else (100, 0)))
+            # A debounce-ot megkerülve azonnal írjuk, hogy a Traefik mielőbb betöltse
+            await asyncio.to_thread(self.flush)
+            result.shifted = True
+            if self.on_change:
+                self.on_change()
+            await asyncio.sleep(self.grace)
+
+        await self._wait_idle(result, service, slot, None, started)
+        logger.info(f"Drain: {service} {slot} {result.duration:.2f}s, kiürült: {result.drained}, folyamatban: {result.in_flight}")
+        return result
+
+    async def drain_replica(self, service: str, slot: str, replica: int,
+                            detach: Callable[[], None]) -> DrainResult:
+        """Egy replika kivétele a loadBalancer listából (detach), majd a folyamatban lévő kérései kivárása"""
+        started = time.monotonic()
+        result = DrainResult(service, slot, dict(self.get_weights(service)))
+        detach()
+        await asyncio.to_thread(self.flush)
+        if self.on_change:
+            self.on_change()
+        await asyncio.sleep(self.grace)
+        await self._wait_idle(result, service, slot, replica, started)
+        logger.info(f"Drain: {service} {slot} #{replica} {result.duration:.2f}s, kiürült: {result.drained}")
+        return result
+
+    def _slot_in_flight(self, service: str, slot: str) -> Optional[int]:
+        """A slot összes futó replikájának folyamatban lévő kérései; None, ha valamelyik nem mérhető"""
+        replicas = (self.replicas(service, slot) if self.replicas else None) or [0]
+        total = 0
+        for replica in replicas:
+            count = self.in_flight(service, slot, replica)
+            if count is None:
+                return None
+            total += count
+        return total
+
+    async def _wait_idle(self, result: DrainResult, service: str, slot: str, replica: Optional[int],
+                         started: float):
+        """Kivárja, amíg a replika (None esetén a teljes slot) kiürül vagy lejár az idő"""
+        deadline = started + self.timeout
+        while True:
+            if replica is None:
+                result.in_flight = await asyncio.to_thread(self._slot_in_flight, service, slot)
+            else:
+                result.in_flight = await asyncio.to_thread(self.in_flight, service, slot, replica)
+            if result.in_flight == 0:
+                result.drained = True
+                break
+            if result.in_flight is None:
+                # Nincs mérhető adat: a türelmi időn túl nem tudunk mire várni
+                result.reason = "A folyamatban lévő kérések száma nem mérhető"
+                break
+            if time.monotonic() >= deadline:
+                result.reason = f"{result.in_flight} kérés még folyamatban volt {self.timeout}s után"
+                break
+            await asyncio.sleep(self.interval)
+        result.duration = time.monotonic() - started
+
+    def restore(self, result: DrainResult):
+        """Az eredeti súlyok visszaállítása, ha a drain átterelte a forgalmat"""
+        if not result.shifted:
+            return
+        weights = result.original_weights
+        self.set_weights(result.service, weights.get("blue", 0), weights.get("green", 0))
+        if self.on_change:
+            self.on_change()
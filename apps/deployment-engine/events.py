@@ -0,0 +1,143 @@
+# apps/deployment-engine/events.py
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Egy lassú kliens legfeljebb ennyi eseménnyel maradhat le, utána újra teljes állapotot kap
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+# Az újracsatlakozó kliens (Last-Event-ID) ennyi korábbi eseményt kaphat vissza
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "500"))
+# Üresjáratban ennyi másodpercenként küldünk keep-alive kommentet (proxyk ne zárják le)
+EVENT_HEARTBEAT_INTERVAL = float(os.getenv("EVENT_HEARTBEAT_INTERVAL", "15.0"))
+
+
+class Event:
+    """Egy állapotváltozás (delta) a sorszámával"""
+
+    def __init__(self, event_id: int, event_type: str, data: Dict):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "type": self.type, "at": self.at, "data": self.data}
+
+    def encode(self) -> str:
+        """Server-Sent Events formátum"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.to_dict())}\n\n"
+
+
+class Subscriber:
+    """Egy SSE kliens sora; ha megtelik, a kliens teljes állapotot kap a lemaradt delták helyett"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class EventBus:
+    """Állapotváltozások szétküldése a feliratkozóknak; bármelyik szálból publikálható."""
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, replay: int = EVENT_REPLAY_SIZE):
+        self.queue_size = queue_size
+        self.history: Deque[Event] = deque(maxlen=replay)
+        self._subscribers: Set[Subscriber] = set()
+        self._last_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """A Docker tracker és a worker szálak eseményei ezen a loopon jutnak el a kliensekhez"""
+        self._loop = loop
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event_type: str, data: Dict):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self.history.append(event)
+        if self._loop is None or self._loop.is_closed() or not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._dispatch(event)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Event):
+        for subscriber in list(self._subscribers):
+            if subscriber.overflowed:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+
+    def since(self, event_id: int) -> Optional[List[Event]]:
+        """Az adott sorszám utáni események; None, ha már kiestek a visszajátszási pufferből"""
+        with self._lock:
+            events = list(self.history)
+            last_id = self._last_id
+        if event_id > last_id:
+            # Újraindult a motor, a kliens sorszáma nem értelmezhető
+            return None
+        if event_id == last_id:
+            return []
+        if not events or events[0].id > event_id + 1:
+            return None
+        return [event for event in events if event.id > event_id]
+
+    async def stream(self, snapshot: Callable[[], Awaitable[Dict]], last_event_id: Optional[int] = None,
+                     heartbeat: float = EVENT_HEARTBEAT_INTERVAL) -> AsyncIterator[str]:
+        """SSE stream: kezdeti állapot (vagy visszajátszás), majd csak a változások"""
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            missed = self.since(last_event_id) if last_event_id is not None else None
+            if missed is None:
+                sent_id = self._last_id
+                yield Event(sent_id, "snapshot", await snapshot()).encode()
+            else:
+                sent_id = last_event_id
+                for event in missed:
+                    sent_id = event.id
+                    yield event.encode()
+            while True:
+                if subscriber.overflowed:
+                    # A sor maradékát eldobjuk és teljes állapottal folytatjuk
+                    subscriber.queue = asyncio.Queue(maxsize=self.queue_size)
+                    subscriber.overflowed = False
+                    sent_id = self._last_id
+                    yield Event(sent_id, "snapshot", await snapshot()).encode()
+                    continue
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                # A feliratkozás és a kezdeti állapot közötti események már benne vannak abban
+                if event.id <= sent_id:
+                    continue
+                sent_id = event.id
+                yield event.encode()
+        finally:
+            self._subscribers.discard(subscriber)
@@ -1,25 +1,56 @@
 
 
+import json
 import logging
-import requests
-from typing import List
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
-# Logging beállítása
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("deployment_engine.log")
-    ]
-)
+from async_clients import http_session
+from metrics import counter, histogram
 
 logger = logging.getLogger(__name__)
 
 # Szolgáltatások listája
 SERVICES = ["m1", "m2", "m3", "dashboard", "deployment-engine"]
 
+# A tag lista lemezes másolata, hogy a motor GitHub nélkül is el tudjon indulni
+GIT_TAG_CACHE_FILE = os.getenv("GIT_TAG_CACHE_FILE", "git_tags_cache.json")
+# Ennél frissebb tag listát nem validálunk újra a GitHub-bal (másodperc)
+GIT_TAG_REFRESH_INTERVAL = float(os.getenv("GIT_TAG_REFRESH_INTERVAL", "60.0"))
+# Ismeretlen tag esetén legfeljebb ilyen gyakran kérdezünk rá soron kívül (másodperc)
+GIT_TAG_MISS_REFRESH_INTERVAL = float(os.getenv("GIT_TAG_MISS_REFRESH_INTERVAL", "5.0"))
+# Opcionális token: autentikált hívásokra jóval magasabb a rate limit
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# GitHub API alap URL (pl. GitHub Enterprise vagy a benchmark helyi GitHub szervere)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+GITHUB_TAGS_SECONDS = histogram("deployment_engine_github_tags_seconds",
+                                "get_release_tags időtartama (cache találat vagy újravalidálás)", ["refreshed"])
+GITHUB_REQUESTS = counter("deployment_engine_github_requests_total",
+                          "GitHub API tag lekérések válasz státusz szerint", ["status"])
+GITHUB_FAILURES = counter("deployment_engine_github_refresh_failures_total", "Sikertelen tag index frissítések")
+
+SEMVER_PATTERN = re.compile(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+
+
+def semver_key(tag: str) -> Tuple:
+    """Rendezési kulcs: v0.9 < v0.10, előzetes verzió a végleges előtt, nem semver tagek legelöl"""
+    match = SEMVER_PATTERN.match(tag)
+    if not match:
+        return (0, (), 0, (), tag)
+    major, minor, patch, prerelease = match.groups()
+    numbers = (int(major), int(minor or 0), int(patch or 0))
+    if prerelease is None:
+        return (1, numbers, 1, (), tag)
+    # A pre-release azonosítók közül a számok számként, a többi szövegként hasonlítandó
+    parts = tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in prerelease.split("."))
+    return (1, numbers, 0, parts, tag)
+
 class GitWatcher:
     def __init__(self, repo_url: str):
         """GitWatcher inicializálása a megadott GitHub repository URL-lel."""
@@ -32,35 +63,151 @@ class GitWatcher:
         self.repo = repo_parts[-1]
         
         # GitHub API alap URL
-        self.api_base_url = f"https://api.github.com/repos/{self.owner}/{self.repo}"
+        self.api_base_url = f"{GITHUB_API_URL}/repos/{self.owner}/{self.repo}"
         self.latest_releases = {}
-        
+
+        # Tag index: rendezett lista, halmaz a gyors tagság-vizsgálathoz és oldalanként ETag
+        self.cache_file = GIT_TAG_CACHE_FILE
+        self.tags: List[str] = []
+        self.tag_set = set()
+        self.pages: Dict[str, Dict] = {}
+        self.fetched_at = 0.0
+        self.last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._load_cache()
+
         # Teszteljük a kapcsolatot
         try:
-            response = requests.get(self.api_base_url)
+            response = http_session.get(self.api_base_url, headers=self._headers(), timeout=10)
             if response.status_code == 200:
                 logger.info(f"Sikeres kapcsolódás a GitHub API-hoz: {self.api_base_url}")
             else:
                 logger.error(f"Nem sikerült kapcsolódni a GitHub API-hoz: {response.status_code} - {response.text}")
         except Exception as e:
             logger.error(f"Hiba a GitHub API kapcsolódásakor: {str(e)}")
-            raise
+            # Lemezes tag lista birtokában offline is elindulhatunk
+            if not self.tags:
+                raise
+            logger.warning(f"Offline indulás a lemezen tárolt {len(self.tags)} taggel")
 
-    def get_release_tags(self) -> List[str]:
-        """Az összes release tag lekérése GitHub API-n keresztül"""
+    def _headers(self, etag: Optional[str] = None) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json"}
+        if GITHUB_TOKEN:
+            headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+        if etag:
+            headers["If-None-Match"] = etag
+        return headers
+
+    # ------------------- LEMEZES CACHE -------------------
+
+    def _load_cache(self):
         try:
-            # GitHub API hívás a tagek lekéréséhez
-            api_url = f"{self.api_base_url}/tags"
-            response = requests.get(api_url)
-            
-            if response.status_code != 200:
-                logger.error(f"GitHub API hiba: {response.status_code} - {response.text}")
-                return []
-                
-            tags_data = response.json()
-            # Tag nevek kinyerése a válaszból
-            tags = [tag["name"] for tag in tags_data]
-            return sorted(tags)
+            with open(self.cache_file, 'r') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
         except Exception as e:
-            logger.error(f"Hiba a tagek lekérésekor: {str(e)}")
-            return []
+            logger.warning(f"A tag cache nem olvasható ({self.cache_file}): {e}")
+            return
+        if data.get("repo") != f"{self.owner}/{self.repo}":
+            return
+        self.pages = data.get("pages", {})
+        self._set_tags(data.get("tags", []))
+        self.fetched_at = data.get("fetched_at", 0.0)
+        logger.info(f"Tag cache betöltve: {len(self.tags)} tag ({self.cache_file})")
+
+    def _save_cache(self):
+        data = {
+            "repo": f"{self.owner}/{self.repo}",
+            "fetched_at": self.fetched_at,
+            "tags": self.tags,
+            "pages": self.pages
+        }
+        cache_dir = os.path.dirname(self.cache_file) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".git-tags-", suffix=".tmp", dir=cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            logger.warning(f"A tag cache nem menthető ({self.cache_file}): {e}")
+
+    # ------------------- TAG INDEX -------------------
+
+    def _set_tags(self, tags: Iterable[str]):
+        self.tag_set = set(tags)
+        self.tags = sorted(self.tag_set, key=semver_key)
+
+    def _fetch_pages(self) -> Optional[Dict[str, Dict]]:
+        """Az összes oldal lekérése; változatlan oldalnál (304) a korábbi tartalmat használjuk"""
+        pages = {}
+        url = f"{self.api_base_url}/tags?per_page=100"
+        while url:
+            cached = self.pages.get(url)
+            response = http_session.get(url, headers=self._headers(cached and cached.get("etag")), timeout=10)
+            GITHUB_REQUESTS.inc(status=str(response.status_code))
+            if response.status_code == 304 and cached:
+                page = cached
+            elif response.status_code == 200:
+                page = {
+                    "etag": response.headers.get("ETag"),
+                    "tags": [tag["name"] for tag in response.json()],
+                    "next": response.links.get("next", {}).get("url")
+                }
+            else:
+                logger.error(f"GitHub API hiba: {response.status_code} - {response.text}")
+                return None
+            pages[url] = page
+            url = page.get("next")
+        return pages
+
+    def refresh(self) -> bool:
+        """A tag index újravalidálása a GitHub-bal; hiba esetén a meglévő index marad érvényben"""
+        with self._lock:
+            self.last_attempt = time.time()
+            try:
+                pages = self._fetch_pages()
+            except Exception as e:
+                GITHUB_FAILURES.inc()
+                logger.error(f"Hiba a tagek lekérésekor: {str(e)}")
+                return False
+            if pages is None:
+                GITHUB_FAILURES.inc()
+                return False
+            tags = {tag for page in pages.values() for tag in page["tags"]}
+            changed = tags != self.tag_set or pages != self.pages
+            self.pages = pages
+            self.fetched_at = time.time()
+            if tags != self.tag_set:
+                logger.info(f"Tag index frissítve: {len(tags)} tag")
+            self._set_tags(tags)
+            if changed:
+                self._save_cache()
+            return True
+
+    def get_release_tags(self) -> List[str]:
+        """Az összes release tag semver szerint növekvő sorrendben; csak az elavult index validálódik újra"""
+        refresh = time.time() - self.fetched_at >= GIT_TAG_REFRESH_INTERVAL
+        with GITHUB_TAGS_SECONDS.time(refreshed=str(refresh).lower()):
+            if refresh:
+                self.refresh()
+            return list(self.tags)
+
+    def has_tag(self, tag: str) -> bool:
+        """O(1) tagság-vizsgálat; ismeretlen tagnél (pl. épp most kiadott release) egyszer újravalidál"""
+        if tag in self.tag_set:
+            return True
+        if time.time() - self.last_attempt >= GIT_TAG_MISS_REFRESH_INTERVAL:
+            self.refresh()
+        return tag in self.tag_set
+
+    def to_dict(self) -> Dict:
+        return {
+            "repo": f"{self.owner}/{self.repo}",
+            "tags": len(self.tags),
+            "latest": self.tags[-1] if self.tags else None,
+            "fetched_at": self.fetched_at or None,
+            "pages": len(self.pages)
+        }
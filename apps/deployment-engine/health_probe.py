@@ -0,0 +1,214 @@
+# apps/deployment-engine/health_probe.py
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2.0"))
+# Ennyi egymást követő sikertelen próba után nyit a circuit breaker
+HEALTH_BREAKER_THRESHOLD = int(os.getenv("HEALTH_BREAKER_THRESHOLD", "3"))
+# Nyitott breaker mellett ennyi ideig nem próbáljuk a konténert (másodperc)
+HEALTH_BREAKER_COOLDOWN = float(os.getenv("HEALTH_BREAKER_COOLDOWN", "15.0"))
+# Slotonként ennyi próba eredményét őrizzük meg
+HEALTH_HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", "50"))
+
+PROBE_SECONDS = histogram("deployment_engine_health_probe_seconds", "/health próbák időtartama", ["service", "slot"])
+PROBE_FAILURES = counter("deployment_engine_health_probe_failures_total",
+                         "Sikertelen /health próbák", ["service", "slot", "reason"])
+PROBE_SKIPPED = counter("deployment_engine_health_probe_skipped_total",
+                        "Nyitott circuit breaker miatt kihagyott próbák", ["service", "slot"])
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProbeResult:
+    """Egy /health próba eredménye"""
+
+    def __init__(self, name: str, replica: int, healthy: bool, latency: Optional[float] = None,
+                 status_code: Optional[int] = None, error: Optional[str] = None, skipped: bool = False):
+        self.name = name
+        self.replica = replica
+        self.healthy = healthy
+        self.latency = latency
+        self.status_code = status_code
+        self.error = error
+        self.skipped = skipped
+        self.at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "replica": self.replica,
+            "healthy": self.healthy,
+            "latency": round(self.latency, 4) if self.latency is not None else None,
+            "status_code": self.status_code,
+            "error": self.error,
+            "skipped": self.skipped,
+            "at": self.at
+        }
+
+
+class CircuitBreaker:
+    """Konténerenkénti breaker: nyitott állapotban a próbák hálózati hívás nélkül sikertelenek"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            # Egyetlen próbát engedünk át; a többi hívó addig a nyitott állapotot látja
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def record(self, healthy: bool, now: float) -> Optional[str]:
+        """Az eredmény rögzítése; az új állapotot adja vissza, ha változott"""
+        previous = self.state
+        if healthy:
+            self.failures = 0
+            self.state = CLOSED
+        else:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = now
+        return self.state if self.state != previous else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened_at": self.opened_at if self.state != CLOSED else None
+        }
+
+
+class HealthProber:
+    """Közös keep-alive session-nel futó /health próbák, késleltetés méréssel és breakerrel."""
+
+    def __init__(self, session: requests.Session, container_name: Callable[[str, str, int], str],
+                 timeout: float = HEALTH_PROBE_TIMEOUT,
+                 threshold: int = HEALTH_BREAKER_THRESHOLD,
+                 cooldown: float = HEALTH_BREAKER_COOLDOWN,
+                 history: int = HEALTH_HISTORY_SIZE,
+                 on_change: Optional[Callable[[str, str, int, ProbeResult], None]] = None):
+        self.session = session
+        self.container_name = container_name
+        self.timeout = timeout
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.history_size = history
+        self.on_change = on_change
+        self._breakers: Dict[Tuple[str, str, int], CircuitBreaker] = {}
+        self._last: Dict[Tuple[str, str, int], ProbeResult] = {}
+        self._history: Dict[Tuple[str, str], Deque[ProbeResult]] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, key: Tuple[str, str, int]) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.threshold, self.cooldown)
+        return breaker
+
+    def probe(self, service: str, slot: str, replica: int = 0, force: bool = False) -> ProbeResult:
+        """Egy replika /health próbája; nyitott breakernél (force nélkül) hálózati hívás nélkül tér vissza"""
+        key = (service, slot, replica)
+        name = self.container_name(service, slot, replica)
+        with self._lock:
+            breaker = self._breaker(key)
+            if not breaker.allow(time.monotonic()) and not force:
+                PROBE_SKIPPED.inc(service=service, slot=slot)
+                return ProbeResult(name, replica, False, error="Circuit breaker nyitva", skipped=True)
+
+        started = time.monotonic()
+        try:
+            response = self.session.get(f"http://{name}:8000/health", timeout=self.timeout)
+            result = ProbeResult(name, replica, response.status_code == 200, time.monotonic() - started,
+                                 status_code=response.status_code)
+        except requests.RequestException as e:
+            result = ProbeResult(name, replica, False, time.monotonic() - started, error=type(e).__name__)
+        PROBE_SECONDS.observe(result.latency, service=service, slot=slot)
+        if not result.healthy:
+            PROBE_FAILURES.inc(service=service, slot=slot, reason=result.error or f"status_{result.status_code}")
+
+        with self._lock:
+            transition = breaker.record(result.healthy, time.monotonic())
+            previous = self._last.get(key)
+            self._last[key] = result
+            self._history.setdefault((service, slot), deque(maxlen=self.history_size)).append(result)
+        if transition == OPEN:
+            logger.warning(f"Health circuit breaker nyitva: {name} ({breaker.failures} sikertelen próba, utolsó: {result.error or result.status_code})",
+                           extra={"service": service, "slot": slot})
+        elif transition == CLOSED:
+            logger.info(f"Health circuit breaker zárva: {name} újra elérhető", extra={"service": service, "slot": slot})
+        # Csak az egészség változását jelezzük, nem minden próbát
+        if self.on_change and (previous is None or previous.healthy != result.healthy):
+            self.on_change(service, slot, replica, result)
+        return result
+
+    def check(self, service: str, slot: str, replica: int = 0) -> bool:
+        return self.probe(service, slot, replica).healthy
+
+    def check_ready(self, service: str, slot: str, replica: int = 0) -> bool:
+        """Readiness várakozáshoz: a breakert megkerülve mindig valódi próbát végez"""
+        return self.probe(service, slot, replica, force=True).healthy
+
+    def reset(self, service: str, slot: str, replica: int = 0):
+        """Új konténer indulásakor a régi hibák nem számítanak"""
+        with self._lock:
+            self._breakers.pop((service, slot, replica), None)
+
+    # ------------------- LEKÉRDEZÉS -------------------
+
+    def history(self, service: str, slot: str, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            results = list(self._history.get((service, slot), []))
+        if limit is not None:
+            results = results[-limit:]
+        return [result.to_dict() for result in reversed(results)]
+
+    def slot_summary(self, service: str, slot: str) -> Dict:
+        with self._lock:
+            results = list(self._history.get((service, slot), []))
+        latencies = sorted(r.latency for r in results if r.healthy and r.latency is not None)
+        return {
+            "probes": len(results),
+            "success_ratio": round(sum(r.healthy for r in results) / len(results), 4) if results else None,
+            "latency_avg": round(sum(latencies) / len(latencies), 4) if latencies else None,
+            "latency_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4) if latencies else None
+        }
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            targets = [
+                {
+                    "service": service,
+                    "slot": slot,
+                    "replica": replica,
+                    **breaker.to_dict(),
+                    "last": self._last[(service, slot, replica)].to_dict() if (service, slot, replica) in self._last else None
+                }
+                for (service, slot, replica), breaker in sorted(self._breakers.items())
+            ]
+        return {
+            "timeout": self.timeout,
+            "threshold": self.threshold,
+            "cooldown": self.cooldown,
+            "targets": targets
+        }
@@ -0,0 +1,278 @@
+# apps/deployment-engine/history.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "engine_history.db")
+# A beérkező eseményeket ennyi másodpercenként, egy tranzakcióban írjuk ki
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+# Ennyi napig tartjuk meg az eseményeket egyenként; utána időablakonként összesítjük őket
+HISTORY_RAW_RETENTION_DAYS = float(os.getenv("HISTORY_RAW_RETENTION_DAYS", "7"))
+# Az összesítés időablaka (másodperc)
+HISTORY_ROLLUP_BUCKET = int(os.getenv("HISTORY_ROLLUP_BUCKET", "3600"))
+# Az összesített adatokat ennyi napig őrizzük meg
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "365"))
+# Ilyen gyakran fut az összesítés (másodperc)
+HISTORY_COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "3600"))
+# Egy lekérdezés legfeljebb ennyi eseményt ad vissza
+HISTORY_QUERY_LIMIT = int(os.getenv("HISTORY_QUERY_LIMIT", "10000"))
+
+WEIGHTS = "weights"
+HEALTH = "health"
+DEPLOYMENT = "deployment"
+KINDS = (WEIGHTS, HEALTH, DEPLOYMENT)
+
+
+def parse_timestamp(value: str) -> float:
+    """Unix időbélyeg vagy ISO 8601 dátum (időzóna nélkül UTC); ValueError, ha egyik sem"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _dumps(data: Dict) -> str:
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+class HistoryStore:
+    """Súlyváltozások, slot health átmenetek és deployment események append-only idősora SQLite-ban.
+
+    Az események memóriában gyűlnek és kötegelve íródnak ki, így a rögzítés nem lassítja a hívót.
+    A régi eseményeket időablakonként (darabszám, első/utolsó időpont, utolsó érték) összesítjük.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL,
+                 raw_retention: float = HISTORY_RAW_RETENTION_DAYS * 86400,
+                 bucket: int = HISTORY_ROLLUP_BUCKET,
+                 retention: float = HISTORY_RETENTION_DAYS * 86400,
+                 compact_interval: float = HISTORY_COMPACT_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.raw_retention = raw_retention
+        self.bucket = bucket
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        # A kapcsolatot a flush (háttérszál) és a lekérdezések (worker szálak) felváltva használják
+        self._db_lock = threading.Lock()
+        self._pending: List[Tuple[float, str, str, Optional[str], str]] = []
+        # Deploymentenként az utolsó rögzített állapot: csak az állapotváltásokat írjuk, a fázisokat nem
+        self._job_status: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS history_events (
+                ts REAL NOT NULL,
+                service TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                slot TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_service_ts ON history_events(service, ts);
+            CREATE INDEX IF NOT EXISTS idx_history_service_kind_ts ON history_events(service, kind, ts);
+            CREATE INDEX IF NOT EXISTS idx_history_ts ON history_events(ts);
+            CREATE TABLE IF NOT EXISTS history_rollups (
+                bucket_start REAL NOT NULL,
+                service TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                slot TEXT NOT NULL DEFAULT '',
+                count INTEGER NOT NULL,
+                first_ts REAL NOT NULL,
+                last_ts REAL NOT NULL,
+                last_data TEXT NOT NULL,
+                PRIMARY KEY (service, kind, slot, bucket_start)
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_rollups_service_bucket ON history_rollups(service, bucket_start);
+        """)
+        self._conn.commit()
+
+    # ------------------- RÖGZÍTÉS -------------------
+
+    def record(self, kind: str, service: str, slot: Optional[str], data: Dict, at: Optional[float] = None):
+        """Bármelyik szálból hívható; a kiírás a következő flush-kor történik"""
+        with self._lock:
+            self._pending.append((at or time.time(), service, kind, slot, _dumps(data)))
+
+    def record_weights(self, service: str, weights: Dict):
+        self.record(WEIGHTS, service, None, weights)
+
+    def record_health(self, service: str, slot: str, result: Dict):
+        self.record(HEALTH, service, slot, {
+            key: result.get(key) for key in ("replica", "healthy", "status_code", "error", "latency")
+        })
+
+    def record_deployment(self, job: Dict):
+        job_id = job["deployment_id"]
+        with self._lock:
+            if self._job_status.get(job_id) == job["status"]:
+                return
+            if job["status"] in ("active", "failed"):
+                self._job_status.pop(job_id, None)
+            else:
+                self._job_status[job_id] = job["status"]
+        self.record(DEPLOYMENT, job["service"], job["slot"], {
+            key: job.get(key) for key in ("deployment_id", "version", "status", "error", "batch_id", "time_to_ready")
+        })
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            with self._db_lock, self._conn:
+                self._conn.executemany("INSERT INTO history_events VALUES (?, ?, ?, ?, ?)", pending)
+        except Exception:
+            # A következő körben újrapróbáljuk, az események nem vesznek el
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+        return len(pending)
+
+    # ------------------- ÖSSZESÍTÉS -------------------
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """A megőrzési időn túli eseményeket időablakonként összesíti, majd törli; a törölt sorok számát adja"""
+        now = now or time.time()
+        # Csak teljes időablakot zárunk le, hogy egy ablak ne keveredjen nyers és összesített adatból
+        cutoff = (now - self.raw_retention) // self.bucket * self.bucket
+        with self._db_lock, self._conn:
+            # Ablakonként a darabszám, az első és utolsó időpont, valamint a legutolsó esemény adata
+            self._conn.execute("""
+                INSERT INTO history_rollups
+                SELECT bucket, service, kind, slot, COUNT(*), MIN(ts), MAX(ts), MAX(CASE WHEN latest = 1 THEN data END)
+                FROM (
+                    SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, service, kind, COALESCE(slot, '') AS slot, ts, data,
+                           ROW_NUMBER() OVER (PARTITION BY CAST(ts / ? AS INTEGER), service, kind, COALESCE(slot, '')
+                                              ORDER BY ts DESC) AS latest
+                    FROM history_events WHERE ts < ?
+                )
+                WHERE true
+                GROUP BY bucket, service, kind, slot
+                ON CONFLICT(service, kind, slot, bucket_start) DO UPDATE SET
+                    count = count + excluded.count,
+                    first_ts = MIN(first_ts, excluded.first_ts),
+                    last_data = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_data ELSE last_data END,
+                    last_ts = MAX(last_ts, excluded.last_ts)
+            """, (self.bucket, self.bucket, self.bucket, cutoff))
+            deleted = self._conn.execute("DELETE FROM history_events WHERE ts < ?", (cutoff,)).rowcount
+            self._conn.execute("DELETE FROM history_rollups WHERE bucket_start < ?", (now - self.retention,))
+        if deleted:
+            logger.info(f"Előzmények összesítve: {deleted} esemény {self.bucket}s-os ablakokba")
+        return deleted
+
+    # ------------------- LEKÉRDEZÉS -------------------
+
+    def query(self, service: Optional[str], start: float, end: float, kind: Optional[str] = None,
+              limit: int = HISTORY_QUERY_LIMIT) -> Dict:
+        """Események az [start, end] tartományban időrendben, a kezdő súlyokkal és a régi időszak összesítésével"""
+        self.flush()
+        filters, params = "", []
+        if service:
+            filters += " AND service = ?"
+            params.append(service)
+        if kind:
+            filters += " AND kind = ?"
+            params.append(kind)
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT ts, service, kind, slot, data FROM history_events WHERE ts >= ? AND ts <= ?{filters} "
+                f"ORDER BY ts LIMIT ?", (start, end, *params, limit + 1)
+            ).fetchall()
+            # A tartományba belelógó összesített időablakok (a nyers megőrzési időn túli időszak)
+            rollups = self._conn.execute(
+                f"SELECT bucket_start, service, kind, slot, count, first_ts, last_ts, last_data FROM history_rollups "
+                f"WHERE bucket_start > ? AND bucket_start <= ?{filters} ORDER BY bucket_start",
+                (start - self.bucket, end, *params)
+            ).fetchall()
+            # A tartomány elején érvényes súlyok: a legutolsó korábbi súlyváltozás
+            initial = self._initial_weights(service, start) if kind in (None, WEIGHTS) else {}
+
+        return {
+            "service": service,
+            "from": start,
+            "to": end,
+            "initial_weights": initial,
+            "events": [
+                {"at": ts, "service": row_service, "kind": row_kind, "slot": slot, "data": json.loads(data)}
+                for ts, row_service, row_kind, slot, data in rows[:limit]
+            ],
+            "truncated": len(rows) > limit,
+            "rollups": [
+                {"bucket_start": bucket_start, "service": row_service, "kind": row_kind, "slot": slot or None,
+                 "count": count, "first_at": first_ts, "last_at": last_ts, "last": json.loads(last_data)}
+                for bucket_start, row_service, row_kind, slot, count, first_ts, last_ts, last_data in rollups
+            ]
+        }
+
+    def _initial_weights(self, service: Optional[str], start: float) -> Dict:
+        services = [service] if service else [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT service FROM history_events WHERE kind = ?", (WEIGHTS,))]
+        initial = {}
+        for name in services:
+            row = self._conn.execute(
+                "SELECT data FROM history_events WHERE service = ? AND kind = ? AND ts < ? ORDER BY ts DESC LIMIT 1",
+                (name, WEIGHTS, start)
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT last_data FROM history_rollups WHERE service = ? AND kind = ? AND bucket_start < ? "
+                    "ORDER BY bucket_start DESC LIMIT 1", (name, WEIGHTS, start)
+                ).fetchone()
+            if row is not None:
+                initial[name] = json.loads(row[0])
+        return initial
+
+    # ------------------- HÁTTÉRFELADAT -------------------
+
+    async def _run(self):
+        last_compaction = 0.0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+                if time.monotonic() - last_compaction >= self.compact_interval:
+                    last_compaction = time.monotonic()
+                    await asyncio.to_thread(self.compact)
+            except Exception as e:
+                logger.error(f"Hiba az előzmények mentésekor: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Hiba az előzmények mentésekor: {e}")
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {"path": self.path, "pending": pending, "raw_retention_days": self.raw_retention / 86400,
+                "rollup_bucket": self.bucket}
@@ -0,0 +1,209 @@
+# apps/deployment-engine/image_cache.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ilyen gyakran nézzük meg, van-e új release tag (másodperc)
+IMAGE_PREWARM_INTERVAL = float(os.getenv("IMAGE_PREWARM_INTERVAL", "60.0"))
+# Egyszerre legfeljebb ennyi háttér letöltés fut
+IMAGE_PREWARM_CONCURRENCY = int(os.getenv("IMAGE_PREWARM_CONCURRENCY", "2"))
+# Első indításkor csak a legutóbbi ennyi tag image-ét töltjük le előre
+IMAGE_PREWARM_INITIAL_TAGS = int(os.getenv("IMAGE_PREWARM_INITIAL_TAGS", "2"))
+# Az előre letöltött image-ek által foglalható hely (MB); fölötte a legrégebben használtakat töröljük
+IMAGE_CACHE_BUDGET_MB = float(os.getenv("IMAGE_CACHE_BUDGET_MB", "5000"))
+
+
+class CachedImage:
+    """Egy helyben meglévő package image nyilvántartása"""
+
+    def __init__(self, service: str, version: str, size: int):
+        self.service = service
+        self.version = version
+        self.size = size
+        self.last_used = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "service": self.service,
+            "version": self.version,
+            "size_mb": round(self.size / (1024 * 1024), 1),
+            "last_used": self.last_used
+        }
+
+
+class ImageCache:
+    """Release image-ek háttérben történő előtöltése, LRU alapú törléssel egy tárhely kereten belül."""
+
+    def __init__(self, docker, services: List[str],
+                 get_tags: Optional[Callable[[], List[str]]] = None,
+                 in_use: Optional[Callable[[], set]] = None,
+                 interval: float = IMAGE_PREWARM_INTERVAL,
+                 concurrency: int = IMAGE_PREWARM_CONCURRENCY,
+                 initial_tags: int = IMAGE_PREWARM_INITIAL_TAGS,
+                 budget_mb: float = IMAGE_CACHE_BUDGET_MB):
+        # AsyncDockerClient: a letöltések a hosszú Docker műveletek készletén futnak
+        self.docker = docker
+        self.services = services
+        self.get_tags = get_tags
+        self.in_use = in_use
+        self.interval = interval
+        self.initial_tags = initial_tags
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries: "OrderedDict[Tuple[str, str], CachedImage]" = OrderedDict()
+        self.known_tags: Optional[set] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._evict_lock = asyncio.Lock()
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------- LEKÉRDEZÉS -------------------
+
+    def is_warm(self, service: str, version: str) -> bool:
+        return (service, version) in self.entries
+
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "budget_mb": round(self.budget / (1024 * 1024), 1),
+            "used_mb": round(self.total_size() / (1024 * 1024), 1),
+            "pending": [f"{service}:{version}" for service, version in self._pending],
+            "images": [entry.to_dict() for entry in reversed(self.entries.values())]
+        }
+
+    # ------------------- LETÖLTÉS -------------------
+
+    def _touch(self, service: str, version: str):
+        entry = self.entries.get((service, version))
+        if entry is not None:
+            entry.last_used = time.time()
+            self.entries.move_to_end((service, version))
+
+    async def _download(self, service: str, version: str) -> Optional[int]:
+        if not await self.docker.pull_image(service, version):
+            return None
+        size = await self.docker.image_size(service, version)
+        return size or 0
+
+    async def _pull(self, service: str, version: str, background: bool = True) -> bool:
+        # A háttér letöltések korlátozottak, a deploy által kért letöltés nem vár rájuk
+        if background:
+            async with self._semaphore:
+                size = await self._download(service, version)
+        else:
+            size = await self._download(service, version)
+        if size is None:
+            return False
+        self.entries[(service, version)] = CachedImage(service, version, size)
+        await self._evict()
+        return True
+
+    def _schedule(self, service: str, version: str, background: bool = True) -> asyncio.Task:
+        key = (service, version)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._pull(service, version, background))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def ensure(self, service: str, version: str) -> bool:
+        """Deploy előtt: ha az image már helyben van, nem töltjük le újra; ha épp töltődik, megvárjuk"""
+        if self.is_warm(service, version):
+            # A nyilvántartás és a valóság eltérhet (pl. kézi docker rmi), ezért ellenőrizzük
+            if await self.docker.image_size(service, version) is not None:
+                self._touch(service, version)
+                logger.info(f"Image már helyben van, letöltés kihagyva: {service}:{version}")
+                return True
+            self.entries.pop((service, version), None)
+        try:
+            return await asyncio.shield(self._schedule(service, version, background=False))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Hiba az image letöltésekor ({service}:{version}): {e}")
+            return False
+
+    def prewarm(self, versions: List[str]):
+        """Az adott verziók image-einek letöltése a háttérben minden szolgáltatásra"""
+        for version in versions:
+            for service in self.services:
+                if not self.is_warm(service, version):
+                    self._schedule(service, version)
+
+    # ------------------- TÖRLÉS -------------------
+
+    async def _evict(self):
+        """A legrégebben használt image-ek törlése, amíg a foglalt hely a keret alá nem kerül"""
+        async with self._evict_lock:
+            protected = self.in_use() if self.in_use else set()
+            for key in list(self.entries):
+                if self.total_size() <= self.budget:
+                    return
+                # A futó slotok image-ét és a most töltődőket nem töröljük
+                if key in protected or key in self._pending:
+                    continue
+                if await self.docker.remove_image(*key):
+                    self.entries.pop(key, None)
+                    logger.info(f"Image törölve a cache-ből (LRU): {key[0]}:{key[1]}")
+
+    # ------------------- HÁTTÉRFOLYAMAT -------------------
+
+    async def _discover(self):
+        """A már helyben lévő image-ek felvétele a nyilvántartásba"""
+        for service in self.services:
+            try:
+                versions = await self.docker.local_image_versions(service)
+            except Exception as e:
+                logger.warning(f"Nem sikerült lekérdezni a helyi image-eket ({service}): {e}")
+                continue
+            for version, size in versions.items():
+                self.entries.setdefault((service, version), CachedImage(service, version, size))
+
+    async def _poll_tags(self):
+        tags = await asyncio.to_thread(self.get_tags)
+        if not tags:
+            return
+        if self.known_tags is None:
+            # Első körben nem töltjük le az összes régi release-t, csak a legfrissebbeket
+            new_tags = tags[-self.initial_tags:] if self.initial_tags > 0 else []
+        else:
+            new_tags = [tag for tag in tags if tag not in self.known_tags]
+        self.known_tags = set(tags)
+        if new_tags:
+            logger.info(f"Új release tagek, image előtöltés indul: {new_tags}")
+            self.prewarm(new_tags)
+
+    async def _run(self):
+        await self._discover()
+        while True:
+            try:
+                if self.get_tags:
+                    await self._poll_tags()
+            except Exception as e:
+                logger.error(f"Hiba az image előtöltés során: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self._pending.values())
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
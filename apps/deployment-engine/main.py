@@ -1,37 +1,197 @@
 #apps/deployment-engine/main.py
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Body
+from fastapi import FastAPI, HTTPException, Body, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import uvicorn
 import logging
-from typing import Optional
+from typing import List, Optional
 import time
 from pydantic import BaseModel
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 import asyncio
-import requests
 from requests.exceptions import RequestException
 from git_watcher import GitWatcher
 from docker_manager import DockerManager
-import yaml
-
-# Logging beállítása
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("deployment_engine.log")
-    ]
-)
+from diagnostics import DiagnosticsEngine
+from status_store import StatusSnapshot, StatusSnapshotStore
+from traefik_config import TraefikConfigStore
+from rollout import DEFAULT_ROLLOUT_STEPS, RolloutScheduler
+from canary_analysis import CanaryAnalyzer
+from readiness import ReadinessResult, wait_until_ready
+from deployment_jobs import DeploymentJob, DeploymentJobQueue, DeploymentJobStore
+from image_cache import ImageCache
+from drain import ConnectionDrainer, traefik_open_connections
+from autoscaler import AUTOSCALE_ENABLED, AUTOSCALE_MAX_REPLICAS, Autoscaler
+from async_clients import AsyncDockerClient, http_session, install_default_executor
+from health_probe import HealthProber
+from events import EventBus
+from state_backend import ServiceStateStore, create_backend
+from history import HISTORY_QUERY_LIMIT, KINDS, HistoryStore, parse_timestamp
+import metrics
+from structured_logging import configure_logging
+
+# Logging beállítása: a rekordok sorba kerülnek, a konzol- és fájlírás külön szálon fut
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
+# ------------------- INDULÁS -------------------
+
+# A / azonnal válaszol; a /ready csak a Docker bekötése és a kezdeti felderítés után ad 200-at
+startup_state = {"docker": "pending", "git_watcher": "pending", "discovery": "pending", "role": "pending"}
+
+# Ha egy másik worker a vezető, ilyen gyakran próbáljuk átvenni a szerepet (másodperc)
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "5.0"))
+
+def connect_docker() -> Optional[DockerManager]:
+    """Docker kliens létrehozása és bekötése (blokkoló, induláskor worker szálon fut)"""
+    global docker_manager
+    try:
+        manager = DockerManager()
+        manager.init_network()
+    except Exception as e:
+        logger.error(f"Hiba a Docker kliens inicializálásakor: {e}")
+        startup_state["docker"] = "disconnected"
+        return None
+    docker_manager = manager
+    async_docker.docker_manager = manager
+    diagnostics_engine.docker_manager = manager
+    startup_state["docker"] = "connected"
+    logger.info("Docker kliens sikeresen inicializálva")
+    return manager
+
+def connect_git_watcher() -> Optional[GitWatcher]:
+    """Git Watcher létrehozása (blokkoló GitHub hívás, induláskor worker szálon fut)"""
+    global git_watcher
+    try:
+        watcher = GitWatcher(GIT_REPO_URL)
+    except Exception as e:
+        logger.critical(f"Hiba a Git Watcher inicializálásakor: {str(e)}")
+        # Nem állítjuk le a szervert, de a git-függő funkciók nem fognak működni
+        startup_state["git_watcher"] = "disconnected"
+        return None
+    git_watcher = watcher
+    image_cache.get_tags = watcher.get_release_tags
+    startup_state["git_watcher"] = "connected"
+    logger.info(f"Git Watcher sikeresen inicializálva: {GIT_REPO_URL}")
+    return watcher
+
+async def discover_slot_versions():
+    """Kezdeti felderítés: a slotokon futó verziók párhuzamos lekérdezése"""
+    pairs = [(service, slot) for service in service_states for slot in ["blue", "green"]]
+    versions = await asyncio.gather(*(async_docker.get_image_version(service, slot) for service, slot in pairs),
+                                    return_exceptions=True)
+    for (service, slot), version in zip(pairs, versions):
+        if isinstance(version, Exception):
+            logger.error(f"Hiba a {service} {slot} verziójának lekérdezésekor: {version}")
+            continue
+        service_states.update(service, slot, version=version)
+
+async def initialize_engine():
+    """A külső függőségek bekötése a háttérben; a HTTP szerver közben már kiszolgál"""
+    started = time.monotonic()
+    # A Docker és a GitHub egymástól függetlenül, párhuzamosan csatlakozik
+    await asyncio.gather(asyncio.to_thread(connect_docker), asyncio.to_thread(connect_git_watcher))
+    if docker_manager:
+        await discover_slot_versions()
+        # Konténer állapotváltozásnál (pl. crash) azonnal elavul a pillanatkép
+        loop = asyncio.get_running_loop()
+        docker_manager.tracker.add_listener(lambda record: loop.call_soon_threadsafe(status_store.invalidate))
+        # Leállt vagy új replika esetén a Traefik szerverlista is követi
+        docker_manager.tracker.add_listener(lambda record: sync_slot_servers(record.service, record.slot))
+        # Újonnan induló konténernél a korábbi, halott példány breaker állapota nem érvényes
+        docker_manager.tracker.add_listener(
+            lambda record: health_prober.reset(record.service, record.slot, record.replica) if record.running else None
+        )
+        docker_manager.tracker.add_listener(lambda record: event_bus.publish("container", {
+            "name": record.name, "service": record.service, "slot": record.slot,
+            "replica": record.replica, "status": record.status, "version": record.version
+        }))
+        docker_manager.start_tracking()
+        startup_state["discovery"] = "done"
+    else:
+        startup_state["discovery"] = "skipped"
+    status_store.start()
+    logger.info(f"Deployment engine inicializálva {time.monotonic() - started:.2f}s alatt: {startup_state}")
+    await lead_when_possible()
+
+def start_leader_tasks():
+    """Egyszerre csak egy workerben futhatnak: deployment workerek, image cache karbantartás, autoscaler"""
+    deployment_queue.start()
+    if docker_manager:
+        image_cache.start()
+        if AUTOSCALE_ENABLED:
+            autoscaler.start()
+
+async def lead_when_possible():
+    """A vezető szerep megszerzése; ha egy másik worker birtokolja, időnként újrapróbáljuk (pl. ha az leállt)"""
+    while not await asyncio.to_thread(state_backend.try_leadership):
+        if startup_state["role"] != "follower":
+            startup_state["role"] = "follower"
+            logger.info("Egy másik worker a vezető; a deploymenteket a közös naplón keresztül adjuk át")
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+    startup_state["role"] = "leader"
+    start_leader_tasks()
+    if state_backend.shared:
+        logger.info(f"Ez a worker lett a vezető (pid {os.getpid()})")
+
+def engine_ready() -> bool:
+    return startup_state["docker"] == "connected" and startup_state["discovery"] == "done"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Az asyncio.to_thread hívások (HTTP próbák, fájlírás) korlátos készleten futnak
+    install_default_executor()
+    event_bus.bind(asyncio.get_running_loop())
+    canary_analyzer.start()
+    history_store.start()
+    initialization = asyncio.create_task(initialize_engine())
+    yield
+    if not initialization.done():
+        initialization.cancel()
+    try:
+        await initialization
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"Hiba a deployment engine inicializálásakor: {e}")
+    await autoscaler.stop()
+    await rollout_scheduler.shutdown()
+    await deployment_queue.stop()
+    await image_cache.stop()
+    await status_store.stop()
+    await canary_analyzer.stop()
+    await history_store.stop()
+    diagnostics_engine.shutdown()
+    traefik_config.flush()
+    async_docker.shutdown()
+    if docker_manager:
+        docker_manager.stop_tracking()
+    # A vezető zár felszabadul, egy másik worker átveheti a szerepet
+    state_backend.close()
+
 app = FastAPI(
     title="Deployment Engine",
-    description="Mikroszolgáltatás deployment kezelő rendszer"
+    description="Mikroszolgáltatás deployment kezelő rendszer",
+    lifespan=lifespan
 )
 
+HTTP_REQUEST_SECONDS = metrics.histogram("deployment_engine_http_request_seconds",
+                                         "API kérések időtartama végpontonként", ["method", "route", "status"])
+
+@app.middleware("http")
+async def measure_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Az útvonal sablonja (pl. /deployments/{deployment_id}), hogy a címkék száma ne nőjön
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                 route=route.path if route else "unmatched", status=str(response.status_code))
+    return response
+
 # CORS beállítások
 app.add_middleware(
     CORSMiddleware,
@@ -41,130 +201,343 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-try:
-    docker_manager = DockerManager()
-    docker_manager.init_network()
-    logger.info("Docker kliens sikeresen inicializálva")
-except Exception as e:
-    logger.error(f"Hiba a Docker kliens inicializálásakor: {e}")
-    docker_manager = None
+# Induláskor a lifespan köti be (connect_docker); addig None
+docker_manager: Optional[DockerManager] = None
+
+# A Docker SDK szinkron: minden hívás korlátos szálkészleten fut, nem az event loopon
+async_docker = AsyncDockerClient(docker_manager)
 
 GIT_REPO_URL = os.getenv("GIT_REPO_URL")
+# Deploy-kor a régi konténert törlés helyett leállítva megtartjuk az azonnali rollbackhez
+DEPLOY_KEEP_STANDBY = os.getenv("DEPLOY_KEEP_STANDBY", "true").lower() == "true"
+# Egy slot legfeljebb ennyi replikával futhat
+SLOT_MAX_REPLICAS = int(os.getenv("SLOT_MAX_REPLICAS", "10"))
+TRAEFIK_CONFIG_FILE = os.getenv("TRAEFIK_DYNAMIC_CONFIG", "/etc/traefik/dynamic/services.yml")
+# Slot állapotok és a Traefik konfiguráció; sqlite backenddel több worker és újraindítás között is közös
+state_backend = create_backend()
+traefik_config = TraefikConfigStore(TRAEFIK_CONFIG_FILE, backend=state_backend)
 
-try:
-    git_watcher = GitWatcher(GIT_REPO_URL)
-    logger.info(f"Git Watcher sikeresen inicializálva: {GIT_REPO_URL}")
-except Exception as e:
-    logger.critical(f"Hiba a Git Watcher inicializálásakor: {str(e)}")
-    # Nem állítjuk le a szervert, de a git-függő funkciók nem fognak működni
-    git_watcher = None
+# Állapotváltozások (deploy fázis, konténer, health, súlyok) az SSE klienseknek
+event_bus = EventBus()
+traefik_config.add_listener(lambda service, weights: event_bus.publish("weights", {"service": service, **weights}))
 
-# ------------------- PYDANTIC MODELLEK -------------------
-# Szolgáltatások állapota
-class ServiceState:
-    def __init__(self, status: str, version: Optional[str] = None):
-        self.status = status
-        self.version = version
-    status : str
-    version : Optional[str]
+# Súlyváltozások, health átmenetek és deployment események idősora (GET /history)
+history_store = HistoryStore()
+traefik_config.add_listener(history_store.record_weights)
 
+# Induláskor a lifespan köti be (connect_git_watcher); addig None
+git_watcher: Optional[GitWatcher] = None
+
+# ------------------- PYDANTIC MODELLEK -------------------
 class DeploymentRequest(BaseModel):
     service: str
     version: str
     slot: Optional[str] = None
     traffic_percentage: Optional[int] = 100
 
+class BatchDeploymentItem(BaseModel):
+    service: str
+    version: str
+    slot: str
+
+class BatchDeploymentRequest(BaseModel):
+    deployments: List[BatchDeploymentItem]
+    wait: bool = False
+
 class SlotConfigurationRequest(BaseModel):
     service: str
     blue_percentage: int
     green_percentage: int
+    enforce_analysis: bool = False
 
 class RestartRequest(BaseModel):
     service: str
     slot: str
 
+class StopRequest(BaseModel):
+    service: str
+    slot: str
+    # Leállítás akkor is, ha a drain nem tudta elvenni a slot forgalmát
+    force: bool = False
+
+class ScaleRequest(BaseModel):
+    service: str
+    slot: str
+    replicas: int
+
+class RollbackRequest(BaseModel):
+    service: str
+    slot: str
+    traffic_percentage: Optional[int] = None
+
+class RolloutRequest(BaseModel):
+    service: str
+    slot: str
+    steps: List[int] = DEFAULT_ROLLOUT_STEPS
+    duration_minutes: Optional[float] = None
+    step_interval_seconds: Optional[float] = 60
+
 # ------------------- HELPER FÜGGVÉNYEK -------------------
 
-async def deploy_service_with_github_image(service: str, version: str, slot: str):
-    """GitHub registry-ből származó image deploy-olása átnevezéssel"""
+async def pull_deployment_image(job: DeploymentJob, jobs: DeploymentJobQueue) -> bool:
+    """Első fázis: a GitHub registry-ből származó image letöltése, a futó konténerhez nem nyúl"""
+    service, version, slot = job.service, job.version, job.slot
     try:
-        service_states[service][slot].status = "deploying"
-        
         logger.info(f"Deployment indítása: {service} v{version} a {slot} slotra")
-        
-        deploy_succes = docker_manager.deploy_service_with_github_image(service, slot, version)
 
-        if not deploy_succes:
-            service_states[service][slot].status = "failed"
+        # Ha a háttér előtöltés már letöltötte az image-et, ez a fázis szinte azonnali
+        async with jobs.phase(job, "pull"):
+            pulled = await image_cache.ensure(service, version)
+        if not pulled:
+            await jobs.update(job, status="failed", error="Az image letöltése nem sikerült")
+        return pulled
+    except Exception as e:
+        await jobs.update(job, status="failed", error=str(e))
+        logger.error(f"Deployment hiba: {service} v{version} a {slot} slotra - {e}")
+        return False
+
+async def swap_deployment_container(job: DeploymentJob, jobs: DeploymentJobQueue):
+    """Második fázis: átnevezés, a régi konténer cseréje és readiness várakozás, fázisonként mérve"""
+    service, version, slot = job.service, job.version, job.slot
+    try:
+        # A slot állapota csak a csere közben változik, a pull alatt a régi konténer még kiszolgál
+        service_states.update(service, slot, status="deploying")
+        status_store.invalidate()
+
+        async with jobs.phase(job, "tag"):
+            tagged = await async_docker.tag_image(service, slot, version)
+        if not tagged:
+            service_states.update(service, slot, status="failed")
+            await jobs.update(job, status="failed", error="Az image átnevezése nem sikerült")
             return
 
-        await asyncio.sleep(5)
-        
-        health_check_success = check_service_health(service, slot)
+        extra_replicas = [r for r in await async_docker.replica_indexes(service, slot) if r > 0]
+
+        # Élő slot esetén előbb elvesszük a forgalmát és kivárjuk a folyamatban lévő kéréseket
+        async with jobs.phase(job, "drain"):
+            drain = await drainer.drain(service, slot)
+        async with jobs.phase(job, "stop"):
+            if DEPLOY_KEEP_STANDBY:
+                await async_docker.retain_container(service, slot)
+            else:
+                await async_docker.delete_container(service, slot)
+        async with jobs.phase(job, "run"):
+            started = await async_docker.run_container(service, slot, version)
+        if not started:
+            service_states.update(service, slot, status="failed")
+            await jobs.update(job, status="failed", error="A konténer indítása nem sikerült")
+            return
+
+        # Fix várakozás helyett addig pollozunk, amíg a konténer kész vagy összeomlik
+        async with jobs.phase(job, "ready"):
+            readiness = await wait_until_ready(service, slot, check_service_ready, docker_manager.get_container_state)
+            # A további replikák egyesével cserélődnek az új verzióra
+            if readiness.ready and extra_replicas:
+                readiness = await replace_replicas(service, slot, version, extra_replicas)
         
-        if health_check_success:
-            service_states[service][slot].status = "active"
-            service_states[service][slot].version = version
-            logger.info(f"Sikeres deployment: {service} v{version} a {slot} slotra")
+        if readiness.ready:
+            # Sikertelen deploy után a forgalom a másik sloton marad
+            drainer.restore(drain)
+            service_states.update(service, slot, status="active", version=version)
+            await jobs.update(job, status="active")
+            logger.info(f"Sikeres deployment: {service} v{version} a {slot} slotra, kész {readiness.elapsed:.2f}s alatt ({readiness.attempts} próbálkozás)")
         else:
-            service_states[service][slot].status = "failed"
-            logger.error(f"Deployment hiba: {service} v{version} a {slot} slotra - konténer nem válaszol")
+            service_states.update(service, slot, status="failed")
+            await jobs.update(job, status="failed", error=readiness.reason)
+            logger.error(f"Deployment hiba: {service} v{version} a {slot} slotra - {readiness.reason}")
     except Exception as e:
-        service_states[service][slot].status = "failed"
+        service_states.update(service, slot, status="failed")
+        await jobs.update(job, status="failed", error=str(e))
         logger.error(f"Deployment hiba: {service} v{version} a {slot} slotra - {e}")
+    finally:
+        status_store.invalidate()
+
+def on_health_change(service: str, slot: str, replica: int, result):
+    event = result.to_dict()
+    event_bus.publish("health", {"service": service, "slot": slot, **event})
+    # Minden worker próbál, de az átmenetet csak a vezető rögzíti, hogy ne legyen többszörösen az előzményekben
+    if startup_state["role"] == "leader":
+        history_store.record_health(service, slot, event)
+
+health_prober = HealthProber(http_session, DockerManager.container_name, on_change=on_health_change)
+
+def check_service_health(service: str, slot: str, replica: int = 0) -> bool:
+    """Ellenőrzi egy szolgáltatás (slot replika) egészségi állapotát; ismerten halott konténert nem próbál"""
+    return health_prober.check(service, slot, replica)
+
+def check_service_ready(service: str, slot: str, replica: int = 0) -> bool:
+    """Readiness várakozáshoz: mindig valódi próba, a sikeres válasz zárja a breakert"""
+    return health_prober.check_ready(service, slot, replica)
 
-def check_service_health(service: str, slot: str) -> bool:
-    """Ellenőrzi egy szolgáltatás egészségi állapotát"""
-    container_name = f"szakdoga2025-{service}-{slot}"
+def slot_in_flight(service: str, slot: str, replica: int = 0) -> Optional[int]:
+    """Folyamatban lévő kérések: a mikroszolgáltatás saját számlálója, ennek hiányában a Traefik metrika"""
+    container_name = DockerManager.container_name(service, slot, replica)
     try:
-        response = requests.get(f"http://{container_name}:8000/health", timeout=2)
-        return response.status_code == 200
-    except:
-        return False
-    
+        response = http_session.get(f"http://{container_name}:8000/health", timeout=2)
+        in_flight = response.json().get("in_flight")
+        if in_flight is not None:
+            return int(in_flight)
+    except Exception:
+        pass
+    # A Traefik csak slot szinten mér, egy replikára nem ad pontos számot
+    return traefik_open_connections(service, slot) if replica == 0 else None
+
+def sync_slot_servers(service: str, slot: str):
+    """A slot Traefik loadBalancer szerverlistája a futó replikákból"""
+    names = docker_manager.running_replicas(service, slot) or [DockerManager.container_name(service, slot)]
+    try:
+        traefik_config.set_servers(service, slot, [f"http://{name}:8000" for name in names])
+    except KeyError:
+        logger.warning(f"A szakdoga2025-{service}-{slot} szolgáltatás nem található a Traefik konfigurációban")
+
+async def start_replica(service: str, slot: str, version: str, replica: int) -> ReadinessResult:
+    """Egy replika indítása és a readiness kivárása; a Traefik listába csak kész replika kerül"""
+    started = await async_docker.run_container(service, slot, version, replica)
+    if not started:
+        return ReadinessResult(False, 0.0, 0, f"A {replica}. replika indítása nem sikerült")
+    readiness = await wait_until_ready(
+        service, slot,
+        lambda s, sl: check_service_ready(s, sl, replica),
+        lambda s, sl: docker_manager.get_container_state(s, sl, replica)
+    )
+    if readiness.ready:
+        await async_docker.queries.run(sync_slot_servers, service, slot)
+    return readiness
+
+async def replace_replicas(service: str, slot: str, version: str, replicas: List[int]) -> ReadinessResult:
+    """A megadott replikák egyenkénti újraindítása a megadott verzióval (nincs pull, a slot image-e helyben van)"""
+    readiness = ReadinessResult(True, 0.0, 0)
+    for replica in replicas:
+        await async_docker.delete_container(service, slot, replica)
+        readiness = await start_replica(service, slot, version, replica)
+        if not readiness.ready:
+            break
+    await async_docker.queries.run(sync_slot_servers, service, slot)
+    return readiness
+
+diagnostics_engine = DiagnosticsEngine(docker_manager, check_service_health)
+
 async def run_diagnostics():
     """Diagnosztikai információk a konténerekről és a hálózati kapcsolatokról"""
-    results = {}
-    
-    for service in service_states:
+    targets = [(service, slot) for service in service_states for slot in ["blue", "green"]]
+    return await diagnostics_engine.sweep(targets)
+
+async def build_status_snapshot() -> StatusSnapshot:
+    """Diagnosztika, Traefik súlyok és image verziók összegyűjtése egy pillanatképbe"""
+    try:
+        weights = traefik_config.weights()
+    except Exception as e:
+        logger.error(f"Hiba a Traefik konfigurációs fájl olvasásakor: {e}")
+        weights = {}
+
+    async def slot_version(service: str, slot: str):
+        try:
+            return await async_docker.get_image_version(service, slot)
+        except Exception as e:
+            logger.error(f"Hiba a konténer információk lekérésekor: {e}")
+            return service_states.slot(service, slot).version
+
+    async def replica_counts():
+        try:
+            return await async_docker.replica_counts()
+        except Exception as e:
+            logger.error(f"Hiba a replikák lekérdezésekor: {e}")
+            return {}
+
+    pairs = [(service, slot) for service in service_states for slot in ["blue", "green"]]
+    diagnostics_data, replicas, *slot_versions = await asyncio.gather(
+        run_diagnostics(),
+        replica_counts(),
+        *(slot_version(service, slot) for service, slot in pairs)
+    )
+    versions = {service: {} for service in service_states}
+    for (service, slot), version in zip(pairs, slot_versions):
+        versions[service][slot] = version
+
+    return StatusSnapshot(diagnostics_data.get("diagnostics", {}), weights, versions, replicas)
+
+status_store = StatusSnapshotStore(build_status_snapshot)
+
+canary_analyzer = CanaryAnalyzer()
+
+def on_deployment_change(job: DeploymentJob):
+    event = job.to_dict()
+    event_bus.publish("deployment", event)
+    history_store.record_deployment(event)
+
+deployment_queue = DeploymentJobQueue(
+    pull_deployment_image, swap_deployment_container, DeploymentJobStore(),
+    on_change=on_deployment_change, backend=state_backend
+)
+
+def canary_gate(service: str, slot: str) -> Optional[str]:
+    """Hibaüzenet, ha a jelölt slot mérhetően lassabb vagy hibásabb a másiknál"""
+    verdict = canary_analyzer.compare(service, slot)
+    return None if verdict["ok"] else verdict["reason"]
+
+rollout_scheduler = RolloutScheduler(
+    get_weights=lambda service: traefik_config.weights().get(service, {}),
+    set_weights=traefik_config.set_weights,
+    health_check=check_service_health,
+    on_change=status_store.invalidate,
+    analysis=canary_gate
+)
+drainer = ConnectionDrainer(
+    get_weights=lambda service: traefik_config.weights().get(service, {}),
+    set_weights=traefik_config.set_weights,
+    flush=traefik_config.flush,
+    in_flight=slot_in_flight,
+    health_check=check_service_health,
+    on_change=status_store.invalidate,
+    replicas=lambda service, slot: docker_manager.running_replica_indexes(service, slot) if docker_manager else []
+)
+
+def build_traffic_view(weights: dict, diagnostics_info: dict, replicas: Optional[dict] = None) -> list:
+    """Traefik súlyok és diagnosztika összefésülése memóriában, szolgáltatásonként egy lépésben"""
+    result = []
+    for service_short_name, slot_weights in weights.items():
+        states = service_states.get(service_short_name)
+        slots = []
         for slot in ["blue", "green"]:
-            container_name = f"szakdoga2025-{service}-{slot}"
-            
-            try:
-                container_info = docker_manager.get_container_info(container_name)
-                if not container_info["exists"]:
-                    results[container_name] = {
-                        "exists": False,
-                        "running": False,
-                        "ip_address": None,
-                        "health_check": False
-                    }
-                    continue
-                # Próbáljunk kapcsolódni a konténerhez a 8000-es porton
-                health_check = check_service_health(service, slot)
-                
-                container_info["health_check"] = health_check
-                results[container_name] = container_info
-
-            except Exception as e:
-                logger.error(f"Hiba a {container_name} diagnosztikájakor: {e}")
-                results[container_name] = {
-                    "exists": False,
-                    "running": False,
-                    "ip_address": None,
-                    "health_check": False,
-                    "error": str(e)
-                }
-    
-    return {"diagnostics": results}
+            slot_info = diagnostics_info.get(f"szakdoga2025-{service_short_name}-{slot}", {})
+            slots.append({
+                "id": slot,
+                "version": states[slot].version if states else None,
+                "traffic": slot_weights.get(slot, 0),
+                "replicas": (replicas or {}).get(service_short_name, {}).get(slot, 0),
+                "status": "healthy" if slot_info.get("health_check", False) else "warning"
+            })
+        result.append({
+            "id": f"ms-{service_short_name}",
+            "name": service_short_name,
+            "slots": slots
+        })
+    return result
 
 
-service_states = {
+# A verziókat induláskor a discover_slot_versions tölti ki, párhuzamosan; az állapot a közös backendben él
+service_states = ServiceStateStore(state_backend, ["microservice1", "microservice2", "microservice3"])
 
-    "microservice1": {"blue" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice1", "blue")), "green" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice1", "green"))},
-    "microservice2": {"blue" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice2", "blue")), "green" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice2", "green"))},
-    "microservice3": {"blue" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice3", "blue")), "green" : ServiceState(status="idle", version=docker_manager.get_image_version("microservice3", "green"))}
-}
+image_cache = ImageCache(
+    async_docker,
+    list(service_states),
+    # A tag forrást a connect_git_watcher köti be
+    get_tags=None,
+    # A slotokon futó és a folyamatban lévő deploymentek verzióinak image-ét az LRU törlés nem érinti
+    in_use=lambda: {(service, state.version) for service, slots in service_states.items()
+                    for state in slots.values() if state.version}
+                   # A vezető memóriában tartott, még be nem fejezett jobjai (SQLite hívás nélkül, az event loopon)
+                   | {(job.service, job.version) for job in list(deployment_queue.jobs.values())}
+)
+
+autoscaler = Autoscaler(
+    targets=lambda: [(service, slot) for service in service_states for slot in ["blue", "green"]],
+    container_stats=lambda service, slot: async_docker.container_stats(service, slot),
+    request_rate=lambda service, slot: canary_analyzer.slot_stats(service, slot)["rps"],
+    scale=lambda service, slot, replicas: scale_slot(service, slot, replicas),
+    update_memory=lambda service, slot, memory_mb: async_docker.update_memory_limit(service, slot, memory_mb),
+    max_replicas=min(AUTOSCALE_MAX_REPLICAS, SLOT_MAX_REPLICAS)
+)
 
 # ------------------- API VÉGPONTOK -------------------
 
@@ -174,38 +547,85 @@ async def root():
     return {
         "service": "deployment-engine",
         "status": "running",
-        "docker_manager": "connected" if docker_manager else "disconnected",
-        "git_watcher": "connected" if git_watcher else "disconnected",
+        "ready": engine_ready(),
+        "docker_manager": startup_state["docker"],
+        "git_watcher": startup_state["git_watcher"],
+        "tag_index": git_watcher.to_dict() if git_watcher else None,
+        "event_subscribers": event_bus.subscribers,
+        "role": startup_state["role"],
+        "state_backend": state_backend.to_dict(),
+        "executors": async_docker.to_dict(),
         "repo_path": GIT_REPO_URL
     }
 
 
+@app.get("/metrics", summary="Prometheus metrikák")
+async def get_metrics():
+    """Késleltetés hisztogramok és hibaszámlálók: Docker, health próbák, diagnosztika, services.yml, GitHub"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/ready", summary="Készenléti állapot")
+async def ready():
+    """200, ha a Docker elérhető és a kezdeti felderítés lefutott; egyébként 503 az indulási állapottal"""
+    return JSONResponse(status_code=200 if engine_ready() else 503,
+                        content={"ready": engine_ready(), **startup_state})
+
+
+async def event_snapshot() -> dict:
+    """Az SSE stream kezdeti állapota: forgalom nézet és a folyamatban lévő deploymentek"""
+    snapshot = await status_store.get()
+    return {
+        "traffic": build_traffic_view(snapshot.weights, snapshot.diagnostics, snapshot.replicas),
+        "deployments": [job.to_dict() for job in await deployment_queue.active()]
+    }
+
+
+@app.get("/events", summary="Állapotváltozások élő streamje (SSE)")
+async def stream_events(last_event_id: Optional[str] = Header(None)):
+    """Kezdeti állapot, majd csak a változások: deploy fázis, konténer állapot, health eredmény, súlyok"""
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+    return StreamingResponse(
+        event_bus.stream(event_snapshot, resume_from),
+        media_type="text/event-stream",
+        # A proxyk (Traefik, nginx) ne puffereljék a streamet
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/history", summary="Súlyváltozások, health átmenetek és deploymentek idősora")
+async def get_history(service: Optional[str] = None,
+                      start: Optional[str] = Query(None, alias="from"),
+                      end: Optional[str] = Query(None, alias="to"),
+                      kind: Optional[str] = None,
+                      limit: int = HISTORY_QUERY_LIMIT):
+    """Időtartomány (Unix időbélyeg vagy ISO 8601, alapértelmezetten az utolsó 24 óra) eseményei időrendben"""
+    if service is not None and service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {service} szolgáltatás nem található")
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen eseménytípus: {kind} (lehetséges: {', '.join(KINDS)})")
+    if not 1 <= limit <= HISTORY_QUERY_LIMIT:
+        raise HTTPException(status_code=400, detail=f"A limit 1 és {HISTORY_QUERY_LIMIT} között lehet")
+    try:
+        range_end = parse_timestamp(end) if end else time.time()
+        range_start = parse_timestamp(start) if start else range_end - 86400
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Érvénytelen időpont; Unix időbélyeg vagy ISO 8601 formátum várt")
+    if range_start > range_end:
+        raise HTTPException(status_code=400, detail="A from nem lehet későbbi a to-nál")
+    return await asyncio.to_thread(history_store.query, service, range_start, range_end, kind, limit)
+
+
 @app.get("/services", summary="Szolgáltatások állapotának lekérdezése")
 async def get_services_status():
     """Visszaadja az összes szolgáltatás aktuális állapotát"""
-    # Először lekérjük a diagnosztikai adatokat
-    diagnostics_data = await run_diagnostics()
-    diagnostics_info = diagnostics_data.get("diagnostics", {})
-    
-    # Traefik konfigurációs fájl beolvasása
-    try:
-        config_file = "/etc/traefik/dynamic/services.yml"
-        with open(config_file, 'r') as file:
-            config = yaml.safe_load(file)
-        # Súlyok kinyerése a konfigurációból
-        weights = {}
-        for service_name, service_config in config["http"]["services"].items():
-            if service_name.startswith("szakdoga2025-") and "weighted" in service_config:
-                service_short_name = service_name.replace("szakdoga2025-", "")
-                weights[service_short_name] = {}
-                for weighted_service in service_config["weighted"]["services"]:
-                    if weighted_service["name"].endswith("-blue"):
-                        weights[service_short_name]["blue"] = weighted_service["weight"]
-                    elif weighted_service["name"].endswith("-green"):
-                        weights[service_short_name]["green"] = weighted_service["weight"]
-    except Exception as e:
-        logger.error(f"Hiba a Traefik konfigurációs fájl olvasásakor: {e}")
-        weights = {}
+    # A háttérben frissített pillanatképből dolgozunk
+    snapshot = await status_store.get()
+    diagnostics_info = snapshot.diagnostics
+    weights = snapshot.weights
 
     # Frontend-kompatibilis formátum
     result = {
@@ -223,30 +643,22 @@ async def get_services_status():
         blue_info = diagnostics_info.get(blue_key, {})
         green_info = diagnostics_info.get(green_key, {})
         
-        # Konténer információk lekérése a verzió számára
-        try:
-            blue_version = docker_manager.get_image_version(service, "blue")
-            green_version = docker_manager.get_image_version(service, "green")
-            if blue_version is None:    
-                blue_version = "unknown"
-            if green_version is None:
-                green_version = "unknown"
-
-        except Exception as e:
-            logger.error(f"Hiba a konténer információk lekérésekor: {e}")
-            blue_version = state["blue"].version
-            green_version = state["green"].version
+        # Verziók a pillanatképből
+        blue_version = snapshot.versions.get(service, {}).get("blue") or "unknown"
+        green_version = snapshot.versions.get(service, {}).get("green") or "unknown"
         
         # Szolgáltatások hozzáadása a megfelelő slot-hoz
         slot_a_services.append({
             "name": blue_key,
             "version": blue_version,
+            "replicas": snapshot.replicas.get(service, {}).get("blue", 0),
             "status": "healthy" if blue_info.get("health_check", False) else "warning"
         })
         
         slot_b_services.append({
             "name": green_key,
             "version": green_version,
+            "replicas": snapshot.replicas.get(service, {}).get("green", 0),
             "status": "healthy" if green_info.get("health_check", False) else "warning"
         })
     
@@ -278,100 +690,49 @@ async def get_services_status():
 async def get_traffic_config():
     """Visszaadja a forgalom elosztás konfigurációját"""
     try:
-        # Traefik konfigurációs fájl beolvasása
-        config_file = "/etc/traefik/dynamic/services.yml"
-        with open(config_file, 'r') as file:
-            config = yaml.safe_load(file)
-        
-        # Szolgáltatások és súlyok kinyerése
-        result = []
-        for service_name, service_config in config["http"]["services"].items():
-            if service_name.startswith("szakdoga2025-") and "weighted" in service_config:
-                service_short_name = service_name.replace("szakdoga2025-", "")
-                
-                # Slot súlyok kinyerése
-                slot_a_weight = 0
-                slot_b_weight = 0
-                for weighted_service in service_config["weighted"]["services"]:
-                    if weighted_service["name"].endswith("-blue"):
-                        slot_a_weight = weighted_service["weight"]
-                    elif weighted_service["name"].endswith("-green"):
-                        slot_b_weight = weighted_service["weight"]
-                
-                # Diagnosztikai adatok lekérése az állapothoz
-                diagnostics_data = await run_diagnostics()
-                diagnostics_info = diagnostics_data.get("diagnostics", {})
-                
-                blue_key = f"szakdoga2025-{service_short_name}-blue"
-                green_key = f"szakdoga2025-{service_short_name}-green"
-                
-                blue_info = diagnostics_info.get(blue_key, {})
-                green_info = diagnostics_info.get(green_key, {})
-                
-                # Szolgáltatás hozzáadása az eredményhez
-                result.append({
-                    "id": f"ms-{service_short_name}",
-                    "name": service_short_name,
-                    "slots": [
-                        {
-                            "id": "blue",
-                            "version": service_states[service_short_name]["blue"].version,
-                            "traffic": slot_a_weight,
-                            "status": "healthy" if blue_info.get("health_check", False) else "warning"
-                        },
-                        {
-                            "id": "green",
-                            "version": service_states[service_short_name]["green"].version,
-                            "traffic": slot_b_weight,
-                            "status": "healthy" if green_info.get("health_check", False) else "warning"
-                        }
-                    ]
-                })
-        
-        return result
+        # Egyetlen pillanatkép: a konfigurációt és a diagnosztikát is csak egyszer olvassuk
+        snapshot = await status_store.get()
+        return build_traffic_view(snapshot.weights, snapshot.diagnostics, snapshot.replicas)
     except Exception as e:
         logger.error(f"Hiba a traffic konfiguráció lekérdezésekor: {str(e)}")
         return []
 
 
 @app.post("/deploy", summary="Szolgáltatás deploy-olása")
-async def deploy(request: DeploymentRequest, background_tasks: BackgroundTasks):
+async def deploy(request: DeploymentRequest):
     """Egy adott szolgáltatás megadott verziójának deploy-olása"""
     try:
         if request.service not in service_states:
             raise HTTPException(status_code=404, detail=f"A {request.service} szolgáltatás nem található")
+        if not docker_manager:
+            raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
+        if not engine_ready():
+            # A Docker már csatlakozott, de a felderítés és a deployment sor még nem indult el
+            raise HTTPException(status_code=503, detail="A deployment engine még inicializálódik")
         
         # Ellenőrizzük a tag létezését a GitHub-on, ha elérhető a Git Watcher
         if git_watcher:
-            tags = git_watcher.get_release_tags()
-            if request.version not in tags:
+            # Memóriában lévő tag index; hálózati hívás csak ismeretlen tagnél történik
+            if not await asyncio.to_thread(git_watcher.has_tag, request.version):
                 logger.warning(f"A megadott tag ({request.version}) nem található a Git Watcher-ben, de folytatjuk a deploymentet")
         else:
             logger.warning("Git Watcher szolgáltatás nem elérhető, tag ellenőrzés kihagyva")
     
         slot = request.slot 
-        deployment_id = f"{request.service}-{request.version}-{slot}-{int(time.time())}"
-        
-        # Szolgáltatás nevének átalakítása a megfelelő GitHub Package névre
-        github_package_name = request.service.replace("microservice", "m")
+        if slot not in ["blue", "green"]:
+            raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {slot}")
         
-        # GitHub Package Registry-ből való image használata
-        repo_parts = GIT_REPO_URL.split('/')
-        owner = repo_parts[-2]
-        image_name = f"ghcr.io/{owner}/{github_package_name}:{request.version}"
+        logger.info(f"Deployment indítása: {request.service} v{request.version} a {slot} slotra, image: {docker_manager.package_image_name(request.service, request.version)}")
         
-        logger.info(f"Deployment indítása: {request.service} v{request.version} a {slot} slotra, image: {image_name}")
-        
-        background_tasks.add_task(
-            deploy_service_with_github_image,
-            request.service,
-            request.version,
-            slot
-        )
+        try:
+            job = await deployment_queue.submit(request.service, request.version, slot)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=429, detail="Túl sok várakozó deployment, próbáld újra később")
+        status_store.invalidate()
         
         return {
             "message": f"Deployment elindult a {request.service} számára a {slot} slotra",
-            "deployment_id": deployment_id
+            "deployment_id": job.id
         }
     except HTTPException as he:
         raise
@@ -380,6 +741,82 @@ async def deploy(request: DeploymentRequest, background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=f"Belső szerverhiba: {str(e)}")
 
 
+@app.post("/deploy/batch", summary="Több szolgáltatás deploy-olása egyszerre")
+async def deploy_batch(request: BatchDeploymentRequest):
+    """Az image-ek párhuzamosan töltődnek le; a konténerek csak akkor cserélődnek, ha minden pull sikerült"""
+    if not request.deployments:
+        raise HTTPException(status_code=400, detail="Legalább egy deployment megadása kötelező")
+    if not docker_manager:
+        raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
+    if not engine_ready():
+        raise HTTPException(status_code=503, detail="A deployment engine még inicializálódik")
+    for item in request.deployments:
+        if item.service not in service_states:
+            raise HTTPException(status_code=404, detail=f"A {item.service} szolgáltatás nem található")
+        if item.slot not in ["blue", "green"]:
+            raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {item.slot}")
+
+    if git_watcher:
+        versions = {item.version for item in request.deployments}
+        known = [version for version in versions if await asyncio.to_thread(git_watcher.has_tag, version)]
+        for version in versions - set(known):
+            logger.warning(f"A megadott tag ({version}) nem található a Git Watcher-ben, de folytatjuk a deploymentet")
+    else:
+        logger.warning("Git Watcher szolgáltatás nem elérhető, tag ellenőrzés kihagyva")
+
+    try:
+        batch_id, jobs = await deployment_queue.submit_batch(
+            [(item.service, item.version, item.slot) for item in request.deployments]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=429, detail="Túl sok várakozó deployment, próbáld újra később")
+    status_store.invalidate()
+
+    if request.wait:
+        # Megvárjuk, amíg a batch minden eleme befejeződik, és az összesített eredményt adjuk vissza
+        while any(not job.finished for job in jobs):
+            await asyncio.sleep(0.5)
+        return await deployment_queue.batch(batch_id)
+
+    return {
+        "message": f"Batch deployment elindult {len(jobs)} szolgáltatásra",
+        "batch_id": batch_id,
+        "deployment_ids": [job.id for job in jobs]
+    }
+
+
+@app.get("/deployments/batches/{batch_id}", summary="Batch deployment összesített állapota")
+async def get_deployment_batch(batch_id: str):
+    """A batch elemeinek állapota és egy összesített eredmény"""
+    result = await deployment_queue.batch(batch_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"A {batch_id} batch nem található")
+    return result
+
+
+@app.get("/images", summary="Előtöltött image-ek")
+async def get_image_cache():
+    """A helyben meglévő release image-ek, a foglalt hely és a folyamatban lévő letöltések"""
+    return image_cache.to_dict()
+
+
+@app.get("/deployments", summary="Deploymentek listázása")
+async def list_deployments(limit: int = 50):
+    """A legutóbbi deploymentek a tartós job naplóból"""
+    return [job.to_dict() for job in await deployment_queue.list(limit)]
+
+
+@app.get("/deployments/{deployment_id}", summary="Deployment állapotának lekérdezése")
+async def get_deployment(deployment_id: str):
+    """Egy deployment állapota és fázisonkénti időzítése (pull, tag, drain, stop, run, ready)"""
+    job = await deployment_queue.get(deployment_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"A {deployment_id} deployment nem található")
+    return job.to_dict()
+
+
 @app.post("/slot-config", summary="Forgalom elosztás beállítása")
 async def configure_slots(request: SlotConfigurationRequest):
     """Beállítja a forgalom elosztását a blue és green slotok között"""
@@ -389,64 +826,301 @@ async def configure_slots(request: SlotConfigurationRequest):
     if request.blue_percentage + request.green_percentage != 100:
         raise HTTPException(status_code=400, detail="A blue és green százalékok összegének 100-nak kell lennie")
     
+    active_rollout = rollout_scheduler.active_for(request.service)
+    if active_rollout:
+        raise HTTPException(status_code=409, detail=f"A {request.service} szolgáltatáshoz rollout fut: {active_rollout.id}")
+    
     try:
-        # Traefik konfigurációs fájl útvonala
-        config_dir = "/etc/traefik/dynamic"
-        config_file = f"{config_dir}/services.yml"
-        
-        # Fájl betöltése
-        with open(config_file, 'r') as file:
-            config = yaml.safe_load(file)
-        
         # A megfelelő szolgáltatás súlyozásának módosítása
         service_name = f"szakdoga2025-{request.service}"
         
         # Ellenőrizzük, hogy létezik-e a szolgáltatás
-        if service_name not in config["http"]["services"]:
+        if not traefik_config.has_service(request.service):
             raise HTTPException(status_code=404, detail=f"A {service_name} szolgáltatás nem található a konfigurációban")
         
-        # Súlyok módosítása a weighted services alatt
-        weighted_services = config["http"]["services"][service_name]["weighted"]["services"]
+        # Kérésre a metrikák alapján blokkoljuk a lassabb slot felé terelést
+        if request.enforce_analysis:
+            current = traefik_config.weights().get(request.service, {})
+            requested = {"blue": request.blue_percentage, "green": request.green_percentage}
+            candidate = "blue" if requested["blue"] > current.get("blue", 0) else "green"
+            if requested[candidate] > current.get(candidate, 0):
+                failure = canary_gate(request.service, candidate)
+                if failure:
+                    raise HTTPException(status_code=409, detail=f"A súlymódosítás blokkolva: {failure}")
         
-        # Blue és green szolgáltatások súlyának módosítása
-        for service in weighted_services:
-            if service["name"] == f"{service_name}-blue":
-                service["weight"] = request.blue_percentage
-            elif service["name"] == f"{service_name}-green":
-                service["weight"] = request.green_percentage
-        
-        # Konfiguráció mentése
-        with open(config_file, 'w') as file:
-            yaml.safe_dump(config, file, default_flow_style=False, sort_keys=False)
+        # Súlyok módosítása memóriában, a fájlírást a store összevonja
+        traefik_config.set_weights(request.service, request.blue_percentage, request.green_percentage)
         
         logger.info(f"Traefik konfiguráció frissítve: blue {request.blue_percentage}%, green {request.green_percentage}%")
+        status_store.invalidate()
         
         return {
             "message": f"A {request.service} szolgáltatás forgalom elosztása sikeresen beállítva"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Hiba a Traefik konfiguráció frissítésekor: {e}")
         raise HTTPException(status_code=500, detail=f"Hiba a Traefik konfiguráció frissítésekor: {str(e)}")
     
 
 
+async def scale_slot(service: str, slot: str, replicas: int) -> dict:
+    """Replikák egyenkénti indítása vagy leállítása; a Traefik lista a futó replikákat követi"""
+    async with deployment_queue.slot_lock(service, slot):
+        version = await async_docker.get_image_version(service, slot)
+        if not version:
+            raise LookupError(f"A {service} {slot} slot nem fut, nincs mit skálázni")
+        current = await async_docker.replica_indexes(service, slot)
+        started, stopped, drains = [], [], []
+        try:
+            # Felskálázás: egyesével, mindig a kész replikát vesszük fel a Traefik listába
+            for replica in range(1, replicas):
+                if replica in current:
+                    continue
+                readiness = await start_replica(service, slot, version, replica)
+                if not readiness.ready:
+                    await async_docker.delete_container(service, slot, replica)
+                    raise RuntimeError(f"A {replica}. replika nem lett elérhető: {readiness.reason}")
+                started.append(DockerManager.container_name(service, slot, replica))
+
+            # Leskálázás: a legmagasabb indextől, előbb kivesszük a listából és kivárjuk a kéréseit
+            for replica in sorted((r for r in current if r >= replicas and r > 0), reverse=True):
+                name = DockerManager.container_name(service, slot, replica)
+                remaining = [n for n in await async_docker.running_replicas(service, slot) if n != name]
+                drain = await drainer.drain_replica(
+                    service, slot, replica,
+                    lambda: traefik_config.set_servers(service, slot, [f"http://{n}:8000" for n in remaining])
+                )
+                drains.append(drain.to_dict())
+                await async_docker.delete_container(service, slot, replica)
+                stopped.append(name)
+        finally:
+            await async_docker.queries.run(sync_slot_servers, service, slot)
+            status_store.invalidate()
+
+    count = len(await async_docker.replica_indexes(service, slot))
+    logger.info(f"Skálázás: {service} {slot} {len(current)} -> {count} replika")
+    return {
+        "message": f"A {service} {slot} slot {count} replikával fut",
+        "replicas": count,
+        "started": started,
+        "stopped": stopped,
+        "drain": drains
+    }
+
+
+@app.post("/scale", summary="Slot replikaszámának módosítása")
+async def scale(request: ScaleRequest):
+    """Replikák egyenkénti indítása vagy leállítása; a Traefik lista a futó replikákat követi"""
+    if not docker_manager:
+        raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
+    if request.service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {request.service} szolgáltatás nem található")
+    if request.slot not in ["blue", "green"]:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {request.slot}")
+    if not 1 <= request.replicas <= SLOT_MAX_REPLICAS:
+        raise HTTPException(status_code=400, detail=f"A replikák száma 1 és {SLOT_MAX_REPLICAS} között lehet")
+    try:
+        return await scale_slot(request.service, request.slot, request.replicas)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/autoscaler", summary="Autoscaler állapota")
+async def get_autoscaler():
+    """Beállítások és a slotok legutóbbi kiértékelése"""
+    return autoscaler.to_dict()
+
+
+@app.get("/autoscaler/decisions", summary="Autoscaler döntések")
+async def get_autoscaler_decisions(limit: int = 50):
+    """A végrehajtott skálázási döntések, a legfrissebb elöl"""
+    return autoscaler.history(limit)
+
+
+@app.get("/health-probes", summary="Health próbák és circuit breakerek")
+async def get_health_probes():
+    """Konténerenként a breaker állapota és az utolsó próba eredménye"""
+    return health_prober.to_dict()
+
+
+@app.get("/health-probes/{service}/{slot}", summary="Slot health előzmények")
+async def get_health_history(service: str, slot: str, limit: int = 50):
+    """A slot legutóbbi health próbái (legfrissebb elöl) és késleltetés összesítő"""
+    if service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {service} szolgáltatás nem található")
+    if slot not in ["blue", "green"]:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {slot}")
+    return {
+        "service": service,
+        "slot": slot,
+        **health_prober.slot_summary(service, slot),
+        "history": health_prober.history(service, slot, limit)
+    }
+
+
+@app.post("/rollback", summary="Visszaállás az előző verzióra")
+async def rollback(request: RollbackRequest):
+    """A slot megtartott előző konténerének visszaállítása pull és új konténer nélkül"""
+    if not docker_manager:
+        raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
+    if request.service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {request.service} szolgáltatás nem található")
+    if request.slot not in ["blue", "green"]:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {request.slot}")
+    if request.traffic_percentage is not None and not 0 <= request.traffic_percentage <= 100:
+        raise HTTPException(status_code=400, detail="A forgalom százaléknak 0 és 100 között kell lennie")
+    active_rollout = rollout_scheduler.active_for(request.service)
+    if active_rollout:
+        raise HTTPException(status_code=409, detail=f"A {request.service} szolgáltatáshoz rollout fut: {active_rollout.id}")
+
+    started = time.monotonic()
+    async with deployment_queue.slot_lock(request.service, request.slot):
+        standby = await async_docker.get_standby(request.service, request.slot)
+        if standby is None:
+            raise HTTPException(status_code=404, detail=f"Nincs visszaállítható korábbi verzió: {request.service} {request.slot}")
+        previous_version = service_states.slot(request.service, request.slot).version
+
+        restored = await async_docker.restore_standby(request.service, request.slot)
+        if not restored:
+            status_store.invalidate()
+            raise HTTPException(status_code=500, detail=f"Nem sikerült visszaállítani: {request.service} {request.slot}")
+
+        readiness = await wait_until_ready(request.service, request.slot, check_service_ready, docker_manager.get_container_state)
+        extra_replicas = [r for r in await async_docker.replica_indexes(request.service, request.slot) if r > 0]
+        if readiness.ready and extra_replicas:
+            readiness = await replace_replicas(request.service, request.slot, standby["version"], extra_replicas)
+        service_states.update(request.service, request.slot, version=standby["version"],
+                              status="active" if readiness.ready else "failed")
+
+        # Ha kérték, a forgalmat is visszaterelik a visszaállított slotra
+        if readiness.ready and request.traffic_percentage is not None:
+            blue = request.traffic_percentage if request.slot == "blue" else 100 - request.traffic_percentage
+            traefik_config.set_weights(request.service, blue, 100 - blue)
+    status_store.invalidate()
+
+    if not readiness.ready:
+        raise HTTPException(status_code=500, detail=f"A visszaállított konténer nem lett elérhető: {readiness.reason}")
+    duration = time.monotonic() - started
+    logger.info(f"Rollback: {request.service} {request.slot} {previous_version} -> {standby['version']} ({duration:.2f}s)")
+    return {
+        "message": f"A {request.service} {request.slot} slot visszaállítva a {standby['version']} verzióra",
+        "version": standby["version"],
+        "previous_version": previous_version,
+        "duration": round(duration, 3)
+    }
+
+
+@app.post("/rollouts", summary="Fokozatos forgalomátterelés indítása")
+async def start_rollout(request: RolloutRequest):
+    """Lépésenként az új slotra tereli a forgalmat, health check kapuval és automatikus visszaállással"""
+    if request.service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {request.service} szolgáltatás nem található")
+    if not traefik_config.has_service(request.service):
+        raise HTTPException(status_code=404, detail=f"A szakdoga2025-{request.service} szolgáltatás nem található a konfigurációban")
+    
+    # Teljes időtartam megadásakor a scheduler egyenletesen osztja szét a végleges lépések között
+    duration = request.duration_minutes * 60 if request.duration_minutes is not None else None
+    try:
+        rollout = rollout_scheduler.start(request.service, request.slot, list(request.steps),
+                                          step_interval=request.step_interval_seconds, duration=duration)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return rollout.to_dict()
+
+
+@app.get("/rollouts", summary="Rolloutok listázása")
+async def list_rollouts():
+    """Visszaadja az összes rollout tervet és állapotát"""
+    return [rollout.to_dict() for rollout in rollout_scheduler.list()]
+
+
+@app.get("/rollouts/{rollout_id}", summary="Rollout állapotának lekérdezése")
+async def get_rollout(rollout_id: str):
+    """Visszaadja egy rollout aktuális lépését és előzményeit"""
+    rollout = rollout_scheduler.get(rollout_id)
+    if rollout is None:
+        raise HTTPException(status_code=404, detail=f"A {rollout_id} rollout nem található")
+    return rollout.to_dict()
+
+
+@app.delete("/rollouts/{rollout_id}", summary="Rollout megszakítása")
+async def cancel_rollout(rollout_id: str, revert: bool = True):
+    """Megszakítja a rolloutot; alapból visszaállítja az indulás előtti súlyokat"""
+    rollout = await rollout_scheduler.cancel(rollout_id, revert=revert)
+    if rollout is None:
+        raise HTTPException(status_code=404, detail=f"A {rollout_id} rollout nem található")
+    return rollout.to_dict()
+
+
+@app.get("/analysis", summary="Slotonkénti késleltetés és hibaarány")
+async def get_analysis():
+    """Traefik metrikákból számolt p50/p95/p99 késleltetés és 5xx arány minden szolgáltatásra"""
+    return {
+        "window": canary_analyzer.window,
+        "scrape_error": canary_analyzer.last_error,
+        "services": {service: canary_analyzer.service_stats(service) for service in service_states}
+    }
+
+
+@app.get("/analysis/{service}", summary="Canary elemzés egy szolgáltatásra")
+async def get_service_analysis(service: str, candidate: Optional[str] = None):
+    """A jelölt slot összevetése a másikkal; alapból a kisebb súlyú slot a jelölt"""
+    if service not in service_states:
+        raise HTTPException(status_code=404, detail=f"A {service} szolgáltatás nem található")
+    if candidate is None:
+        weights = traefik_config.weights().get(service, {})
+        candidate = "blue" if weights.get("blue", 0) <= weights.get("green", 0) else "green"
+    if candidate not in ["blue", "green"]:
+        raise HTTPException(status_code=400, detail=f"Ismeretlen slot: {candidate}")
+    return {
+        "window": canary_analyzer.window,
+        "scrape_error": canary_analyzer.last_error,
+        **canary_analyzer.compare(service, candidate)
+    }
+
+
 @app.post("/restart", summary="Szolgáltatás újraindítása")
 async def restart_service(request: RestartRequest):
     """Újraindítja a megadott szolgáltatás adott slotját."""
     if not docker_manager:
         raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
-    success = docker_manager.restart_service(request.service, request.slot)
+    reason = None
+    async with deployment_queue.slot_lock(request.service, request.slot):
+        drain = await drainer.drain(request.service, request.slot)
+        success = await async_docker.restart_service(request.service, request.slot)
+        if success:
+            readiness = await wait_until_ready(request.service, request.slot, check_service_ready, docker_manager.get_container_state)
+            if readiness.ready:
+                drainer.restore(drain)
+            else:
+                success, reason = False, readiness.reason
+    status_store.invalidate()
     if success:
-        return {"message": f"{request.service} {request.slot} slot újraindítva"}
-    else:
-        raise HTTPException(status_code=500, detail=f"Nem sikerült újraindítani: {request.service} {request.slot}")
+        return {"message": f"{request.service} {request.slot} slot újraindítva", "drain": drain.to_dict()}
+    # Hibás slotra nem tereljük vissza a forgalmat; a válaszból látszik, hogy a súlya 0-n maradt
+    if drain.shifted:
+        logger.warning(f"Az újraindítás nem sikerült, a {request.service} {request.slot} slot forgalom nélkül maradt")
+    raise HTTPException(status_code=500, detail={
+        "message": f"Nem sikerült újraindítani: {request.service} {request.slot}",
+        "reason": reason,
+        "drain": drain.to_dict(),
+        "weights_restored": False
+    })
 
 @app.post("/start", summary="Szolgáltatás leállítása")
 async def start_service(request: RestartRequest):
     """Leállítja a megadott szolgáltatás adott slotját."""
     if not docker_manager:
         raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
-    success = docker_manager.start_container(request.service, request.slot)
+    async with deployment_queue.slot_lock(request.service, request.slot):
+        success = await async_docker.start_container(request.service, request.slot)
+    status_store.invalidate()
     if success:
         return {"message": f"{request.service} {request.slot} slot leállítva"}
     else:
@@ -454,20 +1128,37 @@ async def start_service(request: RestartRequest):
     
 
 @app.post("/stop", summary="Szolgáltatás leállítása")
-async def stop_service(request: RestartRequest):
-    """Leállítja a megadott szolgáltatás adott slotját."""
+async def stop_service(request: StopRequest):
+    """Leállítja a megadott szolgáltatás adott slotját; élő forgalmú slotot csak force esetén."""
     if not docker_manager:
         raise HTTPException(status_code=500, detail="Docker manager nem elérhető")
-    success = docker_manager.stop_container(request.service, request.slot)
+    async with deployment_queue.slot_lock(request.service, request.slot):
+        drain = await drainer.drain(request.service, request.slot)
+        if drain.skipped and not request.force:
+            raise HTTPException(status_code=409, detail={
+                "message": f"A {request.service} {request.slot} slot még forgalmat kap, nem állítjuk le; a force: true kényszeríti",
+                "drain": drain.to_dict()
+            })
+        success = await async_docker.stop_container(request.service, request.slot)
+    status_store.invalidate()
     if success:
-        return {"message": f"{request.service} {request.slot} slot leállítva"}
+        return {"message": f"{request.service} {request.slot} slot leállítva", "drain": drain.to_dict()}
     else:
         raise HTTPException(status_code=500, detail=f"Nem sikerült leállítani: {request.service} {request.slot}")
     
 
+# "development": egy folyamat automatikus újratöltéssel; "production": ENGINE_WORKERS darab uvicorn worker
+ENGINE_MODE = os.getenv("ENGINE_MODE", "development").lower()
+# A slot zár közös (sqlite) backenddel a workerek között is érvényes, de a rolloutokat csak az indító worker
+# tartja nyilván, így a rollout ütközés ellenőrzése (súlyállítás, rollback közben) workerenként külön fut.
+# Ezért alapból egy worker; többet csak rollout nélküli üzemhez érdemes beállítani.
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "1"))
+
 if __name__ == "__main__":
-    # Ellenőrizzük a Git Watcher állapotát indulás előtt
-    if not git_watcher:
-        logger.warning("A Git Watcher nem érhető el, a git-függő funkciók nem fognak működni!")
-    
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    if ENGINE_MODE == "production":
+        # Külön folyamatok: az állapotot csak a közös (sqlite) backend tartja konzisztensen
+        if ENGINE_WORKERS > 1 and not state_backend.shared:
+            raise SystemExit("Több workerhez közös állapot kell: STATE_BACKEND=sqlite")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=ENGINE_WORKERS)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,237 @@
+# apps/deployment-engine/metrics.py
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Másodpercben; a health próbáktól (ms) a lassú image letöltésekig (perc) fed le mindent
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# A charset-et a Response maga fűzi hozzá
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Címkézett metrika közös része (Prometheus szöveges formátum)"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Címkekombinációnként: vödrönkénti darabszám, összeg, darabszám
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * len(self.buckets), [0.0, 0]))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[1][1] if entry else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        for key, (counts, totals) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(totals[0])}")
+            lines.append(f"{self.name}_count{labels} {totals[1]}")
+        return lines
+
+
+class Registry:
+    """A folyamat összes metrikája; ugyanazon a néven ugyanazt a példányt adja vissza"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ------------------- OSZTÁLY SZINTŰ MÉRÉS -------------------
+
+def _slot_labels(fn: Callable) -> Callable[[tuple, dict], Tuple[str, str]]:
+    """A metódus paramétereiből (service/service_name, slot vagy container_name) kinyeri a címkéket"""
+    params = list(inspect.signature(fn).parameters)
+
+    def position(*names: str) -> Tuple[Optional[str], Optional[int]]:
+        for name in names:
+            if name in params:
+                return name, params.index(name)
+        return None, None
+
+    service_param, service_index = position("service", "service_name")
+    slot_param, slot_index = position("slot")
+    name_param, name_index = position("container_name")
+
+    def argument(args: tuple, kwargs: dict, param: Optional[str], index: Optional[int]) -> str:
+        if param is None:
+            return ""
+        if param in kwargs:
+            return str(kwargs[param])
+        return str(args[index]) if index < len(args) else ""
+
+    def labels(args: tuple, kwargs: dict) -> Tuple[str, str]:
+        container_name = argument(args, kwargs, name_param, name_index)
+        if container_name.startswith("szakdoga2025-") and container_name.count("-") >= 2:
+            # szakdoga2025-{service}-{slot}
+            service, _, slot = container_name[len("szakdoga2025-"):].rpartition("-")
+            return service, slot
+        return (argument(args, kwargs, service_param, service_index),
+                argument(args, kwargs, slot_param, slot_index))
+
+    return labels
+
+
+def instrument_methods(latency: Histogram, failures: Counter, exclude: Iterable[str] = ()):
+    """Osztály dekorátor: minden publikus metódus ideje és hibái (kivétel vagy False visszatérés)"""
+    excluded = set(exclude)
+
+    def wrap(name: str, fn: Callable) -> Callable:
+        labels_of = _slot_labels(fn)
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            service, slot = labels_of(args, kwargs)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = result is False
+                return result
+            finally:
+                latency.observe(time.perf_counter() - started, method=name, service=service, slot=slot)
+                if failed:
+                    failures.inc(method=name, service=service, slot=slot)
+
+        return timed
+
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            # A staticmethod-ok tiszta segédfüggvények, nem hívnak Dockert
+            if name.startswith("_") or name in excluded or not inspect.isfunction(attribute):
+                continue
+            setattr(cls, name, wrap(name, attribute))
+        return cls
+
+    return decorate
@@ -0,0 +1,58 @@
+# apps/deployment-engine/readiness.py
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ennyi idő alatt kell az új konténernek válaszolnia a /health végponton (másodperc)
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "60.0"))
+READINESS_INITIAL_DELAY = float(os.getenv("READINESS_INITIAL_DELAY", "0.1"))
+READINESS_MAX_DELAY = float(os.getenv("READINESS_MAX_DELAY", "2.0"))
+
+# Ezekben az állapotokban a konténer már nem fog magától elindulni
+CRASHED_STATES = {"exited", "dead", "restarting", "removed", "not_found"}
+
+
+class ReadinessResult:
+    """A readiness várakozás eredménye"""
+
+    def __init__(self, ready: bool, elapsed: float, attempts: int, reason: Optional[str] = None):
+        self.ready = ready
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.reason = reason
+
+
+async def wait_until_ready(service: str, slot: str,
+                           health_check: Callable[[str, str], bool],
+                           container_state: Callable[[str, str], str],
+                           timeout: float = READINESS_TIMEOUT,
+                           initial_delay: float = READINESS_INITIAL_DELAY,
+                           max_delay: float = READINESS_MAX_DELAY) -> ReadinessResult:
+    """/health pollozása exponenciális backoff-fal, amíg a konténer kész, összeomlik vagy lejár az idő"""
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = initial_delay
+    attempts = 0
+
+    while True:
+        # Ha a konténer közben leállt, nincs értelme tovább várni
+        state = await asyncio.to_thread(container_state, service, slot)
+        if state in CRASHED_STATES:
+            return ReadinessResult(False, time.monotonic() - started, attempts,
+                                   f"A konténer állapota: {state}")
+
+        attempts += 1
+        if await asyncio.to_thread(health_check, service, slot):
+            return ReadinessResult(True, time.monotonic() - started, attempts)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return ReadinessResult(False, time.monotonic() - started, attempts,
+                                   f"A konténer {timeout}s alatt nem lett elérhető")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,251 @@
+# apps/deployment-engine/rollout.py
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLLOUT_STEPS = [1, 5, 25, 50, 100]
+# Ilyen gyakran ellenőrizzük az új slot egészségét egy lépésen belül (másodperc)
+ROLLOUT_HEALTH_INTERVAL = float(os.getenv("ROLLOUT_HEALTH_INTERVAL", "5.0"))
+# Ennyi egymást követő sikertelen health check után visszaállunk
+ROLLOUT_FAILURE_THRESHOLD = int(os.getenv("ROLLOUT_FAILURE_THRESHOLD", "2"))
+# Legfeljebb ennyi befejezett rolloutot tartunk meg a listázáshoz
+ROLLOUT_HISTORY_SIZE = int(os.getenv("ROLLOUT_HISTORY_SIZE", "50"))
+
+SLOTS = ["blue", "green"]
+
+
+class Rollout:
+    """Egy fokozatos forgalomátterelés terve és állapota"""
+
+    def __init__(self, rollout_id: str, service: str, slot: str, steps: List[int],
+                 step_interval: float, original_weights: Dict[str, int]):
+        self.id = rollout_id
+        self.service = service
+        self.slot = slot
+        self.steps = steps
+        self.step_interval = step_interval
+        self.original_weights = original_weights
+        self.status = "pending"
+        self.current_step: Optional[int] = None
+        self.history: List[Dict] = []
+        self.reason: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "cancelled", "rolled_back", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "service": self.service,
+            "slot": self.slot,
+            "steps": self.steps,
+            "step_interval": self.step_interval,
+            "status": self.status,
+            "current_step": self.current_step,
+            "current_percentage": self.steps[self.current_step] if self.current_step is not None else 0,
+            "original_weights": self.original_weights,
+            "history": self.history,
+            "reason": self.reason,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class RolloutScheduler:
+    """Blue/green súlyok lépésenkénti mozgatása health check kapuval és automatikus visszaállással."""
+
+    def __init__(self, get_weights: Callable[[str], Dict[str, int]],
+                 set_weights: Callable[[str, int, int], None],
+                 health_check: Callable[[str, str], bool],
+                 on_change: Optional[Callable[[], None]] = None,
+                 analysis: Optional[Callable[[str, str], Optional[str]]] = None,
+                 health_interval: float = ROLLOUT_HEALTH_INTERVAL,
+                 failure_threshold: int = ROLLOUT_FAILURE_THRESHOLD,
+                 history: int = ROLLOUT_HISTORY_SIZE):
+        self.get_weights = get_weights
+        self.set_weights = set_weights
+        self.health_check = health_check
+        self.on_change = on_change
+        self.analysis = analysis
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.history_size = history
+        self.rollouts: Dict[str, Rollout] = {}
+
+    # ------------------- LEKÉRDEZÉS -------------------
+
+    def get(self, rollout_id: str) -> Optional[Rollout]:
+        return self.rollouts.get(rollout_id)
+
+    def list(self) -> List[Rollout]:
+        return sorted(self.rollouts.values(), key=lambda r: r.created_at, reverse=True)
+
+    def active_for(self, service: str) -> Optional[Rollout]:
+        return next((r for r in self.rollouts.values() if r.service == service and not r.finished), None)
+
+    # ------------------- VEZÉRLÉS -------------------
+
+    def start(self, service: str, slot: str, steps: List[int], step_interval: Optional[float] = None,
+              duration: Optional[float] = None) -> Rollout:
+        """Új rollout indítása; szolgáltatásonként egyszerre csak egy futhat.
+
+        A teljes időtartam (duration, másodperc) megadásakor a lépésközt a végleges lépésszámból számoljuk.
+        """
+        if slot not in SLOTS:
+            raise ValueError(f"Ismeretlen slot: {slot}")
+        if not steps or any(not 0 < p <= 100 for p in steps) or steps != sorted(steps):
+            raise ValueError("A lépéseknek növekvő, 1 és 100 közötti százalékoknak kell lenniük")
+        if duration is not None and duration <= 0:
+            raise ValueError("A rollout időtartamának pozitívnak kell lennie")
+        if duration is None and (step_interval is None or step_interval <= 0):
+            raise ValueError("A lépésköznek pozitív számnak kell lennie")
+        if steps[-1] != 100:
+            steps = steps + [100]
+        if self.active_for(service):
+            raise RuntimeError(f"A {service} szolgáltatáshoz már fut egy rollout")
+
+        original_weights = self.get_weights(service)
+        # Az új slot már meglévő forgalmánál kisebb lépéseket kihagyjuk, nem vesszük vissza a súlyt
+        steps = [p for p in steps if p > original_weights.get(slot, 0)] or [100]
+        if duration is not None:
+            step_interval = duration / len(steps)
+
+        rollout_id = f"rollout-{uuid.uuid4().hex}"
+        rollout = Rollout(rollout_id, service, slot, steps, step_interval, original_weights)
+        self._prune()
+        self.rollouts[rollout_id] = rollout
+        rollout.task = asyncio.create_task(self._run(rollout))
+        logger.info(f"Rollout indítva: {rollout_id} lépések: {steps}, lépésköz: {step_interval}s")
+        return rollout
+
+    async def cancel(self, rollout_id: str, revert: bool = True) -> Optional[Rollout]:
+        """Rollout megszakítása; alapból visszaállítja az eredeti súlyokat"""
+        rollout = self.rollouts.get(rollout_id)
+        if rollout is None or rollout.finished:
+            return rollout
+        if rollout.task is not None:
+            rollout.task.cancel()
+            try:
+                await rollout.task
+            except asyncio.CancelledError:
+                pass
+        if revert:
+            self._restore(rollout)
+        rollout.status = "cancelled"
+        rollout.reason = "Felhasználó által megszakítva"
+        rollout.finished_at = time.time()
+        logger.info(f"Rollout megszakítva: {rollout_id} (visszaállítás: {revert})")
+        return rollout
+
+    async def shutdown(self):
+        for rollout in list(self.rollouts.values()):
+            if not rollout.finished and rollout.task is not None:
+                rollout.task.cancel()
+
+    # ------------------- BELSŐ LOGIKA -------------------
+
+    def _prune(self):
+        """A legrégebbi befejezett rolloutok eldobása a history_size fölött; a futókat megtartjuk"""
+        finished = [rollout_id for rollout_id, rollout in self.rollouts.items() if rollout.finished]
+        for rollout_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self.rollouts[rollout_id]
+
+    def _apply(self, rollout: Rollout, percentage: int):
+        other = 100 - percentage
+        if rollout.slot == "blue":
+            self.set_weights(rollout.service, percentage, other)
+        else:
+            self.set_weights(rollout.service, other, percentage)
+        if self.on_change:
+            self.on_change()
+
+    def _restore(self, rollout: Rollout):
+        weights = rollout.original_weights
+        self.set_weights(rollout.service, weights.get("blue", 0), weights.get("green", 0))
+        if self.on_change:
+            self.on_change()
+
+    def _try_restore(self, rollout: Rollout):
+        """Visszaállítás hibaágon: egy itt keletkező kivétel nem takarhatja el az eredeti okot"""
+        try:
+            self._restore(rollout)
+        except Exception as e:
+            logger.error(f"Nem sikerült visszaállítani az eredeti súlyokat ({rollout.id}): {e}")
+
+    async def _healthy(self, rollout: Rollout) -> bool:
+        try:
+            return await asyncio.to_thread(self.health_check, rollout.service, rollout.slot)
+        except Exception as e:
+            logger.error(f"Hiba a rollout health check során: {e}")
+            return False
+
+    async def _gate(self, rollout: Rollout, duration: float) -> Optional[str]:
+        """A lépés idejére figyeli az új slotot; hiba esetén visszaadja az okot"""
+        failures = 0
+        deadline = time.monotonic() + duration
+        while True:
+            if await self._healthy(rollout):
+                failures = 0
+            else:
+                failures += 1
+                if failures >= self.failure_threshold:
+                    return f"A {rollout.slot} slot {failures} egymást követő health check-en elbukott"
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self.health_interval, remaining))
+
+        # A lépés végén a teljesítmény alapú elemzés is megvétózhatja a továbblépést
+        if self.analysis:
+            try:
+                return self.analysis(rollout.service, rollout.slot)
+            except Exception as e:
+                logger.error(f"Hiba a canary elemzés során: {e}")
+        return None
+
+    async def _run(self, rollout: Rollout):
+        rollout.status = "running"
+        try:
+            # Forgalom nélkül is ellenőrizzük, hogy az új slot egyáltalán él-e
+            if not await self._healthy(rollout):
+                rollout.status = "failed"
+                rollout.reason = f"A {rollout.slot} slot nem egészséges, a rollout nem indult el"
+                return
+
+            for index, percentage in enumerate(rollout.steps):
+                rollout.current_step = index
+                self._apply(rollout, percentage)
+                logger.info(f"Rollout {rollout.id}: {rollout.slot} slot {percentage}%")
+
+                # Az utolsó lépés után is figyelünk egy ideig, csak utána tekintjük késznek
+                failure = await self._gate(rollout, rollout.step_interval)
+                rollout.history.append({"percentage": percentage, "at": time.time(), "healthy": failure is None})
+                if failure:
+                    self._try_restore(rollout)
+                    rollout.status = "rolled_back"
+                    rollout.reason = failure
+                    logger.error(f"Rollout visszaállítva: {rollout.id} - {failure}")
+                    return
+
+            rollout.status = "completed"
+            logger.info(f"Rollout befejezve: {rollout.id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            rollout.status = "failed"
+            rollout.reason = str(e)
+            logger.error(f"Hiba a rollout során ({rollout.id}): {e}")
+            self._try_restore(rollout)
+        finally:
+            if rollout.finished:
+                rollout.finished_at = time.time()
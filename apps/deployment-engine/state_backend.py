@@ -0,0 +1,364 @@
+# apps/deployment-engine/state_backend.py
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "memory": egy folyamaton belüli állapot; "sqlite": több worker és újraindítás között megosztott
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "engine_state.db")
+# Ennyi ideig várunk, ha egy másik worker éppen ír (másodperc)
+STATE_BUSY_TIMEOUT = float(os.getenv("STATE_BUSY_TIMEOUT", "10.0"))
+
+
+class StateBackend(ABC):
+    """Névterekre bontott kulcs-érték tár JSON-ként tárolható értékekkel.
+
+    A visszaadott értékeket a hívó nem módosíthatja helyben; változtatni a put/update hívással lehet.
+    """
+
+    kind = "base"
+    # Több folyamat (worker) is láthatja-e ugyanazt az állapotot
+    shared = False
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def items(self, namespace: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Any):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Any:
+        """Atomikus olvasás-módosítás-írás; az fn a régi értékből (vagy None-ból) az újat adja vissza"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def lock(self, name: str):
+        """Kizárólagos, névvel azonosított zár (a sqlite változatnál folyamatok között is)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def try_leadership(self) -> bool:
+        """A háttérfeladatokat (deployment workerek, autoscaler) egyetlen worker futtatja"""
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def async_lock(self, name: str):
+        """A lock() event loopból használható változata: a zárat egy külön szál szerzi meg és tartja,
+        mert a fájlzár blokkol, és annak a szálnak kell elengednie, amelyik megszerezte."""
+        loop = asyncio.get_running_loop()
+        acquired = loop.create_future()
+        release = threading.Event()
+
+        def notify(error: Optional[BaseException] = None):
+            if acquired.done():
+                return
+            if error is None:
+                acquired.set_result(None)
+            else:
+                acquired.set_exception(error)
+
+        def hold():
+            try:
+                with self.lock(name):
+                    loop.call_soon_threadsafe(notify)
+                    release.wait()
+            except Exception as e:
+                try:
+                    loop.call_soon_threadsafe(notify, e)
+                except RuntimeError:
+                    # Az event loop már leállt
+                    pass
+
+        threading.Thread(target=hold, name=f"lock-{name}", daemon=True).start()
+        try:
+            await acquired
+            yield
+        finally:
+            # Megszakított várakozásnál a szál a megszerzés után azonnal elengedi a zárat
+            release.set()
+
+    def close(self):
+        pass
+
+    def to_dict(self) -> Dict:
+        return {"kind": self.kind, "shared": self.shared}
+
+
+class InMemoryStateBackend(StateBackend):
+    """Egyetlen folyamat állapota; újraindításkor elvész (fejlesztői mód)"""
+
+    kind = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._locks: Dict[str, threading.RLock] = {}
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(namespace, {}).get(key, default)
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._data.get(namespace, {}))
+
+    def put(self, namespace: str, key: str, value: Any):
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = value
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Any:
+        with self._lock:
+            value = fn(self._data.get(namespace, {}).get(key))
+            self._data.setdefault(namespace, {})[key] = value
+            return value
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.RLock())
+        with lock:
+            yield
+
+    def try_leadership(self) -> bool:
+        return True
+
+
+class SQLiteStateBackend(StateBackend):
+    """Közös SQLite fájl (WAL), amit a workerek egyszerre használnak; az olvasások memóriából jönnek,
+    amíg egy másik kapcsolat nem ír (PRAGMA data_version)."""
+
+    kind = "sqlite"
+    shared = True
+
+    def __init__(self, path: str = STATE_DB_PATH, busy_timeout: float = STATE_BUSY_TIMEOUT):
+        self.path = path
+        self._lock = threading.RLock()
+        # Autocommit; a több lépéses módosítások explicit BEGIN IMMEDIATE tranzakcióban futnak
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS engine_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._data_version: Optional[int] = None
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock_depth: Dict[str, int] = {}
+        self._leader_file = None
+
+    # ------------------- OLVASÁS -------------------
+
+    def _refresh(self):
+        """A cache eldobása, ha azóta másik worker írt az adatbázisba"""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._cache.clear()
+            self._data_version = version
+
+    def _namespace(self, namespace: str) -> Dict[str, Any]:
+        self._refresh()
+        cached = self._cache.get(namespace)
+        if cached is None:
+            rows = self._conn.execute("SELECT key, value FROM engine_state WHERE namespace = ?", (namespace,)).fetchall()
+            cached = self._cache[namespace] = {key: json.loads(value) for key, value in rows}
+        return cached
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._namespace(namespace).get(key, default)
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._namespace(namespace))
+
+    # ------------------- ÍRÁS -------------------
+
+    def _write(self, namespace: str, key: str, value: Any):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO engine_state VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), time.time())
+        )
+
+    def _cached(self, namespace: str, key: str, value: Any):
+        # A saját írásunk nem változtatja a data_version-t, ezért a cache-t kézzel követjük
+        self._refresh()
+        if namespace in self._cache:
+            self._cache[namespace][key] = value
+
+    def put(self, namespace: str, key: str, value: Any):
+        with self._lock:
+            self._write(namespace, key, value)
+            self._cached(namespace, key, value)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM engine_state WHERE namespace = ? AND key = ?", (namespace, key))
+            self._refresh()
+            self._cache.get(namespace, {}).pop(key, None)
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Any:
+        with self._lock:
+            # Az írási zárat azonnal megszerezzük, így két worker nem írhatja felül egymás módosítását
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM engine_state WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                value = fn(json.loads(row[0]) if row else None)
+                self._write(namespace, key, value)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cached(namespace, key, value)
+            return value
+
+    # ------------------- ZÁRAK -------------------
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.RLock())
+        with lock:
+            depth = self._lock_depth.get(name, 0)
+            self._lock_depth[name] = depth + 1
+            try:
+                if depth:
+                    # Ugyanaz a szál már birtokolja a fájlzárat
+                    yield
+                    return
+                with open(f"{self.path}.{name}.lock", "a") as handle:
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+            finally:
+                self._lock_depth[name] = depth
+
+    def try_leadership(self) -> bool:
+        """Nem blokkoló fájlzár; a folyamat haláláig (vagy close-ig) tartjuk, utána egy másik worker veszi át"""
+        with self._lock:
+            if self._leader_file is not None:
+                return True
+            handle = open(f"{self.path}.leader.lock", "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+            self._leader_file = handle
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._leader_file is not None:
+                self._leader_file.close()
+                self._leader_file = None
+            self._conn.close()
+
+    def to_dict(self) -> Dict:
+        return {**super().to_dict(), "path": self.path, "leader": self._leader_file is not None}
+
+
+def create_backend(kind: str = STATE_BACKEND, path: str = STATE_DB_PATH) -> StateBackend:
+    if kind == "sqlite":
+        return SQLiteStateBackend(path)
+    if kind != "memory":
+        logger.warning(f"Ismeretlen STATE_BACKEND ({kind}), memóriában tartott állapotot használunk")
+    return InMemoryStateBackend()
+
+
+# ------------------- SZOLGÁLTATÁS ÁLLAPOTOK -------------------
+
+class ServiceState:
+    """Egy slot állapota (idle/deploying/active/failed) és a rajta futó verzió"""
+
+    def __init__(self, status: str, version: Optional[str] = None):
+        self.status = status
+        self.version = version
+
+    def to_dict(self) -> Dict:
+        return {"status": self.status, "version": self.version}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "ServiceState":
+        data = data or {}
+        return cls(data.get("status", "idle"), data.get("version"))
+
+
+class ServiceStateStore:
+    """A slotok állapota a közös backendben, szolgáltatásonként egy bejegyzés; a szolgáltatások listája fix."""
+
+    NAMESPACE = "service_states"
+
+    def __init__(self, backend: StateBackend, services: Iterable[str], slots: Tuple[str, ...] = ("blue", "green")):
+        self.backend = backend
+        self.services: List[str] = list(services)
+        self.slots = slots
+        for service in self.services:
+            # Újraindításkor (vagy másik workerben) már meglévő állapotot nem írunk felül
+            self.backend.update(self.NAMESPACE, service, lambda current: current or {
+                slot: ServiceState("idle").to_dict() for slot in self.slots
+            })
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.services)
+
+    def __contains__(self, service: object) -> bool:
+        return service in self.services
+
+    def __len__(self) -> int:
+        return len(self.services)
+
+    def get(self, service: str) -> Optional[Dict[str, ServiceState]]:
+        if service not in self.services:
+            return None
+        data = self.backend.get(self.NAMESPACE, service) or {}
+        return {slot: ServiceState.from_dict(data.get(slot)) for slot in self.slots}
+
+    def slot(self, service: str, slot: str) -> ServiceState:
+        return self.get(service)[slot]
+
+    def items(self) -> List[Tuple[str, Dict[str, ServiceState]]]:
+        return [(service, self.get(service)) for service in self.services]
+
+    def update(self, service: str, slot: str, **fields):
+        """A megadott mezők (status, version) atomikus módosítása; a slot többi mezője megmarad"""
+        def apply(current: Optional[Dict]) -> Dict:
+            current = dict(current or {})
+            current[slot] = {**ServiceState.from_dict(current.get(slot)).to_dict(), **fields}
+            return current
+
+        self.backend.update(self.NAMESPACE, service, apply)
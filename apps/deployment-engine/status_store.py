@@ -0,0 +1,103 @@
+# apps/deployment-engine/status_store.py
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Háttérfrissítés gyakorisága és a pillanatkép maximális kora másodpercben
+STATUS_REFRESH_INTERVAL = float(os.getenv("STATUS_REFRESH_INTERVAL", "5.0"))
+STATUS_TTL = float(os.getenv("STATUS_TTL", "15.0"))
+
+
+class StatusSnapshot:
+    """Egy diagnosztikai kör eredménye: konténer adatok, Traefik súlyok, image verziók és replikaszámok"""
+
+    def __init__(self, diagnostics: Dict, weights: Dict, versions: Dict, replicas: Optional[Dict] = None):
+        self.diagnostics = diagnostics
+        self.weights = weights
+        self.versions = versions
+        self.replicas = replicas or {}
+        self.created_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class StatusSnapshotStore:
+    """Háttérben frissített állapot pillanatkép, amit a végpontok azonnal olvashatnak."""
+
+    def __init__(self, build: Callable[[], Awaitable[StatusSnapshot]],
+                 interval: float = STATUS_REFRESH_INTERVAL, ttl: float = STATUS_TTL):
+        self.build = build
+        self.interval = interval
+        self.ttl = ttl
+        self.snapshot: Optional[StatusSnapshot] = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def refresh(self) -> StatusSnapshot:
+        """Új pillanatkép készítése; az egyidejű hívások egyetlen frissítést osztanak meg"""
+        started = self.snapshot
+        async with self._lock:
+            # Amíg a lockra vártunk, valaki más már frissített
+            if self.snapshot is not started and not self._stale:
+                return self.snapshot
+            self._stale = False
+            try:
+                self.snapshot = await self.build()
+            except Exception as e:
+                self._stale = True
+                logger.error(f"Hiba az állapot pillanatkép frissítésekor: {e}")
+                if self.snapshot is None:
+                    raise
+            return self.snapshot
+
+    async def get(self) -> StatusSnapshot:
+        """Az aktuális pillanatkép; csak akkor frissít helyben, ha nincs vagy túl régi"""
+        snapshot = self.snapshot
+        if snapshot is None or self._stale or snapshot.age() > self.ttl:
+            return await self.refresh()
+        return snapshot
+
+    def invalidate(self):
+        """Elavulttá teszi a pillanatképet és azonnali háttérfrissítést kér"""
+        self._stale = True
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            # Python 3.11 alatt a wait_for elnyelheti a cancel-t, ha közben jött egy ébresztés
+            if self._closing:
+                break
+            self._wakeup.clear()
+            try:
+                self._stale = True
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Hiba a háttérfrissítés során: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
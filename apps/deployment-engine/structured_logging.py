@@ -0,0 +1,202 @@
+# apps/deployment-engine/structured_logging.py
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Dict, Iterable, Optional, Tuple
+
+from metrics import counter
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "deployment_engine.log")
+# "size": LOG_MAX_BYTES méret után, "time": LOG_ROTATE_WHEN szerint (pl. midnight) rotálunk
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+# Ennyi rotált fájlt tartunk meg
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# A konzolra "text" (olvasható) vagy "json" formátumban írunk; a fájlba mindig JSON kerül
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "text").lower()
+# Ha a writer szál lemarad, efölött a rekordokat eldobjuk, a kérést nem várakoztatjuk
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Ezeknek a loggereknek az ismétlődő figyelmeztetéseit mintavételezzük (vesszővel elválasztva)
+LOG_SAMPLE_LOGGERS = [name.strip() for name in os.getenv("LOG_SAMPLE_LOGGERS", "diagnostics").split(",") if name.strip()]
+# Ugyanaz az üzenet ablakonként legfeljebb LOG_SAMPLE_BURST alkalommal kerül a naplóba (0: kikapcsolva)
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60.0"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "5"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Ezek a mezők minden JSON rekordban szerepelnek (None, ha nincs kontextus)
+CONTEXT_FIELDS = ("deployment_id", "service", "slot")
+
+LOG_DROPPED = counter("deployment_engine_log_records_dropped_total", "Megtelt napló sor miatt eldobott rekordok")
+LOG_SAMPLED = counter("deployment_engine_log_records_sampled_total",
+                      "Mintavételezés miatt kihagyott ismétlődő rekordok", ["logger"])
+
+_context: ContextVar[Dict[str, str]] = ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """A blokkban (és az onnan indított taskokban, worker hívásokban) keletkező rekordok mezői"""
+    token = _context.set({**_context.get(), **{key: value for key, value in fields.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """A kontextus mezőinek rögzítése a rekordon, még a hívó szálában"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            # Az extra={...} paraméterrel megadott érték elsőbbséget élvez
+            if getattr(record, field, None) is None:
+                setattr(record, field, context.get(field))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Ugyanaz a figyelmeztetés ablakonként legfeljebb `burst` alkalommal; a kihagyottak számát a következő rekord viszi"""
+
+    def __init__(self, loggers: Iterable[str], window: float = LOG_SAMPLE_WINDOW, burst: int = LOG_SAMPLE_BURST):
+        super().__init__()
+        self.loggers = tuple(loggers)
+        self.window = window
+        self.burst = burst
+        # (logger, szint, üzenet) -> [ablak kezdete, kiírt, kihagyott]
+        self._seen: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+
+    def _sampled(self, record: logging.LogRecord) -> bool:
+        return (self.burst > 0 and record.levelno >= logging.WARNING
+                and any(record.name == name or record.name.startswith(f"{name}.") for name in self.loggers))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self._sampled(record):
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                if len(self._seen) > 1000:
+                    self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+                suppressed = entry[2] if entry else 0
+                entry = self._seen[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if entry[1] >= self.burst:
+                entry[2] += 1
+                LOG_SAMPLED.inc(logger=record.name)
+                return False
+            entry[1] += 1
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Soronként egy JSON objektum"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **{field: getattr(record, field, None) for field in CONTEXT_FIELDS}
+        }
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """A rekordot csak sorba teszi; megtelt sor esetén eldobja ahelyett, hogy a hívót blokkolná"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A formázás a writer szálon történik; itt csak az üzenetet és a kivételt rögzítjük szövegként
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+def _file_handler(path: str) -> logging.Handler:
+    if LOG_ROTATION == "time":
+        return TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    return RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, log_file: Optional[str] = LOG_FILE) -> QueueListener:
+    """Egyetlen QueueHandler a gyökér loggeren; a konzol és a rotált fájl írása a listener szálán fut"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler()
+    console.setFormatter(JSONFormatter() if LOG_CONSOLE_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    handlers = [console]
+    if log_file:
+        file_handler = _file_handler(log_file)
+        file_handler.setFormatter(JSONFormatter())
+        handlers.append(file_handler)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_LOGGERS))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # A uvicorn saját (szinkron) handlerei helyett is ezen a soron írunk
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """A sorban maradt rekordok kiírása és a listener leállítása"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,233 @@
+# apps/deployment-engine/traefik_config.py
+
+import copy
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from metrics import counter, histogram
+from state_backend import InMemoryStateBackend, StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Ennyi ideig gyűjtjük a súlymódosításokat egyetlen fájlírás előtt (másodperc)
+TRAEFIK_WRITE_DEBOUNCE = float(os.getenv("TRAEFIK_WRITE_DEBOUNCE", "0.5"))
+
+YAML_SECONDS = histogram("deployment_engine_traefik_yaml_seconds",
+                         "services.yml beolvasás (load) és kiírás (dump) időtartama", ["operation"])
+YAML_FAILURES = counter("deployment_engine_traefik_yaml_failures_total",
+                        "Sikertelen services.yml beolvasás vagy kiírás", ["operation"])
+
+
+class TraefikConfigStore:
+    """A Traefik dinamikus konfiguráció a közös állapot backendben, atomikus és összevont fájlírással.
+
+    A backend tartja a konfiguráció legfrissebb revízióját és a fájlba utoljára kiírt revíziót, így több
+    worker módosításai sem írják felül egymást, és bármelyik worker kiírhatja a függő változásokat.
+    """
+
+    CONFIG_NAMESPACE = "traefik_config"
+    FILE_NAMESPACE = "traefik_file"
+
+    def __init__(self, path: str, debounce: float = TRAEFIK_WRITE_DEBOUNCE, backend: Optional[StateBackend] = None):
+        self.path = path
+        self.debounce = debounce
+        self.backend = backend or InMemoryStateBackend()
+        self._lock = threading.RLock()
+        # A súlyok feldolgozott másolata a konfiguráció adott revíziójához
+        self._weights: Optional[Dict] = None
+        self._revision: Optional[int] = None
+        self._timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    # ------------------- OLVASÁS -------------------
+
+    def _stat(self) -> Optional[List[int]]:
+        try:
+            stat = os.stat(self.path)
+            return [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            return None
+
+    def _state(self) -> Tuple[Optional[Dict], Dict]:
+        """(konfiguráció revízióval, a fájlba utoljára kiírt revízió és a fájl mtime-ja)"""
+        state = self.backend.get(self.CONFIG_NAMESPACE, self.path)
+        written = self.backend.get(self.FILE_NAMESPACE, self.path) or {"revision": 0, "mtime": None}
+        return state, written
+
+    def _stale(self, state: Optional[Dict], written: Dict) -> bool:
+        # Ki nem írt módosítás esetén a backendben lévő változat az érvényes, különben a kívülről módosított fájl
+        return state is None or (state["revision"] <= written["revision"] and self._stat() != written["mtime"])
+
+    def _load(self):
+        with self.backend.lock("traefik"):
+            state, written = self._state()
+            # Amíg a zárra vártunk, egy másik worker már beolvashatta
+            if not self._stale(state, written):
+                return
+            mtime = self._stat()
+            try:
+                with YAML_SECONDS.time(operation="load"), open(self.path, 'r') as file:
+                    config = yaml.safe_load(file)
+            except Exception:
+                YAML_FAILURES.inc(operation="load")
+                raise
+            revision = max(state["revision"] if state else 0, written["revision"]) + 1
+            self.backend.put(self.CONFIG_NAMESPACE, self.path, {"revision": revision, "config": config})
+            self.backend.put(self.FILE_NAMESPACE, self.path, {"revision": revision, "mtime": mtime})
+
+    def _current(self) -> Dict:
+        """A közös konfiguráció; a fájlt csak akkor olvassa újra, ha kívülről változott"""
+        with self._lock:
+            state, written = self._state()
+            if self._stale(state, written):
+                self._load()
+                state, written = self._state()
+            if state["revision"] != self._revision:
+                self._revision = state["revision"]
+                self._weights = None
+            return state["config"]
+
+    def get(self) -> Dict:
+        """A teljes konfiguráció másolata"""
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def weights(self) -> Dict:
+        """Blue/green súlyok szolgáltatásonként"""
+        with self._lock:
+            config = self._current()
+            if self._weights is None:
+                self._weights = self._parse_weights(config)
+            return copy.deepcopy(self._weights)
+
+    def has_service(self, service: str) -> bool:
+        with self._lock:
+            return f"szakdoga2025-{service}" in self._current()["http"]["services"]
+
+    @staticmethod
+    def _parse_weights(config: Dict) -> Dict:
+        weights = {}
+        for service_name, service_config in config["http"]["services"].items():
+            if service_name.startswith("szakdoga2025-") and "weighted" in service_config:
+                service_short_name = service_name.replace("szakdoga2025-", "")
+                weights[service_short_name] = {}
+                for weighted_service in service_config["weighted"]["services"]:
+                    if weighted_service["name"].endswith("-blue"):
+                        weights[service_short_name]["blue"] = weighted_service["weight"]
+                    elif weighted_service["name"].endswith("-green"):
+                        weights[service_short_name]["green"] = weighted_service["weight"]
+        return weights
+
+    # ------------------- ÍRÁS -------------------
+
+    def add_listener(self, callback: Callable[[str, Dict], None]):
+        """A callback (szolgáltatás, új súlyok) minden tényleges súlyváltozáskor meghívódik"""
+        self._listeners.append(callback)
+
+    def update(self, mutator: Callable[[Dict], None]):
+        """A mutator helyben módosítja a konfigurációt; a fájlírás késleltetve, összevonva történik"""
+        previous: Dict = {}
+
+        def apply(state: Dict) -> Dict:
+            config = copy.deepcopy(state["config"])
+            mutator(config)
+            previous["config"] = state["config"]
+            return {"revision": state["revision"] + 1, "config": config}
+
+        with self._lock:
+            self._current()
+            state = self.backend.update(self.CONFIG_NAMESPACE, self.path, apply)
+            before = self._parse_weights(previous["config"])
+            self._revision = state["revision"]
+            self._weights = self._parse_weights(state["config"])
+            self._schedule_flush()
+            changed = {service: dict(weights) for service, weights in self._weights.items()
+                       if before.get(service) != weights}
+        for service, weights in changed.items():
+            for callback in self._listeners:
+                try:
+                    callback(service, weights)
+                except Exception as e:
+                    logger.error(f"Hiba a súlyváltozás feldolgozásakor ({service}): {e}")
+
+    def set_weights(self, service: str, blue: int, green: int):
+        """Egy szolgáltatás blue/green súlyának beállítása"""
+        service_name = f"szakdoga2025-{service}"
+
+        def apply(config: Dict):
+            if service_name not in config["http"]["services"]:
+                raise KeyError(service_name)
+            for weighted_service in config["http"]["services"][service_name]["weighted"]["services"]:
+                if weighted_service["name"] == f"{service_name}-blue":
+                    weighted_service["weight"] = blue
+                elif weighted_service["name"] == f"{service_name}-green":
+                    weighted_service["weight"] = green
+
+        self.update(apply)
+
+    def set_servers(self, service: str, slot: str, urls: List[str]):
+        """A slot loadBalancer szerverlistájának beállítása (replikánként egy URL); változatlan listánál nem ír"""
+        slot_service = f"szakdoga2025-{service}-{slot}"
+        servers = [{"url": url} for url in urls]
+        with self._lock:
+            current = self._current()["http"]["services"].get(slot_service)
+            if current is None:
+                raise KeyError(slot_service)
+            if current.get("loadBalancer", {}).get("servers") == servers:
+                return
+
+            def apply(config: Dict):
+                config["http"]["services"][slot_service]["loadBalancer"]["servers"] = servers
+
+            self.update(apply)
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce, self._flush_safely)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_safely(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Hiba a Traefik konfiguráció mentésekor: {e}")
+
+    def flush(self):
+        """A függő módosítások kiírása temp fájlba, majd atomikus átnevezés"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            with self.backend.lock("traefik"):
+                state, written = self._state()
+                # Egy másik worker már kiírta ezt (vagy újabb) revíziót
+                if state is None or state["revision"] <= written["revision"]:
+                    return
+                config_dir = os.path.dirname(self.path) or "."
+                # .tmp kiterjesztés: a Traefik directory provider nem tölti be a félkész fájlt
+                fd, tmp_path = tempfile.mkstemp(prefix=".services-", suffix=".tmp", dir=config_dir)
+                try:
+                    with YAML_SECONDS.time(operation="dump"), os.fdopen(fd, 'w') as file:
+                        yaml.safe_dump(state["config"], file, default_flow_style=False, sort_keys=False)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    try:
+                        os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                    except FileNotFoundError:
+                        os.chmod(tmp_path, 0o644)
+                    # A Traefik file watcher így sosem lát félig megírt fájlt
+                    os.replace(tmp_path, self.path)
+                except Exception:
+                    YAML_FAILURES.inc(operation="dump")
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+                self.backend.put(self.FILE_NAMESPACE, self.path, {"revision": state["revision"], "mtime": self._stat()})
+            logger.info(f"Traefik konfiguráció kiírva: {self.path}")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import uvicorn
@@ -18,6 +18,21 @@ app.add_middleware(
 )
 
 
+# Folyamatban lévő kérések száma; a deployment engine ez alapján várja ki a leállítás előtti drain-t
+in_flight = 0
+
+@app.middleware("http")
+async def count_in_flight(request: Request, call_next):
+    global in_flight
+    if request.url.path == "/health":
+        return await call_next(request)
+    in_flight += 1
+    try:
+        return await call_next(request)
+    finally:
+        in_flight -= 1
+
+
 @app.get("/")
 async def root():
     """Alap végpont, amely információt szolgáltat a mikroszolgáltatásról."""
@@ -30,7 +45,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "in_flight": in_flight}
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file